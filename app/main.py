@@ -1,10 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from connection import get_pool, get_pool_stats, close_pool
+from utils.db_driver import get_db_driver_name
+from utils.async_db_utils import get_async_pool_stats, close_async_pool
+from taio_writer import get_taio_writer, get_taio_writer_stats, close_taio_writer
+from utils.building_index import load_building_index, get_building_index_stats
+from utils.building_profile import get_building_profile_cache_stats
+from utils.slot_locks import get_slot_lock_stats
+from utils.query_stats import begin_request_stats, end_request_stats, record_request_metrics, get_query_metrics
+
 from app.routers.first_choice import router as first_choice_router
 from app.routers.second_choice import router as second_choice_router
 from app.routers.reservation import router as reservation_router
 from app.routers.building import router as building_router
+from app.routers.auth import router as auth_router
 
 
 app = FastAPI(title="nespe-db-reservation API", version="1.0.0")
@@ -15,14 +25,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def db_query_instrumentation(request: Request, call_next):
+    """リクエストごとのDBクエリ件数・時間をレスポンスヘッダーに付与し、ルート単位で集計する"""
+    stats, token = begin_request_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request_stats(token)
+    # 集計キーはルートのパス定義（パスパラメータ・未定義パスごとに分かれないようにする）
+    route = request.scope.get("route")
+    record_request_metrics(f"{request.method} {getattr(route, 'path', '(unmatched)')}", stats)
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
+
 app.include_router(first_choice_router)
 app.include_router(second_choice_router)
 app.include_router(reservation_router)
 app.include_router(building_router)
+app.include_router(auth_router)
 
 
 @app.get("/api/v1/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/api/v1/health/db-pool")
+def db_pool_health():
+    return {"status": "ok", "db_driver": get_db_driver_name(), "pool": get_pool_stats(), "async_pool": get_async_pool_stats(),
+            "taio_writer": get_taio_writer_stats(), "building_index": get_building_index_stats(),
+            "building_profile": get_building_profile_cache_stats(), "slot_locks": get_slot_lock_stats()}
+
+
+@app.on_event("startup")
+def warm_up_db_pool():
+    pool = get_pool()
+    if pool is not None:
+        try:
+            pool.warm_up()
+        except Exception as e:
+            print(f"[startup] DB接続プールの初期化エラー: {e}")
+    # 対応履歴の書き込みキュー（有効時のみ書き込みスレッドを開始）
+    get_taio_writer()
+    # 建物名の索引（失敗した場合は最初の参照時に読み込む）
+    try:
+        load_building_index()
+    except Exception as e:
+        print(f"[startup] 建物名の索引の読み込みエラー: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_db_pool():
+    # キューに残った対応履歴を登録してから接続プールを閉じる
+    close_taio_writer()
+    close_pool()
+    await close_async_pool()
+
+
+@app.get("/api/v1/metrics/db")
+def db_query_metrics():
+    return {"status": "ok", "routes": get_query_metrics()}
@@ -0,0 +1,13 @@
+"""
+ルーターで共通のレスポンス
+"""
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+
+def ndjson_response(items):
+    """1件ずつ JSON の1行として返すレスポンス（application/x-ndjson）"""
+    lines = (json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n" for item in items)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from user import login_user
+
+
+router = APIRouter(prefix="/api/v1", tags=["auth"])
+
+MISSING_CREDENTIAL = {"error": "password または token を指定してください。"}
+
+
+def resolve_credential(password: Optional[str], token: Optional[str]) -> Optional[str]:
+    """認証ありAPIの資格情報（token を優先し、無ければ password）"""
+    return token or password or None
+
+
+class LoginReq(BaseModel):
+    room_number: str = Field(...)
+    password: str = Field(...)
+    building_id: str = Field(...)
+
+
+@router.post("/auth/login")
+def auth_login(req: LoginReq):
+    return login_user(req.room_number, req.password, req.building_id)
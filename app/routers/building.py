@@ -1,7 +1,9 @@
 from fastapi import APIRouter
+from typing import Optional
 
 from get_building_name import get_building_name as get_building_name_public
 from get_building_name_password import get_building_name as get_building_name_auth
+from app.routers.auth import resolve_credential, MISSING_CREDENTIAL
 
 
 router = APIRouter(prefix="/api/v1", tags=["building"])
@@ -14,5 +16,8 @@ def building_name_public(client_cd: str):
 
 
 @router.get("/auth/building/name")
-def building_name_auth(room_number: str, password: str, building_id: str):
-    return get_building_name_auth(room_number, password, building_id)
+def building_name_auth(room_number: str, building_id: str, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_building_name_auth(room_number, credential, building_id)
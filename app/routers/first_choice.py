@@ -2,9 +2,11 @@ from fastapi import APIRouter
 from pydantic import BaseModel, Field
 from typing import Optional
 
-from first_choice_updater import update_first_choice as update_first_choice_public
-from first_choice_updater import get_available_slots as get_available_slots_public
+from first_choice_updater import update_first_choice_async as update_first_choice_public
+from first_choice_updater import get_available_slots_async as get_available_slots_public
+from first_choice_updater import get_availability_calendar_async as get_availability_calendar_public
 from first_choice_updater_password import update_first_choice as update_first_choice_auth
+from app.routers.auth import resolve_credential, MISSING_CREDENTIAL
 
 
 router = APIRouter(prefix="/api/v1", tags=["first_choice"])
@@ -18,21 +20,30 @@ class FirstChoiceUpdatePublicReq(BaseModel):
 
 class FirstChoiceUpdateAuthReq(BaseModel):
     room_number: str = Field(...)
-    password: str = Field(...)
+    password: Optional[str] = None
+    token: Optional[str] = Field(None, description="/auth/login で発行したトークン（password の代わり）")
     building_id: str = Field(...)
     new_datetime: str = Field(..., description="YYYY-MM-DD HH:MM")
 
 
 @router.post("/public/first-choice/update")
-def first_choice_update_public(req: FirstChoiceUpdatePublicReq):
-    return update_first_choice_public(req.room_number, req.building_id, req.new_datetime)
+async def first_choice_update_public(req: FirstChoiceUpdatePublicReq):
+    return await update_first_choice_public(req.room_number, req.building_id, req.new_datetime)
 
 
 @router.get("/public/first-choice/slots")
-def first_choice_slots(building_id: str, date: str):
-    return get_available_slots_public(building_id, date)
+async def first_choice_slots(building_id: str, date: str):
+    return await get_available_slots_public(building_id, date)
+
+
+@router.get("/public/first-choice/calendar")
+async def first_choice_calendar(building_id: str, date_from: str, days: int = 14):
+    return await get_availability_calendar_public(building_id, date_from, days)
 
 
 @router.post("/auth/first-choice/update")
 def first_choice_update_auth(req: FirstChoiceUpdateAuthReq):
-    return update_first_choice_auth(req.room_number, req.password, req.building_id, req.new_datetime)
+    credential = resolve_credential(req.password, req.token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return update_first_choice_auth(req.room_number, credential, req.building_id, req.new_datetime)
@@ -1,12 +1,18 @@
-from fastapi import APIRouter
-from typing import Optional
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Response
+from pydantic import BaseModel
+from typing import List, Optional
 
 from reservation_fetcher import (
-    get_reservation_date as get_reservation_date_public,
-    get_reservation_history as get_reservation_history_public,
-    get_reservation_status as get_reservation_status_public,
-    get_upcoming_reservations as get_upcoming_reservations_public,
-    get_reservation_summary as get_reservation_summary_public,
+    get_reservation_date_async as get_reservation_date_public,
+    get_reservation_dates_bulk_async as get_reservation_dates_bulk_public,
+    get_reservation_history_async as get_reservation_history_public,
+    get_reservation_status_async as get_reservation_status_public,
+    get_upcoming_reservations_async as get_upcoming_reservations_public,
+    get_reservation_summary_async as get_reservation_summary_public,
+    get_reservation_version_async,
+    iter_reservation_history,
 )
 from reservation_fetcher_password import (
     get_reservation_date as get_reservation_date_auth,
@@ -15,55 +21,124 @@ from reservation_fetcher_password import (
     get_upcoming_reservations as get_upcoming_reservations_auth,
     get_reservation_summary as get_reservation_summary_auth,
 )
+from app.responses import ndjson_response
+from app.routers.auth import resolve_credential, MISSING_CREDENTIAL
+from utils.etag import make_etag, etag_matches
 
 router = APIRouter(prefix="/api/v1", tags=["reservation"])
 
 
+async def conditional_reservation_get(request: Request, response: Response, room_number: str, building_id: str,
+                                      kind: str, build, *extra):
+    """
+    予約データの版から ETag を作り、If-None-Match が一致すれば本体を組み立てずに 304 を返す
+    （版の取得に失敗した場合は ETag なしで通常どおり応答する）
+
+    Args:
+        kind: エンドポイントの種類（ETag をエンドポイントごとに分ける）
+        build: レスポンス本体を組み立てるコルーチン関数
+        *extra: 予約データ以外で応答が変わる要素（基準日時など）
+    """
+    version = await get_reservation_version_async(room_number, building_id)
+    if "error" in version:
+        return await build()
+    etag = make_etag(kind, room_number, building_id, version["version"], *extra)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    result = await build()
+    if isinstance(result, dict) and result.get("result") == "ok":
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return result
+
+
+class RoomBuildingItem(BaseModel):
+    room_number: str
+    building_id: str
+
+
+class ReservationDateBulkReq(BaseModel):
+    items: List[RoomBuildingItem]
+
+
 @router.get("/public/reservation/date")
-def reservation_date_public(room_number: str, building_id: str):
-    return get_reservation_date_public(room_number, building_id)
+async def reservation_date_public(request: Request, response: Response, room_number: str, building_id: str):
+    return await conditional_reservation_get(
+        request, response, room_number, building_id, "date",
+        lambda: get_reservation_date_public(room_number, building_id))
+
+
+@router.post("/public/reservation/date/bulk")
+async def reservation_date_bulk_public(req: ReservationDateBulkReq):
+    return await get_reservation_dates_bulk_public([(item.room_number, item.building_id) for item in req.items])
 
 
 @router.get("/public/reservation/history")
-def reservation_history_public(room_number: str, building_id: str, limit: int = 50):
-    return get_reservation_history_public(room_number, building_id, limit)
+async def reservation_history_public(room_number: str, building_id: str, limit: int = 50, cursor: Optional[str] = None):
+    return await get_reservation_history_public(room_number, building_id, limit, cursor)
+
+
+@router.get("/public/reservation/history/stream")
+def reservation_history_stream_public(room_number: str, building_id: str):
+    return ndjson_response(iter_reservation_history(room_number, building_id))
 
 
 @router.get("/public/reservation/status")
-def reservation_status_public(room_number: str, building_id: str):
-    return get_reservation_status_public(room_number, building_id)
+async def reservation_status_public(request: Request, response: Response, room_number: str, building_id: str):
+    return await conditional_reservation_get(
+        request, response, room_number, building_id, "status",
+        lambda: get_reservation_status_public(room_number, building_id))
 
 
 @router.get("/public/reservation/upcoming")
-def reservation_upcoming_public(room_number: str, building_id: str, days_ahead: int = 30):
-    return get_upcoming_reservations_public(room_number, building_id, days_ahead)
+async def reservation_upcoming_public(room_number: str, building_id: str, days_ahead: int = 30):
+    return await get_upcoming_reservations_public(room_number, building_id, days_ahead)
 
 
 @router.get("/public/reservation/summary")
-def reservation_summary_public(room_number: str, building_id: str):
-    return get_reservation_summary_public(room_number, building_id)
+async def reservation_summary_public(request: Request, response: Response, room_number: str, building_id: str):
+    # 今後の予約（期間・days_from_now）は現在日時で変わるため、分単位の現在日時も ETag に含める
+    return await conditional_reservation_get(
+        request, response, room_number, building_id, "summary",
+        lambda: get_reservation_summary_public(room_number, building_id),
+        datetime.now().strftime("%Y-%m-%d %H:%M"))
 
 
 @router.get("/auth/reservation/date")
-def reservation_date_auth(room_number: str, password: str, building_id: str):
-    return get_reservation_date_auth(room_number, password, building_id)
+def reservation_date_auth(room_number: str, building_id: str, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_reservation_date_auth(room_number, credential, building_id)
 
 
 @router.get("/auth/reservation/history")
-def reservation_history_auth(room_number: str, password: str, building_id: str, limit: int = 50):
-    return get_reservation_history_auth(room_number, password, building_id, limit)
+def reservation_history_auth(room_number: str, building_id: str, limit: int = 50, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_reservation_history_auth(room_number, credential, building_id, limit)
 
 
 @router.get("/auth/reservation/status")
-def reservation_status_auth(room_number: str, password: str, building_id: str):
-    return get_reservation_status_auth(room_number, password, building_id)
+def reservation_status_auth(room_number: str, building_id: str, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_reservation_status_auth(room_number, credential, building_id)
 
 
 @router.get("/auth/reservation/upcoming")
-def reservation_upcoming_auth(room_number: str, password: str, building_id: str, days_ahead: int = 30):
-    return get_upcoming_reservations_auth(room_number, password, building_id, days_ahead)
+def reservation_upcoming_auth(room_number: str, building_id: str, days_ahead: int = 30, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_upcoming_reservations_auth(room_number, credential, building_id, days_ahead)
 
 
 @router.get("/auth/reservation/summary")
-def reservation_summary_auth(room_number: str, password: str, building_id: str):
-    return get_reservation_summary_auth(room_number, password, building_id)
+def reservation_summary_auth(room_number: str, building_id: str, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_reservation_summary_auth(room_number, credential, building_id)
@@ -7,6 +7,7 @@ from second_choice_updater import (
     get_current_second_choice as get_current_second_choice_public,
     clear_second_choice as clear_second_choice_public,
     get_second_choice_history as get_second_choice_history_public,
+    iter_second_choice_history,
 )
 from second_choice_updater_password import (
     update_second_choice as update_second_choice_auth,
@@ -14,6 +15,8 @@ from second_choice_updater_password import (
     clear_second_choice as clear_second_choice_auth,
     get_second_choice_history as get_second_choice_history_auth,
 )
+from app.responses import ndjson_response
+from app.routers.auth import resolve_credential, MISSING_CREDENTIAL
 
 
 router = APIRouter(prefix="/api/v1", tags=["second_choice"])
@@ -33,7 +36,8 @@ class SecondChoiceUpdatePublicReq(BaseModel):
 
 class SecondChoiceUpdateAuthReq(BaseModel):
     room_number: str
-    password: str
+    password: Optional[str] = None
+    token: Optional[str] = None
     building_id: str
     date1: str
     time1: str
@@ -51,7 +55,8 @@ class RoomBuildingReq(BaseModel):
 
 class RoomPasswordBuildingReq(BaseModel):
     room_number: str
-    password: str
+    password: Optional[str] = None
+    token: Optional[str] = None
     building_id: str
 
 
@@ -77,14 +82,22 @@ def second_choice_clear_public(req: RoomBuildingReq):
 
 
 @router.get("/public/second-choice/history")
-def second_choice_history_public(room_number: str, building_id: str, limit: int = 10):
-    return get_second_choice_history_public(room_number, building_id, limit)
+def second_choice_history_public(room_number: str, building_id: str, limit: int = 10, cursor: Optional[str] = None):
+    return get_second_choice_history_public(room_number, building_id, limit, cursor)
+
+
+@router.get("/public/second-choice/history/stream")
+def second_choice_history_stream_public(room_number: str, building_id: str):
+    return ndjson_response(iter_second_choice_history(room_number, building_id))
 
 
 @router.post("/auth/second-choice/update")
 def second_choice_update_auth(req: SecondChoiceUpdateAuthReq):
+    credential = resolve_credential(req.password, req.token)
+    if credential is None:
+        return MISSING_CREDENTIAL
     return update_second_choice_auth(
-        req.room_number, req.password, req.building_id,
+        req.room_number, credential, req.building_id,
         req.date1, req.time1,
         req.date2, req.time2,
         req.date3 or "", req.time3 or "",
@@ -93,15 +106,24 @@ def second_choice_update_auth(req: SecondChoiceUpdateAuthReq):
 
 
 @router.get("/auth/second-choice/current")
-def second_choice_current_auth(room_number: str, password: str, building_id: str):
-    return get_current_second_choice_auth(room_number, password, building_id)
+def second_choice_current_auth(room_number: str, building_id: str, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_current_second_choice_auth(room_number, credential, building_id)
 
 
 @router.post("/auth/second-choice/clear")
 def second_choice_clear_auth(req: RoomPasswordBuildingReq):
-    return clear_second_choice_auth(req.room_number, req.password, req.building_id)
+    credential = resolve_credential(req.password, req.token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return clear_second_choice_auth(req.room_number, credential, req.building_id)
 
 
 @router.get("/auth/second-choice/history")
-def second_choice_history_auth(room_number: str, password: str, building_id: str, limit: int = 10):
-    return get_second_choice_history_auth(room_number, password, building_id, limit)
+def second_choice_history_auth(room_number: str, building_id: str, limit: int = 10, password: Optional[str] = None, token: Optional[str] = None):
+    credential = resolve_credential(password, token)
+    if credential is None:
+        return MISSING_CREDENTIAL
+    return get_second_choice_history_auth(room_number, credential, building_id, limit)
@@ -2,20 +2,32 @@
 空き枠チェック機能を担当するクラス
 ishokuフォルダー用に移植された空き枠チェック機能
 """
-from datetime import datetime, timedelta
 from collections import Counter
+from datetime import datetime
 from utils.pattern_utils import PatternUtils
 from utils.time_utils import TimeUtils
-from utils.db_utils import db_connection, DBUtils
+from utils.waku_loader import CompiledWakuPattern
+from utils.async_db_utils import async_db_connection
+from utils.occupancy import (
+    load_occupancy, get_cached_occupancy, load_occupancy_async, get_cached_occupancy_async,
+    lock_slot_occupancy, lock_slot_occupancy_async,
+)
+from utils.building_profile import get_building_profile, get_building_profile_async
 
 
 class SlotAvailabilityChecker:
     """空き枠チェック機能をまとめたクラス"""
     
-    def __init__(self, building_id, connection=None):
+    def __init__(self, building_id, connection=None, use_cache=True):
         self.building_id = building_id
         self.connection = connection
         self._close_conn = False
+        # False の場合は予約占有状況のプロセス内キャッシュを使わずDBから読み込む（予約確定前の判定用）
+        self.use_cache = use_cache
+        # 日単位の予約占有状況キャッシュ {(date, exclude_usercd): DayOccupancy}
+        self._occupancy = {}
+        # 物件の参照データ（枠パターン・WakuRange・分単位・スタイリスト等）のキャッシュ
+        self._reference = {}
         
         if connection is None:
             from connection import get_connection
@@ -29,21 +41,128 @@ class SlotAvailabilityChecker:
         if self._close_conn and self.connection:
             self.connection.close()
     
+    def get_pattern_info(self):
+        """物件の枠パターン情報を取得（同一インスタンス内では1回だけ取得）"""
+        return self._get_reference(
+            'pattern_info', lambda: PatternUtils.get_pattern_info(self.building_id, self.connection))
+    
+    def get_compiled_pattern(self):
+        """枠パターンを分単位の配列に変換したものを取得（同一インスタンス内では1回だけ変換）"""
+        return self._get_reference('compiled_pattern', self._load_compiled_pattern)
+    
+    def _load_compiled_pattern(self):
+        pattern_info = self.get_pattern_info()
+        if not pattern_info or "error" in pattern_info:
+            return None
+        compiled = pattern_info.get('compiled')
+        if compiled is None:
+            compiled = CompiledWakuPattern(pattern_info['start_times'], pattern_info['end_times'])
+        return compiled
+    
+    def get_minute_unit(self):
+        """物件の分単位を取得（同一インスタンス内では1回だけ取得）"""
+        return self._get_reference(
+            'minute_unit', lambda: PatternUtils.get_minute_unit(self.building_id, self.connection))
+    
+    def prefetch_occupancy(self, date_from, days, exclude_usercd=None):
+        """
+        複数日分の予約占有状況を1クエリでまとめて読み込む
+        （以降の check_slot_availability は対象日の予約数をメモリから参照する）
+        """
+        loaded = self._load_occupancy(date_from, days, exclude_usercd)
+        for day, occupancy in loaded.items():
+            self._occupancy[(day, exclude_usercd or None)] = occupancy
+    
+    async def prefetch_async(self, date_from, days=1, exclude_usercd=None):
+        """
+        非同期接続（aiomysql）で参照データと予約占有状況を読み込む
+        （読み込んだ期間内の check_slot_availability はDBにアクセスせずに判定できる）
+        """
+        await self.load_reference_async()
+        
+        if exclude_usercd or not self.use_cache:
+            loaded = await load_occupancy_async(self.connection, self.building_id, date_from, days, exclude_usercd)
+        else:
+            loaded = await get_cached_occupancy_async(self.connection, self.building_id, date_from, days)
+        for day, occupancy in loaded.items():
+            self._occupancy[(day, exclude_usercd or None)] = occupancy
+    
+    async def load_reference_async(self):
+        """非同期接続（aiomysql）で参照データ（枠パターン・分単位・スタイリスト等）のみを読み込む"""
+        profile = await get_building_profile_async(self.building_id, self.connection)
+        self._reference['profile'] = profile
+        self._reference['minute_unit'] = profile.minute_unit
+        self._reference.setdefault('pattern_info', PatternUtils.pattern_info_for(profile.waku_pattern_id))
+    
+    def lock_slot(self, target_datetime):
+        """
+        物件の設定行をロックしてから対象日時の枠の有効予約を行ロック付きで読み込み、以降の check_slot_availability の判定に使う
+        （トランザクション内で呼び出す。ロックは commit / rollback まで保持される）
+        
+        Returns:
+            bool: 枠を特定してロックした場合 True（枠外の日時は False）
+        """
+        slot = self._resolve_slot(target_datetime)
+        if slot is None:
+            return False
+        day, _, slot_start, slot_end = slot
+        self._occupancy[(day, None)] = lock_slot_occupancy(
+            self.connection, self.building_id, day, slot_start, slot_end)
+        return True
+    
+    async def lock_slot_async(self, target_datetime):
+        """lock_slot の asyncio 版（参照データは load_reference_async で読み込み済みであること）"""
+        slot = self._resolve_slot(target_datetime)
+        if slot is None:
+            return False
+        day, _, slot_start, slot_end = slot
+        self._occupancy[(day, None)] = await lock_slot_occupancy_async(
+            self.connection, self.building_id, day, slot_start, slot_end)
+        return True
+    
+    def slot_key(self, target_datetime):
+        """
+        対象日時の枠のキー (物件ID, 日付, 枠番号)（枠ロック用。枠外の日時・参照データを取得できない場合は None）
+        asyncio 版では load_reference_async で参照データを読み込んでから呼び出す
+        """
+        try:
+            slot = self._resolve_slot(target_datetime)
+        except Exception:
+            return None
+        if slot is None:
+            return None
+        day, slot_index, _, _ = slot
+        return (str(self.building_id), day, slot_index)
+    
+    def _resolve_slot(self, target_datetime):
+        """対象日時（YYYY-MM-DD HH:MM）の枠を (日付, 枠番号, 開始分, 終了分) で返す（枠外・パターン未設定は None）"""
+        pattern = self.get_compiled_pattern()
+        if pattern is None:
+            return None
+        try:
+            date_part, time_part = target_datetime.split()
+        except Exception:
+            return None
+        slot_index = pattern.slot_index(time_part)
+        if slot_index is None:
+            return None
+        slot_start = pattern.start_minutes[slot_index]
+        slot_end = pattern.end_minutes[slot_index] if slot_index < len(pattern.end_minutes) else None
+        if slot_start is None or slot_end is None:
+            return None
+        return TimeUtils.parse_date(date_part), slot_index, slot_start, slot_end
+    
     def check_slot_availability(self, target_datetime, exclude_usercd=None, menu_cd=None):
         """
         指定の物件・日時で予約枠に空きがあるか判定する
         """
         try:
-            # パターン情報を取得
-            pattern_utils = PatternUtils()
-            pattern_info = pattern_utils.get_pattern_info(self.building_id, self.connection)
+            # パターン情報を取得（分単位の配列に変換済み）
+            pattern = self.get_compiled_pattern()
             
-            if not pattern_info or "error" in pattern_info:
+            if pattern is None:
                 return {"available": False, "type": None}
             
-            start_times = pattern_info['start_times']
-            end_times = pattern_info['end_times']
-            
             # 枠範囲設定を取得
             waku_range_list = self._get_wakurange_from_db()
             
@@ -54,15 +173,19 @@ class SlotAvailabilityChecker:
                 return {"available": False, "type": None}
             
             # スロットインデックスの決定
-            slot_index = self._get_slot_index(time_part, start_times, end_times)
+            slot_index = pattern.slot_index(time_part)
             if slot_index is None:
                 return {"available": False, "type": None}
             
-            # 枠の時間範囲を取得
-            slot_start_str = f"{date_part} {start_times[slot_index]}"
-            slot_end_str = f"{date_part} {end_times[slot_index]}"
-            slot_start_dt = datetime.strptime(slot_start_str, "%Y-%m-%d %H:%M")
-            slot_end_dt = datetime.strptime(slot_end_str, "%Y-%m-%d %H:%M")
+            # 枠の時間範囲を取得（0時からの経過分）
+            day = TimeUtils.parse_date(date_part)
+            slot_start = pattern.start_minutes[slot_index]
+            slot_end = pattern.end_minutes[slot_index] if slot_index < len(pattern.end_minutes) else None
+            if slot_start is None or slot_end is None:
+                return {"available": False, "type": None}
+            
+            # 対象日の予約占有状況を読み込む（読み込めない場合は空き無しとする）
+            self._get_day_occupancy(day, exclude_usercd)
             
             # 連続枠数を取得
             minute_type = 1
@@ -70,127 +193,99 @@ class SlotAvailabilityChecker:
                 minute_type = self._get_minute_type(menu_cd)
             
             # 分単位を取得
-            minute_unit = pattern_utils.get_minute_unit(self.building_id, self.connection)
+            minute_unit = self.get_minute_unit()
             
             # 枠全体の満枠チェック
             waku_range_max = waku_range_list[slot_index] if slot_index < len(waku_range_list) else None
-            if self._is_slot_full(slot_start_dt, slot_end_dt, minute_unit, waku_range_max, exclude_usercd):
+            if self._is_slot_full(day, slot_start, slot_end, minute_unit, waku_range_max, exclude_usercd):
                 return {"available": False, "type": None}
             
             # 時間帯ごとの空き枠チェック
-            return self._check_time_slots(slot_start_dt, slot_end_dt, minute_unit, minute_type, waku_range_max, exclude_usercd)
+            return self._check_time_slots(day, slot_start, slot_end, minute_unit, minute_type, waku_range_max, exclude_usercd)
             
         except Exception as e:
             print(f"[SlotAvailabilityChecker] エラー: {e}")
             return {"available": False, "type": None}
     
+    def _get_reference(self, key, loader):
+        """物件の参照データをインスタンス内で1回だけ取得する（取得失敗時はキャッシュしない）"""
+        if key not in self._reference:
+            self._reference[key] = loader()
+        return self._reference[key]
+    
     def _get_wakurange_from_db(self):
         """tSettingMのWakuRangeカラムを取得し、'-'で分割してリスト化して返す"""
         try:
-            sql = "SELECT WakuRange FROM tSettingM WHERE ClientCD = %s"
-            result = DBUtils.execute_single_query(self.connection, sql, (self.building_id,))
-            
-            if not result or not result.get('WakuRange'):
-                return []
-            
-            waku_range_str = result['WakuRange']
-            return [int(x) if x.isdigit() else 0 for x in waku_range_str.split('-')]
+            return self._get_reference('waku_range', self._load_wakurange)
         except Exception:
             return []
     
+    def _get_profile(self):
+        """物件の参照データ（tSettingM / tStylistM / tMenuM）を取得（同一インスタンス内では1回だけ取得）"""
+        return self._get_reference('profile', lambda: get_building_profile(self.building_id, self.connection))
+    
+    def _load_wakurange(self):
+        return self._get_profile().waku_range
+    
     def _get_minute_type(self, menu_cd):
         """メニューの分タイプを取得"""
         try:
-            sql = "SELECT MinuteType FROM tMenuM WHERE MenuCD = %s AND ClientCD = %s AND MukouFlg = 0"
-            result = DBUtils.execute_single_query(self.connection, sql, (menu_cd, self.building_id))
-            
-            if result and result.get('MinuteType'):
-                return int(result['MinuteType'])
-            return 1  # デフォルト1枠
+            return self._get_reference(('minute_type', menu_cd), lambda: self._load_minute_type(menu_cd))
         except Exception:
             return 1
     
+    def _load_minute_type(self, menu_cd):
+        return self._get_profile().minute_type(menu_cd)
+    
     def _get_slot_index(self, time_part, start_times, end_times):
         """スロットインデックスを取得"""
-        # 完全一致チェック
-        for idx, st in enumerate(start_times):
-            if time_part == st:
-                return idx
-        
-        # 範囲内チェック
-        try:
-            t_time = datetime.strptime(time_part, "%H:%M")
-            for idx, (st, et) in enumerate(zip(start_times, end_times)):
-                st_time = datetime.strptime(st, "%H:%M")
-                et_time = datetime.strptime(et, "%H:%M")
-                if st_time <= t_time < et_time:
-                    return idx
-        except Exception:
-            pass
-        
-        return None
+        return CompiledWakuPattern(start_times, end_times).slot_index(time_part)
     
-    def _is_slot_full(self, slot_start_dt, slot_end_dt, minute_unit, waku_range_max, exclude_usercd):
-        """枠全体の満枠チェック"""
+    def _is_slot_full(self, day, slot_start, slot_end, minute_unit, waku_range_max, exclude_usercd):
+        """枠全体の満枠チェック（slot_start / slot_end は0時からの経過分）"""
         if waku_range_max is None:
             return False
         
-        all_times = []
-        t_time = slot_start_dt
-        while t_time < slot_end_dt:
-            all_times.append(t_time)
-            t_time += timedelta(minutes=minute_unit)
-        
         total_reserved = 0
-        for t in all_times:
-            tstr = t.strftime("%Y-%m-%d %H:%M")
-            reserved_count = self._get_reservation_count(tstr, exclude_usercd)
-            total_reserved += reserved_count
+        for minute in range(slot_start, slot_end, minute_unit):
+            total_reserved += self._get_reservation_count(day, minute, exclude_usercd)
         
         return total_reserved >= waku_range_max
     
-    def _check_time_slots(self, slot_start_dt, slot_end_dt, minute_unit, minute_type, waku_range_max, exclude_usercd):
+    def _check_time_slots(self, day, slot_start, slot_end, minute_unit, minute_type, waku_range_max, exclude_usercd):
         """時間帯ごとの空き枠チェック"""
-        t_time = slot_start_dt
-        while t_time + timedelta(minutes=minute_unit * minute_type) <= slot_end_dt:
-            ss_times = [t_time + timedelta(minutes=minute_unit * j) for j in range(minute_type)]
-            
-            total_reserved = sum(self._get_reservation_count(t.strftime("%Y-%m-%d %H:%M"), exclude_usercd) for t in ss_times)
+        t_minute = slot_start
+        while t_minute + minute_unit * minute_type <= slot_end:
+            total_reserved = sum(
+                self._get_reservation_count(day, t_minute + minute_unit * j, exclude_usercd)
+                for j in range(minute_type))
             
             # 枠全体の予約数が上限より少ない場合のみスタイリストごとにチェック
             if waku_range_max is None or total_reserved < waku_range_max:
                 # 通常枠のスタイリストごとに空き判定
-                result = self._check_stylist_availability(t_time, minute_unit, minute_type, exclude_usercd)
+                result = self._check_stylist_availability(day, t_minute, minute_unit, minute_type, exclude_usercd)
                 if result:
                     return result
             
-            t_time += timedelta(minutes=minute_unit)
+            t_minute += minute_unit
         
         return {"available": False, "type": None}
     
-    def _check_stylist_availability(self, t_time, minute_unit, minute_type, exclude_usercd):
+    def _check_stylist_availability(self, day, t_minute, minute_unit, minute_type, exclude_usercd):
         """スタイリストごとの空き枠チェック"""
         try:
-            # 通常のスタイリストのみ取得（WakugoeFlg != 1）
-            sql = """
-                SELECT StylistCD, NumberOfLines 
-                FROM tStylistM 
-                WHERE ClientCD = %s AND MukouFlg = 0 
-                AND (WakugoeFlg IS NULL OR WakugoeFlg = 0)
-                ORDER BY StylistCD
-            """
-            stylists = DBUtils.execute_query(self.connection, sql, (self.building_id,))
+            stylists = self._get_reference('stylists', self._load_stylists)
             
             for stylist in stylists:
                 stylist_cd = stylist["StylistCD"]
                 number_of_lines = stylist["NumberOfLines"]
                 
                 # 連続枠チェック
-                if self._is_stylist_available_php_style(t_time, minute_unit, minute_type, stylist_cd, number_of_lines, exclude_usercd):
+                if self._is_stylist_available_php_style(day, t_minute, minute_unit, minute_type, stylist_cd, number_of_lines, exclude_usercd):
                     return {
                         "available": True, 
                         "type": "normal", 
-                        "actual_time_from": t_time.strftime("%Y-%m-%d %H:%M"), 
+                        "actual_time_from": f"{day.strftime('%Y-%m-%d')} {t_minute // 60:02d}:{t_minute % 60:02d}", 
                         "stylist_cd": stylist_cd
                     }
             
@@ -199,16 +294,60 @@ class SlotAvailabilityChecker:
             print(f"[_check_stylist_availability] エラー: {e}")
             return None
     
-    def _is_stylist_available_php_style(self, t_time, minute_unit, minute_type, stylist_cd, number_of_lines, exclude_usercd):
+    def _load_stylists(self):
+        """通常のスタイリストのみ取得（WakugoeFlg != 1）"""
+        return self._get_profile().stylists
+    
+    def get_day_inputs(self, day, exclude_usercd=None):
+        """
+        1日分の一括判定（capacity_grid.DayCapacityGrid）に使う参照データと予約占有状況を取得
+        （check_slot_availability と同じ読み込み・キャッシュを使うため、判定結果が一致する）
+        
+        Returns:
+            dict: pattern（CompiledWakuPattern）/ occupancy（DayOccupancy）/ stylists（判定順）/
+                  minute_unit / waku_range
+        """
+        return {
+            "pattern": self.get_compiled_pattern(),
+            "occupancy": self._get_day_occupancy(day, exclude_usercd),
+            "stylists": self._get_reference('stylists', self._load_stylists),
+            "minute_unit": self.get_minute_unit(),
+            "waku_range": self._get_wakurange_from_db(),
+        }
+    
+    def get_menu_minute_types(self):
+        """物件のメニューに登録された MinuteType の一覧（1を含む。昇順）"""
+        profile = self._get_profile()
+        return sorted({1} | {profile.minute_type(menu_cd) for menu_cd in profile.menu_minute_types})
+    
+    def get_available_stylists(self, target_datetime, exclude_usercd=None):
+        """
+        指定日時（YYYY-MM-DD HH:MM）に予約数が NumberOfLines 未満の通常スタイリストを取得
+        （対象日の予約占有状況から算出するため、同じ日の時間枠ごとにクエリを発行しない）
+        
+        Returns:
+            list: [(スタイリストの行, 現在の予約数)]（StylistCD 順。NumberOfLines 未設定は含まない）
+        """
+        target = datetime.strptime(target_datetime, "%Y-%m-%d %H:%M")
+        minute_of_day = target.hour * 60 + target.minute
+        occupancy = self._get_day_occupancy(target.date(), exclude_usercd)
+        
+        available = []
+        for stylist in self._get_reference('stylists', self._load_stylists):
+            current_reservations = occupancy.stylist(minute_of_day, stylist["StylistCD"])
+            if stylist["NumberOfLines"] is not None and current_reservations < stylist["NumberOfLines"]:
+                available.append((stylist, current_reservations))
+        return available
+    
+    def _is_stylist_available_php_style(self, day, t_minute, minute_unit, minute_type, stylist_cd, number_of_lines, exclude_usercd):
         """PHPのgetAkiWakuAMPMTime2関数と同様のスタイリスト空き判定"""
         try:
             # 連続枠の各時間で予約をチェック
             for j in range(minute_type):
-                check_time = t_time + timedelta(minutes=minute_unit * j)
-                tstr = check_time.strftime("%Y-%m-%d %H:%M")
+                check_minute = t_minute + minute_unit * j
                 
                 # このスタイリストのこの時間の予約数を取得
-                reserved_count = self._get_stylist_reservation_count(tstr, stylist_cd, exclude_usercd)
+                reserved_count = self._get_stylist_reservation_count(day, check_minute, stylist_cd, exclude_usercd)
                 
                 # 予約数がNumberOfLinesを超えているかチェック
                 if reserved_count >= number_of_lines:
@@ -219,38 +358,59 @@ class SlotAvailabilityChecker:
             print(f"[_is_stylist_available_php_style] エラー: {e}")
             return False
     
-    def _get_reservation_count(self, datetime_str, exclude_usercd=None):
-        """指定時刻の予約数を取得"""
+    def _get_day_occupancy(self, day, exclude_usercd=None):
+        """指定日の予約占有状況を取得（1日分を1クエリでまとめて読み込み、以降はメモリから返す）"""
+        key = (day, exclude_usercd or None)
+        if key not in self._occupancy:
+            loaded = self._load_occupancy(day, 1, exclude_usercd)
+            self._occupancy[key] = loaded[day]
+        return self._occupancy[key]
+    
+    def _load_occupancy(self, date_from, days, exclude_usercd=None):
+        """
+        予約占有状況を読み込む（全予約の集計はプロセス内キャッシュを経由し、
+        特定UserCDを除外する集計・キャッシュ不使用時は都度DBから読み込む）
+        """
+        if exclude_usercd or not self.use_cache:
+            return load_occupancy(self.connection, self.building_id, date_from, days, exclude_usercd)
+        return get_cached_occupancy(self.connection, self.building_id, date_from, days)
+    
+    def _get_reservation_count(self, day, minute_of_day, exclude_usercd=None):
+        """指定日・指定時刻（0時からの経過分）の予約数を取得"""
         try:
-            if exclude_usercd:
-                sql = '''SELECT COUNT(*) AS cnt FROM tReservationF WHERE MukouFlg = 0 AND Status = 1 AND ClientCD = %s AND DATE_FORMAT(TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s AND UserCD != %s'''
-                result = DBUtils.execute_single_query(self.connection, sql, (self.building_id, datetime_str, exclude_usercd))
-            else:
-                sql = '''SELECT COUNT(*) AS cnt FROM tReservationF WHERE MukouFlg = 0 AND Status = 1 AND ClientCD = %s AND DATE_FORMAT(TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s'''
-                result = DBUtils.execute_single_query(self.connection, sql, (self.building_id, datetime_str))
-            
-            return result["cnt"] if result else 0
+            return self._get_day_occupancy(day, exclude_usercd).total(minute_of_day)
         except Exception:
             return 0
     
-    def _get_stylist_reservation_count(self, datetime_str, stylist_cd, exclude_usercd=None):
-        """特定スタイリストの指定時刻の予約数を取得"""
+    def _get_stylist_reservation_count(self, day, minute_of_day, stylist_cd, exclude_usercd=None):
+        """特定スタイリストの指定日・指定時刻（0時からの経過分）の予約数を取得"""
         try:
-            if exclude_usercd:
-                sql = '''SELECT COUNT(*) AS cnt FROM tReservationF WHERE MukouFlg = 0 AND Status = 1 AND ClientCD = %s AND DATE_FORMAT(TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s AND StylistCD = %s AND UserCD != %s'''
-                result = DBUtils.execute_single_query(self.connection, sql, (self.building_id, datetime_str, stylist_cd, exclude_usercd))
-            else:
-                sql = '''SELECT COUNT(*) AS cnt FROM tReservationF WHERE MukouFlg = 0 AND Status = 1 AND ClientCD = %s AND DATE_FORMAT(TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s AND StylistCD = %s'''
-                result = DBUtils.execute_single_query(self.connection, sql, (self.building_id, datetime_str, stylist_cd))
-            
-            return result["cnt"] if result else 0
+            return self._get_day_occupancy(day, exclude_usercd).stylist(minute_of_day, stylist_cd)
         except Exception:
             return 0
 
-
 def is_slot_available(building_id: str, target_datetime: str, connection=None, exclude_usercd=None, menu_cd=None):
     """
     指定の物件・日時で予約枠に空きがあるか判定する（レガシー関数）
     """
     with SlotAvailabilityChecker(building_id, connection) as checker:
         return checker.check_slot_availability(target_datetime, exclude_usercd, menu_cd)
+
+
+@async_db_connection
+async def check_slot_availability_async(building_id: str, target_datetime: str, exclude_usercd=None,
+                                        menu_cd=None, connection=None):
+    """
+    指定の物件・日時で予約枠に空きがあるか判定する（asyncio 版）
+    """
+    try:
+        day = TimeUtils.parse_date(target_datetime.split()[0])
+    except Exception:
+        return {"available": False, "type": None}
+    checker = SlotAvailabilityChecker(building_id, connection)
+    try:
+        await checker.prefetch_async(day, 1, exclude_usercd)
+    except Exception as e:
+        print(f"[check_slot_availability_async] エラー: {e}")
+        return {"available": False, "type": None}
+    return checker.check_slot_availability(target_datetime, exclude_usercd, menu_cd)
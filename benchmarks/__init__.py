@@ -0,0 +1,8 @@
+"""
+オフラインベンチマーク
+本番の MySQL を使わずに、SQLite 上の同一スキーマで主要処理の実行時間・DB往復回数・読み取り行数を計測する
+
+使用方法:
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
@@ -0,0 +1,227 @@
+"""
+オフラインベンチマークの実行
+SQLite 上に投入したデータで主要処理を繰り返し実行し、処理ごとの実行時間・DB往復回数・読み取り行数を集計する
+
+使用方法:
+    python -m benchmarks.run                                           # 結果を表示
+    python -m benchmarks.run --output benchmarks/results/baseline.json # 結果を保存
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+from benchmarks.seed import seed_database, DEFAULT_SEED
+from benchmarks.sqlite_db import SQLiteConnection
+from first_choice_updater import get_available_slots, update_first_choice
+from reservation_fetcher import get_reservation_summary
+from utils.building_profile import invalidate_building_profile
+from utils.id_allocator import get_taio_cd_allocator
+from utils.occupancy import invalidate_occupancy
+
+
+DEFAULT_ITERATIONS = 50
+
+# 比較時に差分として扱う変化率
+DEFAULT_TOLERANCE = 0.10
+
+
+def clear_caches():
+    """プロセス内キャッシュ（参照データ・予約占有状況）を破棄する"""
+    invalidate_building_profile()
+    invalidate_occupancy()
+
+
+def _summarize(samples):
+    """1処理分の計測値を集計する"""
+    wall_ms = sorted(s["wall_ms"] for s in samples)
+    p95_index = min(len(wall_ms) - 1, int(round(len(wall_ms) * 0.95)) - 1)
+    outcomes = {}
+    for s in samples:
+        outcomes[s["outcome"]] = outcomes.get(s["outcome"], 0) + 1
+    return {
+        "iterations": len(samples),
+        "wall_ms": {
+            "mean": round(statistics.fmean(wall_ms), 3),
+            "median": round(statistics.median(wall_ms), 3),
+            "p95": round(wall_ms[max(p95_index, 0)], 3),
+            "min": round(wall_ms[0], 3),
+            "max": round(wall_ms[-1], 3),
+        },
+        "queries": round(statistics.fmean(s["queries"] for s in samples), 2),
+        "round_trips": round(statistics.fmean(s["round_trips"] for s in samples), 2),
+        "rows_read": round(statistics.fmean(s["rows_read"] for s in samples), 2),
+        "outcomes": outcomes,
+    }
+
+
+def _measure(connection, func, *args, cold=True, **kwargs):
+    """1回分の実行時間・DB往復回数・読み取り行数を計測する"""
+    if cold:
+        clear_caches()
+    connection.reset_stats()
+    # 処理内のデバッグ出力はコンソールに出さない
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = func(*args, connection=connection, **kwargs)
+        wall_ms = (time.perf_counter() - started) * 1000
+    outcome = "ok" if isinstance(result, dict) and result.get("result") == "ok" else "error"
+    return dict(connection.stats, wall_ms=wall_ms, outcome=outcome)
+
+
+def _operations(dataset, iterations, rng):
+    """ベンチマーク対象の処理と引数（反復回数分）"""
+    buildings = dataset["buildings"]
+    start_date = datetime.strptime(dataset["start_date"], "%Y-%m-%d").date()
+    days = dataset["config"]["days"]
+
+    def slot_args():
+        building = rng.choice(buildings)
+        day = start_date + timedelta(days=rng.randrange(days))
+        return (building["client_cd"], day.strftime("%Y-%m-%d"))
+
+    def summary_args():
+        building = rng.choice(buildings)
+        return (rng.choice(building["users"]), building["client_cd"])
+
+    def update_args():
+        # 有効な予約を持つ利用者のみ（予約がない利用者ではエラー応答の計測になる）
+        building = rng.choice([b for b in buildings if b["active_users"]])
+        target = rng.choice(building["bookable"]) if building["bookable"] else datetime.now()
+        return (rng.choice(building["active_users"]), building["client_cd"], target.strftime("%Y-%m-%d %H:%M"))
+
+    return [
+        ("get_available_slots", get_available_slots, [slot_args() for _ in range(iterations)], True),
+        ("get_available_slots (warm)", get_available_slots, [slot_args() for _ in range(iterations)], False),
+        ("get_reservation_summary", get_reservation_summary, [summary_args() for _ in range(iterations)], True),
+        ("update_first_choice", update_first_choice, [update_args() for _ in range(iterations)], True),
+    ]
+
+
+def run_benchmarks(iterations=DEFAULT_ITERATIONS, database=":memory:", **seed_options):
+    """
+    データを投入して全処理を計測する
+
+    Args:
+        iterations: 処理ごとの反復回数
+        database: SQLite のファイルパス（既定はメモリ上）
+        **seed_options: benchmarks.seed.DEFAULT_SEED の上書き
+
+    Returns:
+        dict: 計測結果（JSON 保存用）
+    """
+    connection = SQLiteConnection(database)
+    # 別のデータベースで確保済みの TaioCD を使わない
+    get_taio_cd_allocator().discard()
+    try:
+        dataset = seed_database(connection, **seed_options)
+        rng = random.Random(dataset["config"]["random_seed"])
+        results = {}
+        for name, func, arg_list, cold in _operations(dataset, iterations, rng):
+            clear_caches()
+            # 初回のみ発生する処理（枠パターンの読み込み等）を計測から除く
+            # （キャッシュありの計測では対象の全引数を1回ずつ実行してキャッシュを温めておく）
+            for args in (arg_list[:1] if cold else arg_list):
+                _measure(connection, func, *args, cold=cold)
+            samples = [_measure(connection, func, *args, cold=cold) for args in arg_list]
+            results[name] = _summarize(samples)
+
+        return {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "seed": {key: value for key, value in dataset["config"].items()},
+            "row_counts": dataset["row_counts"],
+            "operations": results,
+        }
+    finally:
+        clear_caches()
+        connection.dispose()
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    基準結果と比較する
+
+    Returns:
+        list: 処理ごとの比較結果（指標ごとの基準値・今回値・変化率）
+    """
+    rows = []
+    for name, result in current["operations"].items():
+        base = baseline.get("operations", {}).get(name)
+        if base is None:
+            continue
+        for metric, before, after in (
+            ("wall_ms.median", base["wall_ms"]["median"], result["wall_ms"]["median"]),
+            ("wall_ms.p95", base["wall_ms"]["p95"], result["wall_ms"]["p95"]),
+            ("queries", base["queries"], result["queries"]),
+            ("round_trips", base["round_trips"], result["round_trips"]),
+            ("rows_read", base["rows_read"], result["rows_read"]),
+        ):
+            change = (after - before) / before if before else (0.0 if after == before else float("inf"))
+            status = "same"
+            if change > tolerance:
+                status = "worse"
+            elif change < -tolerance:
+                status = "better"
+            rows.append({"operation": name, "metric": metric, "baseline": before, "current": after,
+                         "change": round(change, 4), "status": status})
+    return rows
+
+
+def _print_results(result):
+    print(f"{'operation':<30}{'median ms':>12}{'p95 ms':>12}{'queries':>10}{'trips':>10}{'rows':>10}  outcomes")
+    for name, r in result["operations"].items():
+        print(f"{name:<30}{r['wall_ms']['median']:>12.3f}{r['wall_ms']['p95']:>12.3f}"
+              f"{r['queries']:>10.2f}{r['round_trips']:>10.2f}{r['rows_read']:>10.2f}  {r['outcomes']}")
+
+
+def _print_comparison(rows):
+    print(f"{'operation':<30}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}  status")
+    for row in rows:
+        print(f"{row['operation']:<30}{row['metric']:<16}{row['baseline']:>12}{row['current']:>12}"
+              f"{row['change']:>+10.1%}  {row['status']}")
+
+
+def main() -> None:
+    """CLI エントリポイント"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks on a SQLite stand-in database")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--buildings", type=int, default=DEFAULT_SEED["buildings"])
+    parser.add_argument("--users", type=int, default=DEFAULT_SEED["users_per_building"])
+    parser.add_argument("--days", type=int, default=DEFAULT_SEED["days"])
+    parser.add_argument("--database", default=":memory:", help="SQLite file path (default: in-memory)")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    result = run_benchmarks(
+        iterations=args.iterations, database=args.database,
+        buildings=args.buildings, users_per_building=args.users, days=args.days)
+    _print_results(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(baseline, result, args.tolerance)
+        print()
+        _print_comparison(rows)
+        if any(row["status"] == "worse" and not row["metric"].startswith("wall_ms") for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
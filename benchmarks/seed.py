@@ -0,0 +1,160 @@
+"""
+ベンチマーク用データの投入
+物件・スタイリスト・メニュー・利用者・予約・対応履歴を、乱数シード固定で再現可能に生成する
+"""
+import random
+from datetime import datetime, date, timedelta
+
+from migrations.reservation_indexes import INDEXES
+from utils.id_allocator import TAIO_CD_SEQUENCE
+from utils.waku_loader import get_waku_pattern_registry
+
+
+# 既定の投入件数（1物件あたりの値は物件数に掛けた件数になる）
+DEFAULT_SEED = {
+    "buildings": 20,
+    "stylists_per_building": (3, 6),
+    "menus_per_building": 6,
+    "users_per_building": 200,
+    "days": 42,
+    "fill_ratio": 0.6,
+    "history_per_user": 3,
+    "taio_per_user": 4,
+    "random_seed": 20240115,
+}
+
+# 平日の営業時間（分。first_choice_updater の既定値 09:00-18:00 と同じ。開始時刻がこの範囲外の枠は予約できない）
+BUSINESS_MINUTES = (9 * 60, 18 * 60)
+
+
+def first_business_day(today=None):
+    """翌週の月曜日（データの曜日配置を実行日に依存させないための開始日）"""
+    today = today or date.today()
+    return today + timedelta(days=7 - today.weekday())
+
+
+def seed_database(connection, start_date=None, **options):
+    """
+    スキーマを作成してデータを投入する
+
+    Args:
+        connection: SQLiteConnection
+        start_date: 予約を生成する期間の開始日（未指定時は翌週の月曜日）
+        **options: DEFAULT_SEED の上書き
+
+    Returns:
+        dict: 投入したデータの概要（ベンチマーク対象の選定に使う）
+    """
+    config = dict(DEFAULT_SEED, **options)
+    rng = random.Random(config["random_seed"])
+    start_date = start_date or first_business_day()
+    # 予約の時刻は分単位で照合されるため、秒を切り捨てておく（秒が残ると更新対象の予約が見つからない）
+    now = datetime.now().replace(second=0, microsecond=0)
+
+    connection.init_schema(INDEXES)
+    patterns = get_waku_pattern_registry()
+    pattern_ids = sorted(pid for pid in patterns.get_patterns() if patterns.get_compiled(pid) is not None)
+
+    buildings = []
+    rows = {name: [] for name in ("tClientM", "tSettingM", "tStylistM", "tMenuM", "tUserM", "tReservationF", "tTaioF")}
+    taio_cd = 0
+    for b in range(config["buildings"]):
+        client_cd = str(3700 + b)
+        minute_unit = rng.choice((30, 60))
+        pattern_id = rng.choice(pattern_ids)
+        compiled = patterns.get_compiled(pattern_id)
+        slots = [(s, e) for s, e in zip(compiled.start_minutes, compiled.end_minutes) if s is not None and e is not None]
+        stylist_count = rng.randint(*config["stylists_per_building"])
+        waku_range = "-".join(str(rng.randint(stylist_count * 2, stylist_count * 6)) for _ in slots)
+
+        rows["tClientM"].append((client_cd, f"ベンチマーク物件{b + 1}", now, now))
+        rows["tSettingM"].append((client_cd, minute_unit, pattern_id, waku_range))
+        stylists = [str(s + 1) for s in range(stylist_count)]
+        for stylist_cd in stylists:
+            rows["tStylistM"].append((client_cd, stylist_cd, f"担当{stylist_cd}", rng.randint(1, 3), 0, 0))
+        # 枠越え用スタイリスト（判定対象外）
+        rows["tStylistM"].append((client_cd, "99", "枠越え", 9, 0, 1))
+        for m in range(config["menus_per_building"]):
+            rows["tMenuM"].append((client_cd, str(m + 1), f"メニュー{m + 1}", rng.choice((1, 1, 1, 2, 3)), 0))
+
+        # 予約可能な時刻（平日の営業時間内の枠・分単位刻み）
+        bookable = []
+        for offset in range(config["days"]):
+            day = start_date + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            for slot_start, slot_end in slots:
+                for minute in range(slot_start, slot_end, minute_unit):
+                    if not BUSINESS_MINUTES[0] <= minute < BUSINESS_MINUTES[1]:
+                        continue
+                    bookable.append(datetime(day.year, day.month, day.day) + timedelta(minutes=minute))
+
+        users = []
+        # 有効な予約（無効化されていない予約）を持つ利用者（予約変更の計測対象）
+        active_users = []
+        for u in range(config["users_per_building"]):
+            user_cd = str(101 + u)
+            users.append(user_cd)
+            rows["tUserM"].append((user_cd, client_cd, f"pw{user_cd}", f"090{rng.randint(10000000, 99999999)}",
+                                   f"利用者{user_cd}", rng.randint(0, 1), now, now))
+
+            # 過去の予約（無効化済みを含む）
+            active = False
+            for h in range(config["history_per_user"]):
+                past = now - timedelta(days=rng.randint(30, 720), minutes=rng.randint(0, 600))
+                mukou_flg = rng.choice((0, 0, 1))
+                active = active or mukou_flg == 0
+                rows["tReservationF"].append((
+                    user_cd, client_cd, past, past + timedelta(minutes=minute_unit), None,
+                    rng.choice(stylists), 1, mukou_flg, past, past, "0", "0"))
+
+            # 今後の予約（有効予約は予約可能な時刻に配置）
+            if bookable and rng.random() < config["fill_ratio"]:
+                time_from = rng.choice(bookable)
+                created = now - timedelta(days=rng.randint(1, 60))
+                rows["tReservationF"].append((
+                    user_cd, client_cd, time_from, time_from + timedelta(minutes=minute_unit),
+                    rng.choice((None, None, "平日午前希望", "土日希望")), rng.choice(stylists),
+                    rng.choice((1, 1, 1, 1, 0)), 0, created, created, "0", "0"))
+                active = True
+            if active:
+                active_users.append(user_cd)
+
+            for t in range(config["taio_per_user"]):
+                taio_cd += 1
+                created = now - timedelta(days=rng.randint(0, 720))
+                category = rng.choice(("|1|", "|2|", "|3|"))
+                rows["tTaioF"].append((
+                    taio_cd, client_cd, user_cd, category, f"[ベンチマーク] 対応履歴{t + 1}",
+                    None, "0", "0", created, created, 0))
+
+        buildings.append({"client_cd": client_cd, "users": users, "active_users": active_users, "bookable": bookable})
+
+    statements = {
+        "tClientM": "INSERT INTO tClientM (ClientCD, MansionName, Created, Updated) VALUES (%s, %s, %s, %s)",
+        "tSettingM": "INSERT INTO tSettingM (ClientCD, MinuteUnit, WakuPattern, WakuRange) VALUES (%s, %s, %s, %s)",
+        "tStylistM": """INSERT INTO tStylistM (ClientCD, StylistCD, StylistName, NumberOfLines, MukouFlg, WakugoeFlg)
+                        VALUES (%s, %s, %s, %s, %s, %s)""",
+        "tMenuM": "INSERT INTO tMenuM (ClientCD, MenuCD, MenuName, MinuteType, MukouFlg) VALUES (%s, %s, %s, %s, %s)",
+        "tUserM": """INSERT INTO tUserM (UserCD, ClientCD, Passwd, TEL, LastName, ReplyFlg, Created, Updated)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+        "tReservationF": """INSERT INTO tReservationF (UserCD, ClientCD, TimeFrom, TimeTo, SecondChoice, StylistCD,
+                            Status, MukouFlg, Created, Updated, Creator, Updater)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        "tTaioF": """INSERT INTO tTaioF (TaioCD, ClientCD, UserCD, Category, TaioNotes, LastTimeNittei,
+                     Creator, Updater, Created, Updated, MukouFlg)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+    }
+    with connection.cursor() as cursor:
+        for table, sql in statements.items():
+            cursor.executemany(sql, rows[table])
+        # TaioCD の採番行（migrations/taio_sequence.py の apply と同じ開始値）
+        cursor.execute("INSERT INTO tSequenceM (SeqName, NextValue) VALUES (%s, %s)", (TAIO_CD_SEQUENCE, taio_cd + 1))
+    connection.commit()
+
+    return {
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "config": config,
+        "row_counts": {table: len(values) for table, values in rows.items()},
+        "buildings": buildings,
+    }
@@ -0,0 +1,252 @@
+"""
+SQLite を使った pymysql 互換の接続（ベンチマーク用のローカルDB）
+本リポジトリが発行する MySQL 方言の SQL を SQLite 向けに変換して実行し、
+DB往復回数・読み取り行数を記録する
+"""
+import re
+import sqlite3
+from datetime import datetime, date
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tReservationF (
+    UserCD TEXT, ClientCD TEXT, TimeFrom DATETIME, TimeTo DATETIME, SecondChoice TEXT,
+    StylistCD TEXT, Status INTEGER, MukouFlg INTEGER DEFAULT 0,
+    Created DATETIME, Updated DATETIME, Creator TEXT, Updater TEXT
+);
+CREATE TABLE IF NOT EXISTS tSettingM (
+    ClientCD TEXT PRIMARY KEY, MinuteUnit INTEGER, WakuPattern INTEGER, WakuRange TEXT
+);
+CREATE TABLE IF NOT EXISTS tStylistM (
+    ClientCD TEXT, StylistCD TEXT, StylistName TEXT, NumberOfLines INTEGER,
+    MukouFlg INTEGER DEFAULT 0, WakugoeFlg INTEGER
+);
+CREATE TABLE IF NOT EXISTS tMenuM (
+    ClientCD TEXT, MenuCD TEXT, MenuName TEXT, MinuteType INTEGER, MukouFlg INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tUserM (
+    UserCD TEXT, ClientCD TEXT, Passwd TEXT, TEL TEXT, LastName TEXT, ReplyFlg INTEGER,
+    Created DATETIME, Updated DATETIME
+);
+CREATE TABLE IF NOT EXISTS tClientM (
+    ClientCD TEXT PRIMARY KEY, MansionName TEXT, Created DATETIME, Updated DATETIME
+);
+CREATE TABLE IF NOT EXISTS tTaioF (
+    TaioCD INTEGER, ClientCD TEXT, UserCD TEXT, Category TEXT, TaioNotes TEXT, LastTimeNittei DATETIME,
+    Creator TEXT, Updater TEXT, Created DATETIME, Updated DATETIME, MukouFlg INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tSequenceM (
+    SeqName TEXT PRIMARY KEY, NextValue INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_client ON tUserM (UserCD, ClientCD);
+CREATE INDEX IF NOT EXISTS idx_stylist_client ON tStylistM (ClientCD, StylistCD);
+CREATE INDEX IF NOT EXISTS idx_menu_client ON tMenuM (ClientCD, MenuCD);
+CREATE INDEX IF NOT EXISTS idx_taio_cd ON tTaioF (TaioCD);
+"""
+
+_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+_DATETIME_MINUTE_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DATETIME_COLUMNS = r"(?:\w+\.)?(?:TimeFrom|TimeTo|Updated|Created|LastTimeNittei)"
+_UPDATE_JOIN_RE = re.compile(
+    r"\s*UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+?)\s+WHERE\s+(.+)$",
+    re.S | re.I)
+
+
+def _split_args(text):
+    """関数呼び出しの引数部分をトップレベルのカンマで分割"""
+    args, depth, current, quote = [], 0, "", None
+    for ch in text:
+        if quote:
+            current += ch
+            if ch == quote:
+                quote = None
+            continue
+        if ch in "'\"":
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            args.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    args.append(current.strip())
+    return args
+
+
+def _replace_function(sql, name, build):
+    """SQL 内の NAME(...) を build(引数リスト) の結果に置き換える（入れ子の括弧に対応）"""
+    pattern = re.compile(r"\b" + name + r"\s*\(", re.I)
+    out, pos = [], 0
+    while True:
+        m = pattern.search(sql, pos)
+        if not m:
+            out.append(sql[pos:])
+            return "".join(out)
+        out.append(sql[pos:m.start()])
+        depth, end = 1, m.end()
+        while depth:
+            if sql[end] == '(':
+                depth += 1
+            elif sql[end] == ')':
+                depth -= 1
+            end += 1
+        out.append(build(_split_args(sql[m.end():end - 1])))
+        pos = end
+
+
+def _date_add(args):
+    m = re.match(r"INTERVAL\s+(.+)\s+(SECOND|MINUTE|HOUR|DAY)$", args[1], re.I)
+    return f"datetime({args[0]}, '+' || ({m.group(1)}) || ' {m.group(2).lower()}s')"
+
+
+def translate_sql(sql):
+    """MySQL 方言の SQL（%s プレースホルダ）を SQLite 向けに変換"""
+    sql = sql.replace("%%", "\x00").replace("%s", "?").replace("\x00", "%")
+    sql = re.sub(r"\bNOW\(\)", "datetime('now','localtime')", sql, flags=re.I)
+    sql = re.sub(r"\bFOR\s+UPDATE\b", "", sql, flags=re.I)
+    sql = _replace_function(sql, "DATE_FORMAT", lambda a: f"strftime({a[1].replace('%i', '%M')}, {a[0]})")
+    sql = _replace_function(sql, "HOUR", lambda a: f"CAST(strftime('%H', {a[0]}) AS INTEGER)")
+    sql = _replace_function(sql, "MINUTE", lambda a: f"CAST(strftime('%M', {a[0]}) AS INTEGER)")
+    sql = _replace_function(sql, "DATE_ADD", _date_add)
+    sql = _replace_function(sql, "GREATEST", lambda a: f"MAX({', '.join(a)})")
+    # "YYYY-MM-DD HH:MM" の引数を日時カラムと比較できるよう秒を補う
+    sql = re.sub(r"(" + _DATETIME_COLUMNS + r"\s*(?:=|>=|<=|<|>|!=)\s*)\?", r"\1normalize_datetime(?)", sql)
+
+    # UPDATE a x JOIN b y ON ... SET ... WHERE ... → UPDATE ... FROM ...
+    m = _UPDATE_JOIN_RE.match(sql)
+    if m:
+        table, alias, join_table, join_alias, on, sets, where = m.groups()
+        sets = re.sub(r"(^|,)\s*" + alias + r"\.", r"\1 ", sets)
+        sql = (f"UPDATE {table} AS {alias} SET {sets} FROM {join_table} AS {join_alias} "
+               f"WHERE ({on}) AND ({where})")
+    return sql
+
+
+def _normalize_datetime(value):
+    if isinstance(value, str) and _DATETIME_MINUTE_RE.match(value):
+        return value + ":00"
+    return value
+
+
+def _to_param(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def _from_column(value):
+    if isinstance(value, str):
+        if _DATETIME_RE.match(value):
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        if _DATE_RE.match(value):
+            return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+class SQLiteCursor:
+    """pymysql の DictCursor 互換カーソル"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        if isinstance(params, (str, int)):
+            params = (params,)
+        self.connection.stats["queries"] += 1
+        self.connection.stats["round_trips"] += 1
+        cursor = self.connection.db.execute(translate_sql(sql), [_to_param(p) for p in (params or ())])
+        self.lastrowid = cursor.lastrowid
+        if cursor.description:
+            columns = [d[0] for d in cursor.description]
+            self._rows = [{c: _from_column(v) for c, v in zip(columns, row)} for row in cursor.fetchall()]
+            self.connection.stats["rows_read"] += len(self._rows)
+            self.rowcount = len(self._rows)
+        else:
+            self._rows = []
+            self.rowcount = cursor.rowcount
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        # pymysql と同様に1回の往復として数える
+        self.connection.stats["queries"] += 1
+        self.connection.stats["round_trips"] += 1
+        cursor = self.connection.db.executemany(
+            translate_sql(sql), [[_to_param(p) for p in params] for params in seq_of_params])
+        self._rows = []
+        self.rowcount = cursor.rowcount
+        return self.rowcount
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def close(self):
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SQLiteConnection:
+    """pymysql.Connection 互換の SQLite 接続（close() では切断しない）"""
+
+    def __init__(self, path=":memory:"):
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.create_function("normalize_datetime", 1, _normalize_datetime)
+        self.stats = {}
+        self.reset_stats()
+
+    def init_schema(self, extra_indexes=()):
+        """スキーマを作成する（extra_indexes: (テーブル名, インデックス名, カラム) のリスト）"""
+        self.db.executescript(SCHEMA)
+        for table, name, columns in extra_indexes:
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+    def reset_stats(self):
+        """DB往復回数・読み取り行数をリセットする"""
+        self.stats = {"queries": 0, "round_trips": 0, "rows_read": 0}
+
+    def cursor(self, cursor_class=None):
+        return SQLiteCursor(self)
+
+    def begin(self):
+        self.stats["round_trips"] += 1
+
+    def commit(self):
+        self.stats["round_trips"] += 1
+
+    def rollback(self):
+        self.stats["round_trips"] += 1
+
+    def ping(self, reconnect=True):
+        self.stats["round_trips"] += 1
+
+    def close(self):
+        pass
+
+    def dispose(self):
+        """SQLite の接続を閉じる"""
+        self.db.close()
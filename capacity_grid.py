@@ -0,0 +1,206 @@
+"""
+空き枠の一括判定エンジン（NumPy）
+1日分の予約数を「スタイリスト × 分」の行列として保持し、
+枠ごとの WakuRange 合計を累積和で、連続枠（MinuteType）の空きをスライディングウィンドウで判定する。
+判定結果は SlotAvailabilityChecker.check_slot_availability と一致する。
+"""
+from datetime import datetime, timedelta
+from numbers import Number
+
+try:
+    import numpy as np
+except ImportError:  # numpy はオプション（一括判定を使う場合のみ必要）
+    np = None
+
+from availability_checker import SlotAvailabilityChecker
+from utils.db_utils import db_connection
+
+
+MINUTES_PER_DAY = 24 * 60
+
+UNAVAILABLE = {"available": False, "type": None}
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("capacity_grid には numpy が必要です（pip install numpy）")
+
+
+def _capacity(number_of_lines):
+    """NumberOfLines を比較用の値に変換（数値以外・未設定は常に満枠扱い）"""
+    if isinstance(number_of_lines, Number):
+        return float(number_of_lines)
+    return float("-inf")
+
+
+class DayCapacityGrid:
+    """1物件・1日分の予約数行列と、枠パターンに沿った一括判定"""
+
+    def __init__(self, day, pattern, occupancy, stylists, minute_unit, waku_range):
+        """
+        Args:
+            day: 対象日（date）
+            pattern: CompiledWakuPattern
+            occupancy: DayOccupancy（対象日の予約数）
+            stylists: 通常スタイリスト（StylistCD, NumberOfLines を持つ行。判定順）
+            minute_unit: 分単位
+            waku_range: 枠ごとの予約数上限リスト
+        """
+        _require_numpy()
+        self.day = day
+        self.pattern = pattern
+        self.stylists = list(stylists)
+        self.minute_unit = minute_unit
+        self.waku_range = list(waku_range or [])
+
+        # 全予約（スタイリストを問わない）の分ごとの件数
+        self.totals = np.zeros(MINUTES_PER_DAY, dtype=np.int64)
+        for minute, cnt in occupancy.totals.items():
+            if 0 <= minute < MINUTES_PER_DAY:
+                self.totals[minute] = cnt
+
+        # スタイリスト × 分 の予約数行列（行の順序は判定順。予約のある分のみ DayOccupancy から取り出す）
+        self.counts = np.zeros((len(self.stylists), MINUTES_PER_DAY), dtype=np.int64)
+        for minute in occupancy.counts:
+            if not 0 <= minute < MINUTES_PER_DAY:
+                continue
+            for row, stylist in enumerate(self.stylists):
+                self.counts[row, minute] = occupancy.stylist(minute, stylist["StylistCD"])
+
+        self.capacity = np.array([_capacity(s["NumberOfLines"]) for s in self.stylists], dtype=float)
+        self._slot_views = {}
+
+    @classmethod
+    def from_checker(cls, checker, day, exclude_usercd=None):
+        """SlotAvailabilityChecker が読み込んだ参照データ・予約数から行列を作成"""
+        return cls(day, **checker.get_day_inputs(day, exclude_usercd))
+
+    def _slot_view(self, slot_index):
+        """枠内の判定時刻（開始から minute_unit 刻み）の予約数の累積和を作成（枠ごとに1回）"""
+        if slot_index in self._slot_views:
+            return self._slot_views[slot_index]
+
+        view = None
+        start = self.pattern.start_minutes[slot_index]
+        end = self.pattern.end_minutes[slot_index] if slot_index < len(self.pattern.end_minutes) else None
+        unit = self.minute_unit
+        if start is not None and end is not None and isinstance(unit, int) and unit > 0:
+            waku_range_max = self.waku_range[slot_index] if slot_index < len(self.waku_range) else None
+            bins = np.arange(start, end, unit)
+            totals = self.totals[bins]
+            # 枠全体の満枠チェック
+            if waku_range_max is None or totals.sum() < waku_range_max:
+                busy = self.counts[:, bins] >= self.capacity[:, None]
+                view = {
+                    "start": start,
+                    "full_steps": (end - start) // unit,
+                    "waku_range_max": waku_range_max,
+                    "total_prefix": np.concatenate(([0], np.cumsum(totals))),
+                    "busy_prefix": np.concatenate(
+                        (np.zeros((len(self.stylists), 1), dtype=np.int64), np.cumsum(busy, axis=1)), axis=1),
+                }
+        self._slot_views[slot_index] = view
+        return view
+
+    def cell(self, slot_index, minute_type=1):
+        """
+        指定枠・指定 MinuteType の判定結果
+        （check_slot_availability と同じ形式: available / type / actual_time_from / stylist_cd）
+        """
+        if slot_index is None or not 0 <= slot_index < len(self.pattern.start_minutes):
+            return dict(UNAVAILABLE)
+        view = self._slot_view(slot_index)
+        if view is None or not self.stylists:
+            return dict(UNAVAILABLE)
+
+        # 判定時刻 k（開始 + k * minute_unit）から連続 minute_type 個の判定時刻が枠内に収まる範囲
+        windows = view["full_steps"] - minute_type + 1
+        if windows <= 0:
+            return dict(UNAVAILABLE)
+
+        if minute_type >= 1:
+            total_prefix = view["total_prefix"]
+            busy_prefix = view["busy_prefix"]
+            window_totals = total_prefix[minute_type:minute_type + windows] - total_prefix[:windows]
+            free = (busy_prefix[:, minute_type:minute_type + windows] - busy_prefix[:, :windows]) == 0
+        else:
+            # 連続枠数が0以下の場合は予約数を見ずに先頭の判定時刻で空きとなる
+            window_totals = np.zeros(1, dtype=np.int64)
+            free = np.ones((len(self.stylists), 1), dtype=bool)
+
+        waku_range_max = view["waku_range_max"]
+        candidates = free.any(axis=0)
+        if waku_range_max is not None:
+            candidates &= window_totals < waku_range_max
+        if not candidates.any():
+            return dict(UNAVAILABLE)
+
+        k = int(np.argmax(candidates))
+        stylist = self.stylists[int(np.argmax(free[:, k]))]
+        minute = view["start"] + k * self.minute_unit
+        return {
+            "available": True,
+            "type": "normal",
+            "actual_time_from": f"{self.day.strftime('%Y-%m-%d')} {minute // 60:02d}:{minute % 60:02d}",
+            "stylist_cd": stylist["StylistCD"],
+        }
+
+    def evaluate(self, minute_types=(1,)):
+        """全枠 × 指定 MinuteType の判定結果 {minute_type: [枠ごとの結果]}"""
+        return {
+            minute_type: [self.cell(idx, minute_type) for idx in range(len(self.pattern.start_minutes))]
+            for minute_type in minute_types
+        }
+
+    def availability_matrix(self, minute_types=(1,)):
+        """全枠 × 指定 MinuteType の空き有無を bool 行列（枠 × MinuteType）で返す"""
+        slots = len(self.pattern.start_minutes)
+        matrix = np.zeros((slots, len(minute_types)), dtype=bool)
+        for col, minute_type in enumerate(minute_types):
+            for idx in range(slots):
+                matrix[idx, col] = self.cell(idx, minute_type)["available"]
+        return matrix
+
+
+def building_minute_types(checker):
+    """物件のメニューに登録された MinuteType の一覧（1を含む）"""
+    return checker.get_menu_minute_types()
+
+
+@db_connection
+def evaluate_building(building_id, date_from, days=1, minute_types=None, exclude_usercd=None, connection=None):
+    """
+    1物件の複数日 × 全枠 × MinuteType の空き状況を一括判定
+    （参照データ・予約は期間全体で1回ずつ読み込む）
+
+    Returns:
+        dict: {"YYYY-MM-DD": {minute_type: [枠ごとの結果]}}（パターン未設定の場合は空の dict）
+    """
+    _require_numpy()
+    if isinstance(date_from, str):
+        date_from = datetime.strptime(date_from, "%Y-%m-%d").date()
+    elif isinstance(date_from, datetime):
+        date_from = date_from.date()
+
+    with SlotAvailabilityChecker(building_id, connection) as checker:
+        if checker.get_compiled_pattern() is None:
+            return {}
+        if minute_types is None:
+            minute_types = building_minute_types(checker)
+        checker.prefetch_occupancy(date_from, days, exclude_usercd)
+
+        result = {}
+        for offset in range(days):
+            day = date_from + timedelta(days=offset)
+            grid = DayCapacityGrid.from_checker(checker, day, exclude_usercd)
+            result[day.strftime("%Y-%m-%d")] = grid.evaluate(minute_types)
+        return result
+
+
+@db_connection
+def evaluate_buildings(building_ids, date_from, days=1, minute_types=None, connection=None):
+    """複数物件の空き状況を一括判定 {building_id: evaluate_building の結果}"""
+    return {
+        building_id: evaluate_building(building_id, date_from, days, minute_types, connection=connection)
+        for building_id in building_ids
+    }
@@ -1,38 +1,358 @@
 import os
-import pymysql
+import threading
+import time
 from dotenv import load_dotenv
 
-def get_connection():
-    """
-    データベースへの接続を取得します。
+from utils.db_driver import get_db_driver
+
 
-    Args:
-        db_name (str, optional): 接続するデータベース名。Noneの場合はデフォルトDB。
+DB_HOST = "localhost"
+DB_USER = "入力してください"
+DB_PASSWORD = "入力してください"
+DB_NAME = "入力してください"
+DB_CHARSET = "utf8"
+
+
+def get_connection_settings():
+    """
+    接続先の設定を返します（同期・非同期の接続で共通）。
 
     Returns:
-        pymysql.connections.Connection: データベース接続オブジェクト
+        dict: host / user / password / db / charset
+    """
+    return {
+        "host": DB_HOST,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "db": DB_NAME,
+        "charset": DB_CHARSET,
+    }
+
+
+def _connect():
     """
+    接続を新規に作成します（ドライバーは環境変数 DB_DRIVER で選択。utils/db_driver.py 参照）。
 
-    DB_HOST = "localhost"
-    DB_USER = "入力してください"
-    DB_PASSWORD = "入力してください"
-    DB_NAME = "入力してください"
-    DB_CHARSET = "utf8"
+    Returns:
+        データベース接続オブジェクト（DictCursor を既定のカーソルとする pymysql / MySQLdb の接続）
+    """
 
     try:
-        return pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            db=DB_NAME,
-            charset=DB_CHARSET,
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        return get_db_driver().connect(get_connection_settings())
     except Exception as e:
         print(f"DB接続エラー: {e}")
         raise
 
 
+def get_connection():
+    """
+    データベースへの接続を取得します。
+    接続プールが有効（環境変数 DB_POOL_ENABLED=1 または configure_pool(enabled=True)）な場合は
+    プールから貸し出し、close() でプールに返却されます。
+
+    Returns:
+        データベース接続オブジェクト（DictCursor を既定のカーソルとする pymysql / MySQLdb の接続）
+    """
+    pool = get_pool()
+    if pool is not None:
+        return pool.acquire()
+    return _connect()
+
+
+# 接続プール設定のデフォルト値（環境変数で上書き可能）
+POOL_DEFAULTS = {
+    "enabled": False,        # DB_POOL_ENABLED
+    "min_size": 1,           # DB_POOL_MIN_SIZE: 常に保持する接続数
+    "max_size": 10,          # DB_POOL_MAX_SIZE: 同時に貸し出せる接続数の上限
+    "idle_timeout": 300,     # DB_POOL_IDLE_TIMEOUT: 未使用のまま保持する秒数（min_size を超える分を破棄）
+    "ping": "idle",          # DB_POOL_PING: 貸し出し時の死活確認 always / idle / never
+    "ping_interval": 30,     # DB_POOL_PING_INTERVAL: ping=idle の場合に確認する未使用秒数
+    "wait_timeout": 10,      # DB_POOL_WAIT_TIMEOUT: 上限到達時に返却を待つ秒数
+}
+
+PING_POLICIES = ("always", "idle", "never")
+
+
+class PoolTimeoutError(Exception):
+    """接続プールの上限に達し、待機時間内に接続を確保できなかった"""
+
+
+class PooledConnection:
+    """プールから貸し出した接続。close() で切断せずにプールへ返却する"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._pool.release(self._raw)
+
+
+class ConnectionPool:
+    """DB接続のプール（最小/最大数・アイドル破棄・貸し出し時の ping・返却時のロールバック）"""
+
+    def __init__(self, connect=None, min_size=1, max_size=10, idle_timeout=300,
+                 ping="idle", ping_interval=30, wait_timeout=10):
+        if ping not in PING_POLICIES:
+            raise ValueError(f"ping は {PING_POLICIES} のいずれかを指定してください: {ping}")
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"プールサイズの指定が不正です: min_size={min_size}, max_size={max_size}")
+        self._connect = connect or _connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping = ping
+        self.ping_interval = ping_interval
+        self.wait_timeout = wait_timeout
+        self._idle = []  # [(接続, 返却時刻)]（末尾が直近に返却されたもの）
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "ping_failures": 0,
+            "reset_failures": 0,
+            "idle_evictions": 0,
+        }
+
+    def acquire(self):
+        """接続を貸し出す（未使用の接続が無く上限に達している場合は返却を待つ）"""
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeoutError("接続プールは終了しています")
+            self._evict_idle()
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"DB接続プールの上限（{self.max_size}）に達しました")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+
+        # 接続の作成・確認はロックの外で行う
+        try:
+            raw = self._checkout(entry)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def _checkout(self, entry):
+        if entry is not None:
+            raw, returned_at = entry
+            if self._needs_ping(returned_at):
+                try:
+                    get_db_driver().ping(raw)
+                    return raw
+                except Exception:
+                    with self._cond:
+                        self._stats["ping_failures"] += 1
+                    self._discard(raw)
+            else:
+                return raw
+        raw = self._connect()
+        with self._cond:
+            self._stats["created"] += 1
+        return raw
+
+    def _needs_ping(self, returned_at):
+        if self.ping == "always":
+            return True
+        if self.ping == "idle":
+            return time.monotonic() - returned_at >= self.ping_interval
+        return False
+
+    def release(self, raw):
+        """接続を返却する（未確定のトランザクションはロールバックしてから戻す）"""
+        reusable = True
+        try:
+            if getattr(raw, "open", True):
+                raw.rollback()
+            else:
+                reusable = False
+        except Exception:
+            reusable = False
+            with self._cond:
+                self._stats["reset_failures"] += 1
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable and not self._closed:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            self._cond.notify()
+        if raw is not None:
+            self._discard(raw)
+
+    def _evict_idle(self):
+        """idle_timeout を超えて未使用の接続を破棄（min_size までは残す。ロック取得済みで呼び出す）"""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        keep = []
+        evicted = []
+        # 古いものから順に判定し、保持数が min_size を下回らない範囲で破棄する
+        total = len(self._idle) + self._in_use
+        for raw, returned_at in self._idle:
+            if now - returned_at >= self.idle_timeout and total > self.min_size:
+                evicted.append(raw)
+                total -= 1
+            else:
+                keep.append((raw, returned_at))
+        self._idle = keep
+        self._stats["idle_evictions"] += len(evicted)
+        for raw in evicted:
+            self._discard_locked(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._discard_locked(raw)
+
+    def _discard_locked(self, raw):
+        self._stats["closed"] += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def warm_up(self):
+        """min_size まで接続を作成しておく"""
+        with self._cond:
+            missing = self.min_size - len(self._idle) - self._in_use
+        for _ in range(max(0, missing)):
+            raw = self._connect()
+            with self._cond:
+                self._stats["created"] += 1
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """未使用の接続をすべて切断し、以降の貸し出しを停止する（貸出中の接続は返却時に切断）"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for raw, _returned_at in idle:
+                self._discard_locked(raw)
+            self._cond.notify_all()
+
+    def stats(self):
+        """プールの利用状況"""
+        with self._cond:
+            return {
+                "enabled": True,
+                "size": len(self._idle) + self._in_use,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                "ping": self.ping,
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_settings = None
+_pool_lock = threading.Lock()
+
+
+def load_pool_settings():
+    """環境変数（.env を含む）から接続プール設定を読み込む"""
+    load_dotenv()
+    settings = dict(POOL_DEFAULTS)
+    settings["enabled"] = os.getenv("DB_POOL_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+    for key in ("min_size", "max_size"):
+        settings[key] = int(os.getenv(f"DB_POOL_{key.upper()}", settings[key]))
+    for key in ("idle_timeout", "ping_interval", "wait_timeout"):
+        settings[key] = float(os.getenv(f"DB_POOL_{key.upper()}", settings[key]))
+    settings["ping"] = os.getenv("DB_POOL_PING", settings["ping"]).lower()
+    return settings
+
+
+def _build_pool(settings):
+    """設定から接続プールを作成する（無効時は None）"""
+    if not settings["enabled"]:
+        return None
+    return ConnectionPool(
+        min_size=settings["min_size"],
+        max_size=settings["max_size"],
+        idle_timeout=settings["idle_timeout"],
+        ping=settings["ping"],
+        ping_interval=settings["ping_interval"],
+        wait_timeout=settings["wait_timeout"],
+    )
+
+
+def configure_pool(**settings):
+    """
+    接続プールを設定し直す（指定しない項目は環境変数・デフォルト値）
+    既存のプールは終了し、次回の get_connection から新しい設定で貸し出す
+    """
+    global _pool, _pool_settings
+    merged = load_pool_settings()
+    merged.update(settings)
+    with _pool_lock:
+        old, _pool = _pool, _build_pool(merged)
+        _pool_settings = merged
+    if old is not None:
+        old.close()
+    return _pool
+
+
+def get_pool():
+    """有効な接続プールを取得（無効時は None）"""
+    global _pool, _pool_settings
+    if _pool_settings is None:
+        # 初回の呼び出しが同時に来てもプールを1つだけ作成するよう、作成までロックを保持する
+        with _pool_lock:
+            if _pool_settings is None:
+                settings = load_pool_settings()
+                _pool = _build_pool(settings)
+                _pool_settings = settings
+            return _pool
+    return _pool
+
+
+def get_pool_stats():
+    """接続プールの利用状況（監視用）"""
+    pool = get_pool()
+    if pool is None:
+        return {"enabled": False}
+    return pool.stats()
+
+
+def close_pool():
+    """接続プールを終了する（アプリ終了時に呼び出す）"""
+    global _pool, _pool_settings
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _pool_settings = None
+    if pool is not None:
+        pool.close()
+
+
 def test_connection():
     """
     データベース接続のテスト関数
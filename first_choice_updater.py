@@ -7,12 +7,45 @@ import os
 from datetime import datetime, timedelta
 
 # ローカルモジュールをインポート
-from taio_record import insert_taio_record
+from taio_writer import log_taio_record, log_taio_record_async
 from utils import handle_db_exception
 from utils.pattern_utils import PatternUtils
 from utils.time_utils import TimeUtils
 from utils.db_utils import db_connection, DBUtils
+from utils.async_db_utils import async_db_connection, AsyncDBUtils
 from availability_checker import SlotAvailabilityChecker
+from utils.occupancy import record_reservation_move, invalidate_occupancy
+from utils.slot_locks import SlotLockTimeout, hold_slot_lock, hold_slot_lock_async
+
+
+# 空き状況カレンダーで一度に取得できる最大日数
+MAX_CALENDAR_DAYS = 31
+
+# 同じ枠への更新が集中し、枠ロックを待ち時間内に取得できなかった場合のエラー
+SLOT_BUSY_ERROR = "選択された日時へのお申し込みが集中しています。しばらくしてから再度お試しください。"
+
+CURRENT_RESERVATION_SQL = """
+SELECT TimeFrom, SecondChoice, StylistCD, Status
+FROM tReservationF 
+WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+ORDER BY TimeFrom DESC LIMIT 1
+"""
+
+UPDATE_FIRST_CHOICE_SQL = """
+UPDATE tReservationF tr
+JOIN tSettingM ts ON ts.ClientCD = tr.ClientCD
+SET tr.TimeFrom = %s,
+    tr.TimeTo   = DATE_ADD(%s, INTERVAL ts.MinuteUnit MINUTE),
+    tr.Updated  = NOW(),
+    tr.Updater  = %s
+WHERE tr.TimeFrom = %s AND tr.UserCD = %s AND tr.ClientCD = %s
+"""
+
+UPDATED_AT_SQL = """
+SELECT Updated FROM tReservationF
+WHERE TimeFrom = %s AND UserCD = %s AND ClientCD = %s
+ORDER BY Updated DESC LIMIT 1
+"""
 
 
 class FirstChoiceUpdater:
@@ -47,15 +80,9 @@ class FirstChoiceUpdater:
             if "error" in validation_result:
                 return validation_result
             
-            # 3. 空き枠チェック
-            availability_result = FirstChoiceUpdater._check_availability(
-                building_id, new_datetime, connection)
-            if "error" in availability_result:
-                return availability_result
-            
-            # 4. 第一希望更新実行
-            update_result = FirstChoiceUpdater._execute_first_choice_update(
-                room_number, building_id, new_datetime, current_reservation["datetime"], connection)
+            # 3-4. 空き枠チェックと第一希望更新（同じ枠への更新はプロセス内の枠ロックで順番に実行）
+            update_result = FirstChoiceUpdater._book_first_choice(
+                room_number, building_id, new_datetime, current_reservation, connection)
             if "error" in update_result:
                 return update_result
             
@@ -75,28 +102,78 @@ class FirstChoiceUpdater:
                                      input_params={"room_number": room_number, "building_id": building_id})
     
     @staticmethod
-    def _get_current_reservation(room_number, building_id, connection):
-        """現在の予約情報を取得"""
+    @async_db_connection
+    async def update_first_choice_async(room_number: str, building_id: str, 
+                                        new_datetime: str, connection=None) -> dict:
+        """
+        第一希望の日時を更新する（asyncio 版）
+        処理の流れ・戻り値は update_first_choice と同じ
+        """
         try:
-            sql = """
-            SELECT TimeFrom, SecondChoice
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
-            ORDER BY TimeFrom DESC LIMIT 1
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
+            current_reservation = await FirstChoiceUpdater._get_current_reservation_async(
+                room_number, building_id, connection)
+            if "error" in current_reservation:
+                return current_reservation
+            
+            # 日時の検証はDBにアクセスしないため同期版をそのまま使う
+            validation_result = FirstChoiceUpdater._validate_new_datetime(
+                new_datetime, building_id, connection)
+            if "error" in validation_result:
+                return validation_result
+            
+            update_result = await FirstChoiceUpdater._book_first_choice_async(
+                room_number, building_id, new_datetime, current_reservation, connection)
+            if "error" in update_result:
+                return update_result
             
-            if not result or not result.get("TimeFrom"):
-                return {"error": "現在の予約情報が見つかりません。"}
+            await FirstChoiceUpdater._log_first_choice_update_async(
+                room_number, building_id, new_datetime, connection)
             
             return {
-                "datetime": result["TimeFrom"].strftime("%Y-%m-%d %H:%M"),
-                "second_choice": result.get("SecondChoice")
+                "result": "ok",
+                "message": "第一希望を更新しました。",
+                "old_datetime": current_reservation["datetime"],
+                "new_datetime": new_datetime
             }
             
+        except Exception as e:
+            return handle_db_exception(e, context_message="第一希望更新", 
+                                     input_params={"room_number": room_number, "building_id": building_id})
+    
+    @staticmethod
+    def _get_current_reservation(room_number, building_id, connection):
+        """現在の予約情報を取得"""
+        try:
+            result = DBUtils.execute_single_query(connection, CURRENT_RESERVATION_SQL, (room_number, building_id))
+            return FirstChoiceUpdater._format_current_reservation(result)
+            
         except Exception as e:
             return {"error": f"予約情報取得エラー: {str(e)}"}
     
+    @staticmethod
+    async def _get_current_reservation_async(room_number, building_id, connection):
+        """現在の予約情報を取得（asyncio 版）"""
+        try:
+            result = await AsyncDBUtils.execute_single_query(
+                connection, CURRENT_RESERVATION_SQL, (room_number, building_id))
+            return FirstChoiceUpdater._format_current_reservation(result)
+            
+        except Exception as e:
+            return {"error": f"予約情報取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _format_current_reservation(result):
+        """現在の予約情報のレスポンスを組み立てる"""
+        if not result or not result.get("TimeFrom"):
+            return {"error": "現在の予約情報が見つかりません。"}
+        
+        return {
+            "datetime": result["TimeFrom"].strftime("%Y-%m-%d %H:%M"),
+            "second_choice": result.get("SecondChoice"),
+            "stylist_cd": result.get("StylistCD"),
+            "status": result.get("Status")
+        }
+    
     @staticmethod
     def _validate_new_datetime(new_datetime, building_id, connection):
         """新しい日時の検証"""
@@ -236,19 +313,72 @@ class FirstChoiceUpdater:
     
     @staticmethod
     def _is_within_business_hours(time_str, hours):
-        """指定時間が営業時間内かチェック"""
+        """指定時間が営業時間内かチェック（"HH:MM" の分換算はキャッシュ済みの値を使う）"""
         try:
-            target_time = datetime.strptime(time_str, "%H:%M").time()
-            start_time = datetime.strptime(hours["start"], "%H:%M").time()
-            end_time = datetime.strptime(hours["end"], "%H:%M").time()
+            target_minutes = TimeUtils.hhmm_to_minutes(time_str)
+            start_minutes = TimeUtils.hhmm_to_minutes(hours["start"])
+            end_minutes = TimeUtils.hhmm_to_minutes(hours["end"])
+            if target_minutes is None or start_minutes is None or end_minutes is None:
+                return False
             
-            return start_time <= target_time < end_time
+            return start_minutes <= target_minutes < end_minutes
         except Exception:
             return False
     
     @staticmethod
-    def _check_availability(building_id, new_datetime, connection):
-        """空き枠のチェック"""
+    def _book_first_choice(room_number, building_id, new_datetime, current_reservation, connection):
+        """
+        空き枠チェックと第一希望更新
+        同じ枠（物件・日付・枠番号）への更新はワーカー内の枠ロックで順番に実行し、DBの行ロック待ちを MySQL 側に積み重ねない
+        """
+        try:
+            availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+            with hold_slot_lock(availability_checker.slot_key(new_datetime)):
+                availability_result = FirstChoiceUpdater._check_availability(
+                    building_id, new_datetime, connection, availability_checker)
+                if "error" in availability_result:
+                    return availability_result
+                
+                update_result = FirstChoiceUpdater._execute_first_choice_update(
+                    room_number, building_id, new_datetime, current_reservation["datetime"], connection,
+                    current_reservation=current_reservation)
+                if "error" in update_result:
+                    FirstChoiceUpdater._release_slot_lock(connection)
+                return update_result
+            
+        except SlotLockTimeout:
+            return {"error": SLOT_BUSY_ERROR}
+    
+    @staticmethod
+    async def _book_first_choice_async(room_number, building_id, new_datetime, current_reservation, connection):
+        """空き枠チェックと第一希望更新（asyncio 版。枠ロックを待つ間はイベントループを止めない）"""
+        try:
+            availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+            await availability_checker.load_reference_async()
+            async with hold_slot_lock_async(availability_checker.slot_key(new_datetime)):
+                availability_result = await FirstChoiceUpdater._check_availability_async(
+                    building_id, new_datetime, connection, availability_checker)
+                if "error" in availability_result:
+                    return availability_result
+                
+                update_result = await FirstChoiceUpdater._execute_first_choice_update_async(
+                    room_number, building_id, new_datetime, current_reservation["datetime"], connection,
+                    current_reservation=current_reservation)
+                if "error" in update_result:
+                    await FirstChoiceUpdater._release_slot_lock_async(connection)
+                return update_result
+            
+        except SlotLockTimeout:
+            return {"error": SLOT_BUSY_ERROR}
+    
+    @staticmethod
+    def _check_availability(building_id, new_datetime, connection, availability_checker=None):
+        """
+        空き枠のチェック
+        物件の設定行（tSettingM）と対象枠の有効予約を行ロックしてから判定するため、同じ物件への同時更新は
+        （枠に有効予約がまだ無い場合も、他のワーカー・サーバーからの更新も）先に確定した側の予約を含めて判定される
+        （ロックは第一希望更新の commit、または満枠・エラー時の rollback で解放する）
+        """
         try:
             # パターン情報を取得
             pattern_utils = PatternUtils()
@@ -256,11 +386,14 @@ class FirstChoiceUpdater:
             if not pattern_info or (isinstance(pattern_info, dict) and "error" in pattern_info):
                 return pattern_info
             
-            # 空き枠チェックの実行
-            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            # 空き枠チェックの実行（予約確定前の判定のためキャッシュを使わず、対象枠の予約をロックして判定）
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+            availability_checker.lock_slot(new_datetime)
             result = availability_checker.check_slot_availability(new_datetime)
             
             if not result.get("available"):
+                FirstChoiceUpdater._release_slot_lock(connection)
                 return {"error": "選択された日時は満枠です。別の日時を選択してください。"}
             
             return {
@@ -270,23 +403,85 @@ class FirstChoiceUpdater:
             }
             
         except Exception as e:
+            FirstChoiceUpdater._release_slot_lock(connection)
             return {"error": f"空き枠チェックエラー: {str(e)}"}
     
     @staticmethod
-    def _execute_first_choice_update(room_number, building_id, new_datetime, old_datetime, connection):
+    def _release_slot_lock(connection):
+        """空き枠チェックで取得した行ロックを解放する（第一希望を更新しない場合）"""
+        try:
+            connection.rollback()
+        except Exception as e:
+            print(f"[_release_slot_lock] ロック解放エラー: {e}")
+    
+    @staticmethod
+    async def _release_slot_lock_async(connection):
+        """空き枠チェックで取得した行ロックを解放する（asyncio 版）"""
+        try:
+            await connection.rollback()
+        except Exception as e:
+            print(f"[_release_slot_lock_async] ロック解放エラー: {e}")
+    
+    @staticmethod
+    async def _check_availability_async(building_id, new_datetime, connection, availability_checker=None):
+        """空き枠のチェック（asyncio 版。参照データを読み込み、対象枠の予約をロックしてから判定）"""
+        try:
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+                await availability_checker.load_reference_async()
+            pattern_info = availability_checker.get_pattern_info()
+            if not pattern_info or (isinstance(pattern_info, dict) and "error" in pattern_info):
+                return pattern_info
+            
+            await availability_checker.lock_slot_async(new_datetime)
+            result = availability_checker.check_slot_availability(new_datetime)
+            
+            if not result.get("available"):
+                await FirstChoiceUpdater._release_slot_lock_async(connection)
+                return {"error": "選択された日時は満枠です。別の日時を選択してください。"}
+            
+            return {
+                "available": True,
+                "stylist_cd": result.get("stylist_cd"),
+                "type": result.get("type", "normal")
+            }
+            
+        except Exception as e:
+            await FirstChoiceUpdater._release_slot_lock_async(connection)
+            return {"error": f"空き枠チェックエラー: {str(e)}"}
+    
+    @staticmethod
+    def _execute_first_choice_update(room_number, building_id, new_datetime, old_datetime, connection,
+                                     current_reservation=None):
         """第一希望更新の実行"""
         try:
             # 第一希望を更新
-            update_sql = """
-            UPDATE tReservationF tr
-            JOIN tSettingM ts ON ts.ClientCD = tr.ClientCD
-            SET tr.TimeFrom = %s,
-                tr.TimeTo   = DATE_ADD(%s, INTERVAL ts.MinuteUnit MINUTE),
-                tr.Updated  = NOW(),
-                tr.Updater  = %s
-            WHERE tr.TimeFrom = %s AND tr.UserCD = %s AND tr.ClientCD = %s
-            """
-            row_count = DBUtils.execute_update(connection, update_sql, (
+            row_count = DBUtils.execute_update(connection, UPDATE_FIRST_CHOICE_SQL, (
+                new_datetime,
+                new_datetime,
+                room_number,
+                old_datetime,
+                room_number,
+                building_id
+            ))
+            
+            if row_count == 0:
+                return {"error": "第一希望の更新に失敗しました。予約情報が見つかりません。"}
+            
+            FirstChoiceUpdater._sync_occupancy_cache(
+                room_number, building_id, new_datetime, old_datetime, row_count, current_reservation, connection)
+            
+            return {"result": "ok"}
+            
+        except Exception as e:
+            return {"error": f"第一希望更新エラー: {str(e)}"}
+    
+    @staticmethod
+    async def _execute_first_choice_update_async(room_number, building_id, new_datetime, old_datetime, connection,
+                                                 current_reservation=None):
+        """第一希望更新の実行（asyncio 版）"""
+        try:
+            row_count = await AsyncDBUtils.execute_update(connection, UPDATE_FIRST_CHOICE_SQL, (
                 new_datetime,
                 new_datetime,
                 room_number,
@@ -298,18 +493,62 @@ class FirstChoiceUpdater:
             if row_count == 0:
                 return {"error": "第一希望の更新に失敗しました。予約情報が見つかりません。"}
             
+            await FirstChoiceUpdater._sync_occupancy_cache_async(
+                room_number, building_id, new_datetime, old_datetime, row_count, current_reservation, connection)
+            
             return {"result": "ok"}
             
         except Exception as e:
             return {"error": f"第一希望更新エラー: {str(e)}"}
     
+    @staticmethod
+    def _sync_occupancy_cache(room_number, building_id, new_datetime, old_datetime, row_count,
+                              current_reservation, connection):
+        """
+        予約占有状況キャッシュに第一希望の変更を反映
+        有効予約（Status = 1）1件の移動であれば差分を反映し、それ以外は物件のキャッシュを破棄する
+        """
+        try:
+            if (row_count != 1 or not current_reservation
+                    or str(current_reservation.get("status")) != "1"):
+                invalidate_occupancy(building_id)
+                return
+            
+            row = DBUtils.execute_single_query(
+                connection, UPDATED_AT_SQL, (new_datetime, room_number, building_id))
+            record_reservation_move(
+                building_id, old_datetime, new_datetime, current_reservation.get("stylist_cd"),
+                row.get("Updated") if row else None)
+        except Exception as e:
+            print(f"[_sync_occupancy_cache] キャッシュ反映エラー: {e}")
+            invalidate_occupancy(building_id)
+    
+    @staticmethod
+    async def _sync_occupancy_cache_async(room_number, building_id, new_datetime, old_datetime, row_count,
+                                          current_reservation, connection):
+        """予約占有状況キャッシュに第一希望の変更を反映（asyncio 版）"""
+        try:
+            if (row_count != 1 or not current_reservation
+                    or str(current_reservation.get("status")) != "1"):
+                invalidate_occupancy(building_id)
+                return
+            
+            row = await AsyncDBUtils.execute_single_query(
+                connection, UPDATED_AT_SQL, (new_datetime, room_number, building_id))
+            record_reservation_move(
+                building_id, old_datetime, new_datetime, current_reservation.get("stylist_cd"),
+                row.get("Updated") if row else None)
+        except Exception as e:
+            print(f"[_sync_occupancy_cache_async] キャッシュ反映エラー: {e}")
+            invalidate_occupancy(building_id)
+    
     @staticmethod
     def _log_first_choice_update(room_number, building_id, new_datetime, connection):
         """第一希望更新履歴をログに記録"""
         try:
             notes = f"[AI電話第一希望更新] {new_datetime}"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -321,6 +560,24 @@ class FirstChoiceUpdater:
         except Exception as e:
             print(f"[_log_first_choice_update] ログ記録エラー: {e}")
     
+    @staticmethod
+    async def _log_first_choice_update_async(room_number, building_id, new_datetime, connection):
+        """第一希望更新履歴をログに記録（asyncio 版）"""
+        try:
+            notes = f"[AI電話第一希望更新] {new_datetime}"
+            
+            await log_taio_record_async(
+                room_number=room_number,
+                building_id=building_id,
+                notes=notes,
+                category="|1|",
+                creator=0,
+                updater=0,
+                connection=connection
+            )
+        except Exception as e:
+            print(f"[_log_first_choice_update_async] ログ記録エラー: {e}")
+    
     @staticmethod
     @db_connection
     def get_available_slots(building_id: str, date: str, connection=None) -> dict:
@@ -346,9 +603,9 @@ class FirstChoiceUpdater:
             if parsed_date.date() < datetime.now().date():
                 return {"error": "過去の日付は選択できません。未来の日付を選択してください。"}
             
-            # パターン情報を取得
-            pattern_utils = PatternUtils()
-            pattern_info = pattern_utils.get_pattern_info(building_id, connection)
+            # パターン情報を取得（空き枠チェックと同じインスタンスで取得して使い回す）
+            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            pattern_info = availability_checker.get_pattern_info()
             if "error" in pattern_info:
                 return pattern_info
             
@@ -359,7 +616,49 @@ class FirstChoiceUpdater:
             
             # 時間枠を生成
             time_slots = FirstChoiceUpdater._generate_time_slots(
-                date, pattern_info, business_hours, building_id, connection)
+                date, pattern_info, business_hours, building_id, connection,
+                availability_checker=availability_checker)
+            
+            return {
+                "result": "ok",
+                "date": date,
+                "time_slots": time_slots,
+                "total_slots": len(time_slots),
+                "available_slots": len([slot for slot in time_slots if slot.get("available", False)])
+            }
+            
+        except Exception as e:
+            return {"error": f"時間枠取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_available_slots_async(building_id: str, date: str, connection=None) -> dict:
+        """
+        指定日の利用可能な時間枠を取得（asyncio 版）
+        参照データと予約を先に非同期で読み込み、枠の判定はメモリ上で行う
+        """
+        try:
+            try:
+                parsed_date = datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                return {"error": "日付の形式が正しくありません。YYYY-MM-DD形式で入力してください。"}
+            
+            if parsed_date.date() < datetime.now().date():
+                return {"error": "過去の日付は選択できません。未来の日付を選択してください。"}
+            
+            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            await availability_checker.prefetch_async(parsed_date.date())
+            pattern_info = availability_checker.get_pattern_info()
+            if "error" in pattern_info:
+                return pattern_info
+            
+            business_hours = FirstChoiceUpdater._get_business_hours(building_id, connection)
+            if "error" in business_hours:
+                return business_hours
+            
+            time_slots = FirstChoiceUpdater._generate_time_slots(
+                date, pattern_info, business_hours, building_id, connection,
+                availability_checker=availability_checker)
             
             return {
                 "result": "ok",
@@ -373,7 +672,132 @@ class FirstChoiceUpdater:
             return {"error": f"時間枠取得エラー: {str(e)}"}
     
     @staticmethod
-    def _generate_time_slots(date, pattern_info, business_hours, building_id, connection):
+    @db_connection
+    def get_availability_calendar(building_id: str, date_from: str, days: int = 14,
+                                  connection=None) -> dict:
+        """
+        指定日から複数日分の時間枠の空き状況をまとめて取得
+        （参照データと予約は期間全体で1回ずつ読み込み、日数に比例してクエリが増えない）
+        
+        Args:
+            building_id: 物件ID
+            date_from: 開始日（YYYY-MM-DD形式）
+            days: 取得日数（1〜MAX_CALENDAR_DAYS）
+            connection: データベース接続
+            
+        Returns:
+            dict: 日付ごとの時間枠の空き状況
+        """
+        try:
+            # 日付の検証
+            try:
+                parsed_date = datetime.strptime(date_from, "%Y-%m-%d")
+            except ValueError:
+                return {"error": "日付の形式が正しくありません。YYYY-MM-DD形式で入力してください。"}
+            
+            # 過去日付のチェック
+            if parsed_date.date() < datetime.now().date():
+                return {"error": "過去の日付は選択できません。未来の日付を選択してください。"}
+            
+            # 日数の検証
+            if not isinstance(days, int) or days < 1 or days > MAX_CALENDAR_DAYS:
+                return {"error": f"取得日数は1〜{MAX_CALENDAR_DAYS}日で指定してください。"}
+            
+            # パターン情報を取得
+            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            pattern_info = availability_checker.get_pattern_info()
+            if "error" in pattern_info:
+                return pattern_info
+            
+            # 営業時間設定を取得
+            business_hours = FirstChoiceUpdater._get_business_hours(building_id, connection)
+            if "error" in business_hours:
+                return business_hours
+            
+            # 期間全体の予約を1回で読み込む
+            availability_checker.prefetch_occupancy(parsed_date.date(), days)
+            
+            calendar = []
+            for offset in range(days):
+                day = (parsed_date + timedelta(days=offset)).strftime("%Y-%m-%d")
+                time_slots = FirstChoiceUpdater._generate_time_slots(
+                    day, pattern_info, business_hours, building_id, connection,
+                    availability_checker=availability_checker, include_stylists=False)
+                available_count = len([slot for slot in time_slots if slot.get("available", False)])
+                calendar.append({
+                    "date": day,
+                    "time_slots": time_slots,
+                    "total_slots": len(time_slots),
+                    "available_slots": available_count
+                })
+            
+            return {
+                "result": "ok",
+                "date_from": date_from,
+                "days": days,
+                "calendar": calendar,
+                "available_dates": [entry["date"] for entry in calendar if entry["available_slots"] > 0]
+            }
+            
+        except Exception as e:
+            return {"error": f"空き状況カレンダー取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_availability_calendar_async(building_id: str, date_from: str, days: int = 14,
+                                              connection=None) -> dict:
+        """指定日から複数日分の時間枠の空き状況をまとめて取得（asyncio 版）"""
+        try:
+            try:
+                parsed_date = datetime.strptime(date_from, "%Y-%m-%d")
+            except ValueError:
+                return {"error": "日付の形式が正しくありません。YYYY-MM-DD形式で入力してください。"}
+            
+            if parsed_date.date() < datetime.now().date():
+                return {"error": "過去の日付は選択できません。未来の日付を選択してください。"}
+            
+            if not isinstance(days, int) or days < 1 or days > MAX_CALENDAR_DAYS:
+                return {"error": f"取得日数は1〜{MAX_CALENDAR_DAYS}日で指定してください。"}
+            
+            # 参照データと期間全体の予約を読み込む
+            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            await availability_checker.prefetch_async(parsed_date.date(), days)
+            pattern_info = availability_checker.get_pattern_info()
+            if "error" in pattern_info:
+                return pattern_info
+            
+            business_hours = FirstChoiceUpdater._get_business_hours(building_id, connection)
+            if "error" in business_hours:
+                return business_hours
+            
+            calendar = []
+            for offset in range(days):
+                day = (parsed_date + timedelta(days=offset)).strftime("%Y-%m-%d")
+                time_slots = FirstChoiceUpdater._generate_time_slots(
+                    day, pattern_info, business_hours, building_id, connection,
+                    availability_checker=availability_checker, include_stylists=False)
+                available_count = len([slot for slot in time_slots if slot.get("available", False)])
+                calendar.append({
+                    "date": day,
+                    "time_slots": time_slots,
+                    "total_slots": len(time_slots),
+                    "available_slots": available_count
+                })
+            
+            return {
+                "result": "ok",
+                "date_from": date_from,
+                "days": days,
+                "calendar": calendar,
+                "available_dates": [entry["date"] for entry in calendar if entry["available_slots"] > 0]
+            }
+            
+        except Exception as e:
+            return {"error": f"空き状況カレンダー取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _generate_time_slots(date, pattern_info, business_hours, building_id, connection,
+                             availability_checker=None, include_stylists=True):
         """時間枠を生成（完全版）"""
         try:
             time_slots = []
@@ -403,6 +827,10 @@ class FirstChoiceUpdater:
             if not start_times or not end_times:
                 return []
             
+            # 同一日の空き枠チェックでは予約占有状況を1回だけ読み込んで使い回す
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection)
+            
             # 各時間枠をチェック
             for i, (start_time_pattern, end_time_pattern) in enumerate(zip(start_times, end_times)):
                 # 営業時間内かチェック
@@ -414,22 +842,24 @@ class FirstChoiceUpdater:
                 # 空き枠チェック
                 datetime_str = f"{date} {start_time_pattern}"
                 availability_result = FirstChoiceUpdater._check_slot_availability(
-                    building_id, datetime_str, connection)
-                
-                # スタイリスト情報を取得
-                stylist_info = FirstChoiceUpdater._get_available_stylists(
-                    building_id, datetime_str, connection)
+                    building_id, datetime_str, connection, availability_checker)
                 
-                time_slots.append({
+                slot = {
                     "time": datetime_str,
                     "start_time": start_time_pattern,
                     "end_time": end_time_pattern,
                     "available": availability_result.get("available", False),
                     "stylist_cd": availability_result.get("stylist_cd"),
-                    "type": availability_result.get("type", "normal"),
-                    "stylists": stylist_info,
-                    "slot_index": i
-                })
+                    "type": availability_result.get("type", "normal")
+                }
+                
+                # スタイリスト情報を取得
+                if include_stylists:
+                    slot["stylists"] = FirstChoiceUpdater._get_available_stylists(
+                        building_id, datetime_str, connection, availability_checker)
+                
+                slot["slot_index"] = i
+                time_slots.append(slot)
             
             return time_slots
             
@@ -438,10 +868,11 @@ class FirstChoiceUpdater:
             return []
     
     @staticmethod
-    def _check_slot_availability(building_id, datetime_str, connection):
+    def _check_slot_availability(building_id, datetime_str, connection, availability_checker=None):
         """指定日時の空き枠をチェック"""
         try:
-            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection)
             result = availability_checker.check_slot_availability(datetime_str)
             return result
         except Exception as e:
@@ -449,41 +880,20 @@ class FirstChoiceUpdater:
             return {"available": False, "type": None}
     
     @staticmethod
-    def _get_available_stylists(building_id, datetime_str, connection):
-        """指定日時に利用可能なスタイリスト一覧を取得"""
+    def _get_available_stylists(building_id, datetime_str, connection, availability_checker=None):
+        """指定日時に利用可能なスタイリスト一覧を取得（対象日の予約占有状況から算出）"""
         try:
-            sql = """
-            SELECT 
-                sm.StylistCD,
-                sm.StylistName,
-                sm.NumberOfLines,
-                COUNT(rf.UserCD) as current_reservations
-            FROM tStylistM sm
-            LEFT JOIN tReservationF rf ON (
-                sm.StylistCD = rf.StylistCD 
-                AND rf.ClientCD = %s 
-                AND DATE_FORMAT(rf.TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s
-                AND rf.MukouFlg = 0 
-                AND rf.Status = 1
-            )
-            WHERE sm.ClientCD = %s 
-            AND sm.MukouFlg = 0 
-            AND (sm.WakugoeFlg IS NULL OR sm.WakugoeFlg = 0)
-            GROUP BY sm.StylistCD, sm.StylistName, sm.NumberOfLines
-            HAVING current_reservations < sm.NumberOfLines
-            ORDER BY sm.StylistCD
-            """
-            stylists = DBUtils.execute_query(connection, sql, (building_id, datetime_str, building_id))
-            
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection)
             return [
                 {
                     "stylist_cd": stylist["StylistCD"],
                     "stylist_name": stylist["StylistName"],
                     "available": True,
-                    "current_reservations": stylist["current_reservations"],
+                    "current_reservations": current_reservations,
                     "max_reservations": stylist["NumberOfLines"]
                 }
-                for stylist in stylists
+                for stylist, current_reservations in availability_checker.get_available_stylists(datetime_str)
             ]
             
         except Exception as e:
@@ -505,6 +915,29 @@ def get_available_slots(building_id: str, date: str, connection=None) -> dict:
     return updater.get_available_slots(building_id, date, connection=connection)
 
 
+def get_availability_calendar(building_id: str, date_from: str, days: int = 14, connection=None) -> dict:
+    """指定日から複数日分の空き状況を取得（外部呼び出し用）"""
+    updater = FirstChoiceUpdater()
+    return updater.get_availability_calendar(building_id, date_from, days, connection=connection)
+
+
+# 便利関数（asyncio 版）
+async def update_first_choice_async(room_number: str, building_id: str, 
+                                    new_datetime: str, connection=None) -> dict:
+    """第一希望の日時を更新（外部呼び出し用・asyncio 版）"""
+    return await FirstChoiceUpdater.update_first_choice_async(room_number, building_id, new_datetime, connection=connection)
+
+
+async def get_available_slots_async(building_id: str, date: str, connection=None) -> dict:
+    """指定日の利用可能な時間枠を取得（外部呼び出し用・asyncio 版）"""
+    return await FirstChoiceUpdater.get_available_slots_async(building_id, date, connection=connection)
+
+
+async def get_availability_calendar_async(building_id: str, date_from: str, days: int = 14, connection=None) -> dict:
+    """指定日から複数日分の空き状況を取得（外部呼び出し用・asyncio 版）"""
+    return await FirstChoiceUpdater.get_availability_calendar_async(building_id, date_from, days, connection=connection)
+
+
 if __name__ == "__main__":
     # テスト用のサンプル実行
     print("第一希望更新機能のテスト")
@@ -8,12 +8,18 @@ from datetime import datetime, timedelta
 
 # ローカルモジュールをインポート
 from user import authenticate_user
-from taio_record import insert_taio_record
+from taio_writer import log_taio_record
 from utils import handle_db_exception
 from utils.pattern_utils import PatternUtils
 from utils.time_utils import TimeUtils
 from utils.db_utils import db_connection, DBUtils
 from availability_checker import SlotAvailabilityChecker
+from utils.occupancy import record_reservation_move, invalidate_occupancy
+from utils.slot_locks import SlotLockTimeout, hold_slot_lock
+
+
+# 同じ枠への更新が集中し、枠ロックを待ち時間内に取得できなかった場合のエラー
+SLOT_BUSY_ERROR = "選択された日時へのお申し込みが集中しています。しばらくしてから再度お試しください。"
 
 
 class FirstChoiceUpdater:
@@ -54,15 +60,9 @@ class FirstChoiceUpdater:
             if "error" in validation_result:
                 return validation_result
             
-            # 4. 空き枠チェック
-            availability_result = FirstChoiceUpdater._check_availability(
-                building_id, new_datetime, connection)
-            if "error" in availability_result:
-                return availability_result
-            
-            # 5. 第一希望更新実行
-            update_result = FirstChoiceUpdater._execute_first_choice_update(
-                room_number, building_id, new_datetime, current_reservation["datetime"], connection)
+            # 4-5. 空き枠チェックと第一希望更新（同じ枠への更新はプロセス内の枠ロックで順番に実行）
+            update_result = FirstChoiceUpdater._book_first_choice(
+                room_number, building_id, new_datetime, current_reservation, connection)
             if "error" in update_result:
                 return update_result
             
@@ -86,7 +86,7 @@ class FirstChoiceUpdater:
         """現在の予約情報を取得"""
         try:
             sql = """
-            SELECT TimeFrom, SecondChoice
+            SELECT TimeFrom, SecondChoice, StylistCD, Status
             FROM tReservationF 
             WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
             ORDER BY TimeFrom DESC LIMIT 1
@@ -98,7 +98,9 @@ class FirstChoiceUpdater:
             
             return {
                 "datetime": result["TimeFrom"].strftime("%Y-%m-%d %H:%M"),
-                "second_choice": result.get("SecondChoice")
+                "second_choice": result.get("SecondChoice"),
+                "stylist_cd": result.get("StylistCD"),
+                "status": result.get("Status")
             }
             
         except Exception as e:
@@ -243,19 +245,50 @@ class FirstChoiceUpdater:
     
     @staticmethod
     def _is_within_business_hours(time_str, hours):
-        """指定時間が営業時間内かチェック"""
+        """指定時間が営業時間内かチェック（"HH:MM" の分換算はキャッシュ済みの値を使う）"""
         try:
-            target_time = datetime.strptime(time_str, "%H:%M").time()
-            start_time = datetime.strptime(hours["start"], "%H:%M").time()
-            end_time = datetime.strptime(hours["end"], "%H:%M").time()
+            target_minutes = TimeUtils.hhmm_to_minutes(time_str)
+            start_minutes = TimeUtils.hhmm_to_minutes(hours["start"])
+            end_minutes = TimeUtils.hhmm_to_minutes(hours["end"])
+            if target_minutes is None or start_minutes is None or end_minutes is None:
+                return False
             
-            return start_time <= target_time < end_time
+            return start_minutes <= target_minutes < end_minutes
         except Exception:
             return False
     
     @staticmethod
-    def _check_availability(building_id, new_datetime, connection):
-        """空き枠のチェック"""
+    def _book_first_choice(room_number, building_id, new_datetime, current_reservation, connection):
+        """
+        空き枠チェックと第一希望更新
+        同じ枠（物件・日付・枠番号）への更新はワーカー内の枠ロックで順番に実行し、DBの行ロック待ちを MySQL 側に積み重ねない
+        """
+        try:
+            availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+            with hold_slot_lock(availability_checker.slot_key(new_datetime)):
+                availability_result = FirstChoiceUpdater._check_availability(
+                    building_id, new_datetime, connection, availability_checker)
+                if "error" in availability_result:
+                    return availability_result
+                
+                update_result = FirstChoiceUpdater._execute_first_choice_update(
+                    room_number, building_id, new_datetime, current_reservation["datetime"], connection,
+                    current_reservation=current_reservation)
+                if "error" in update_result:
+                    FirstChoiceUpdater._release_slot_lock(connection)
+                return update_result
+            
+        except SlotLockTimeout:
+            return {"error": SLOT_BUSY_ERROR}
+    
+    @staticmethod
+    def _check_availability(building_id, new_datetime, connection, availability_checker=None):
+        """
+        空き枠のチェック
+        物件の設定行（tSettingM）と対象枠の有効予約を行ロックしてから判定するため、同じ物件への同時更新は
+        （枠に有効予約がまだ無い場合も、他のワーカー・サーバーからの更新も）先に確定した側の予約を含めて判定される
+        （ロックは第一希望更新の commit、または満枠・エラー時の rollback で解放する）
+        """
         try:
             # パターン情報を取得
             pattern_utils = PatternUtils()
@@ -263,11 +296,14 @@ class FirstChoiceUpdater:
             if not pattern_info or (isinstance(pattern_info, dict) and "error" in pattern_info):
                 return pattern_info
             
-            # 空き枠チェックの実行
-            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            # 空き枠チェックの実行（予約確定前の判定のためキャッシュを使わず、対象枠の予約をロックして判定）
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection, use_cache=False)
+            availability_checker.lock_slot(new_datetime)
             result = availability_checker.check_slot_availability(new_datetime)
             
             if not result.get("available"):
+                FirstChoiceUpdater._release_slot_lock(connection)
                 return {"error": "選択された日時は満枠です。別の日時を選択してください。"}
             
             return {
@@ -277,10 +313,20 @@ class FirstChoiceUpdater:
             }
             
         except Exception as e:
+            FirstChoiceUpdater._release_slot_lock(connection)
             return {"error": f"空き枠チェックエラー: {str(e)}"}
     
     @staticmethod
-    def _execute_first_choice_update(room_number, building_id, new_datetime, old_datetime, connection):
+    def _release_slot_lock(connection):
+        """空き枠チェックで取得した行ロックを解放する（第一希望を更新しない場合）"""
+        try:
+            connection.rollback()
+        except Exception as e:
+            print(f"[_release_slot_lock] ロック解放エラー: {e}")
+    
+    @staticmethod
+    def _execute_first_choice_update(room_number, building_id, new_datetime, old_datetime, connection,
+                                     current_reservation=None):
         """第一希望更新の実行"""
         try:
             # 第一希望を更新（TimeToも MinuteUnit 分加算した値を同時に更新）
@@ -305,18 +351,46 @@ class FirstChoiceUpdater:
             if row_count == 0:
                 return {"error": "第一希望の更新に失敗しました。予約情報が見つかりません。"}
             
+            FirstChoiceUpdater._sync_occupancy_cache(
+                room_number, building_id, new_datetime, old_datetime, row_count, current_reservation, connection)
+            
             return {"result": "ok"}
             
         except Exception as e:
             return {"error": f"第一希望更新エラー: {str(e)}"}
     
+    @staticmethod
+    def _sync_occupancy_cache(room_number, building_id, new_datetime, old_datetime, row_count,
+                              current_reservation, connection):
+        """
+        予約占有状況キャッシュに第一希望の変更を反映
+        有効予約（Status = 1）1件の移動であれば差分を反映し、それ以外は物件のキャッシュを破棄する
+        """
+        try:
+            if (row_count != 1 or not current_reservation
+                    or str(current_reservation.get("status")) != "1"):
+                invalidate_occupancy(building_id)
+                return
+            
+            row = DBUtils.execute_single_query(connection, """
+            SELECT Updated FROM tReservationF
+            WHERE TimeFrom = %s AND UserCD = %s AND ClientCD = %s
+            ORDER BY Updated DESC LIMIT 1
+            """, (new_datetime, room_number, building_id))
+            record_reservation_move(
+                building_id, old_datetime, new_datetime, current_reservation.get("stylist_cd"),
+                row.get("Updated") if row else None)
+        except Exception as e:
+            print(f"[_sync_occupancy_cache] キャッシュ反映エラー: {e}")
+            invalidate_occupancy(building_id)
+    
     @staticmethod
     def _log_first_choice_update(room_number, building_id, new_datetime, connection):
         """第一希望更新履歴をログに記録"""
         try:
             notes = f"[AI電話第一希望更新] {new_datetime}"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -410,6 +484,9 @@ class FirstChoiceUpdater:
             if not start_times or not end_times:
                 return []
             
+            # 同一日の空き枠チェックでは予約占有状況を1回だけ読み込んで使い回す
+            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            
             # 各時間枠をチェック
             for i, (start_time_pattern, end_time_pattern) in enumerate(zip(start_times, end_times)):
                 # 営業時間内かチェック
@@ -421,11 +498,11 @@ class FirstChoiceUpdater:
                 # 空き枠チェック
                 datetime_str = f"{date} {start_time_pattern}"
                 availability_result = FirstChoiceUpdater._check_slot_availability(
-                    building_id, datetime_str, connection)
+                    building_id, datetime_str, connection, availability_checker)
                 
                 # スタイリスト情報を取得
                 stylist_info = FirstChoiceUpdater._get_available_stylists(
-                    building_id, datetime_str, connection)
+                    building_id, datetime_str, connection, availability_checker)
                 
                 time_slots.append({
                     "time": datetime_str,
@@ -445,10 +522,11 @@ class FirstChoiceUpdater:
             return []
     
     @staticmethod
-    def _check_slot_availability(building_id, datetime_str, connection):
+    def _check_slot_availability(building_id, datetime_str, connection, availability_checker=None):
         """指定日時の空き枠をチェック"""
         try:
-            availability_checker = SlotAvailabilityChecker(building_id, connection)
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection)
             result = availability_checker.check_slot_availability(datetime_str)
             return result
         except Exception as e:
@@ -456,41 +534,20 @@ class FirstChoiceUpdater:
             return {"available": False, "type": None}
     
     @staticmethod
-    def _get_available_stylists(building_id, datetime_str, connection):
-        """指定日時に利用可能なスタイリスト一覧を取得"""
+    def _get_available_stylists(building_id, datetime_str, connection, availability_checker=None):
+        """指定日時に利用可能なスタイリスト一覧を取得（対象日の予約占有状況から算出）"""
         try:
-            sql = """
-            SELECT 
-                sm.StylistCD,
-                sm.StylistName,
-                sm.NumberOfLines,
-                COUNT(rf.UserCD) as current_reservations
-            FROM tStylistM sm
-            LEFT JOIN tReservationF rf ON (
-                sm.StylistCD = rf.StylistCD 
-                AND rf.ClientCD = %s 
-                AND DATE_FORMAT(rf.TimeFrom, '%%Y-%%m-%%d %%H:%%i') = %s
-                AND rf.MukouFlg = 0 
-                AND rf.Status = 1
-            )
-            WHERE sm.ClientCD = %s 
-            AND sm.MukouFlg = 0 
-            AND (sm.WakugoeFlg IS NULL OR sm.WakugoeFlg = 0)
-            GROUP BY sm.StylistCD, sm.StylistName, sm.NumberOfLines
-            HAVING current_reservations < sm.NumberOfLines
-            ORDER BY sm.StylistCD
-            """
-            stylists = DBUtils.execute_query(connection, sql, (building_id, datetime_str, building_id))
-            
+            if availability_checker is None:
+                availability_checker = SlotAvailabilityChecker(building_id, connection)
             return [
                 {
                     "stylist_cd": stylist["StylistCD"],
                     "stylist_name": stylist["StylistName"],
                     "available": True,
-                    "current_reservations": stylist["current_reservations"],
+                    "current_reservations": current_reservations,
                     "max_reservations": stylist["NumberOfLines"]
                 }
-                for stylist in stylists
+                for stylist, current_reservations in availability_checker.get_available_stylists(datetime_str)
             ]
             
         except Exception as e:
@@ -4,13 +4,12 @@
 
 from typing import Optional
 
-from utils.db_utils import db_connection, DBUtils
+from utils.building_index import lookup_building_name
 
 
-@db_connection
 def get_building_name(clientCD: str, connection=None) -> Optional[str]:
     """
-    指定されたクライアントコード（ClientCD）に基づいて、データベースから建物名（MansionName）を取得します。
+    指定されたクライアントコード（ClientCD）に基づいて、建物名（MansionName）を取得します。
 
     Args:
         clientCD (str): クライアントコード。tClientMテーブルのClientCD列に対応します。
@@ -20,23 +19,12 @@ def get_building_name(clientCD: str, connection=None) -> Optional[str]:
                         クライアントコードが見つからない場合、もしくはエラー時は None。
 
     注意:
-        - 本関数はプロジェクトの DB 接続デコレーター（@db_connection）を利用します。
-        - 実際の接続情報は `utils/db_utils.py` 側の設定/環境変数等に従います。
-        - 直接カーソルは使用せず、`DBUtils.execute_single_query` により安全に取得します。
+        - プロセス内の索引（`utils/building_index.py`）を先に参照し、索引にあればDBに接続しません。
+        - 索引に無いクライアントコードのみ DB で確認し、存在しない場合も一定時間は索引で応答します。
+        - DB に接続する場合は `@db_connection` と同じく、connection 未指定時に接続を開いて閉じます。
     """
     try:
-        sql = (
-            """
-            SELECT MansionName
-            FROM tClientM
-            WHERE ClientCD = %s
-            LIMIT 1
-            """
-        )
-        result = DBUtils.execute_single_query(connection, sql, (clientCD,))
-        if result and result.get("MansionName"):
-            return result["MansionName"]
-        return None
+        return lookup_building_name(clientCD, connection=connection)
     except Exception:
         return None
 
@@ -6,7 +6,8 @@ from typing import Optional
 
 from user import authenticate_user
 from utils import handle_db_exception
-from utils.db_utils import db_connection, DBUtils
+from utils.building_index import lookup_building_name
+from utils.db_utils import db_connection
 
 
 @db_connection
@@ -28,19 +29,8 @@ def get_building_name(room_number: str, password: str, building_id: str, connect
         if "error" in auth_result:
             return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
 
-        # 建物名取得
-        sql = (
-            """
-            SELECT MansionName
-            FROM tClientM
-            WHERE ClientCD = %s
-            LIMIT 1
-            """
-        )
-        result = DBUtils.execute_single_query(connection, sql, (building_id,))
-        if result and result.get("MansionName"):
-            return {"result": "ok", "mansion_name": result["MansionName"]}
-        return {"result": "ok", "mansion_name": None}
+        # 建物名取得（プロセス内の索引を参照し、無い場合のみ同じ接続でDBを確認）
+        return {"result": "ok", "mansion_name": lookup_building_name(building_id, connection=connection)}
 
     except Exception as e:
         return handle_db_exception(e, context_message="建物名取得", input_params={"building_id": building_id})
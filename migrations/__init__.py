@@ -0,0 +1,35 @@
+"""
+スキーマ移行（インデックス追加など）モジュール群
+
+各モジュールは apply(connection) / rollback(connection) / status(connection) を持ち、
+何度実行しても同じ結果になる（冪等）ように実装する。
+"""
+from utils.db_utils import DBUtils
+
+
+def index_exists(connection, table_name, index_name):
+    """現在のデータベースに指定インデックスが存在するかを返す"""
+    sql = """
+    SELECT COUNT(*) AS cnt
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """
+    row = DBUtils.execute_single_query(connection, sql, (table_name, index_name))
+    return bool(row and row.get("cnt"))
+
+
+def table_exists(connection, table_name):
+    """現在のデータベースに指定テーブルが存在するかを返す"""
+    sql = """
+    SELECT COUNT(*) AS cnt
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """
+    row = DBUtils.execute_single_query(connection, sql, (table_name,))
+    return bool(row and row.get("cnt"))
+
+
+__all__ = [
+    "index_exists",
+    "table_exists",
+]
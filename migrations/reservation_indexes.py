@@ -0,0 +1,82 @@
+"""
+予約・対応履歴テーブルの複合インデックス追加
+空き枠判定の予約数集計や部屋番号単位の予約取得が、TimeFrom の範囲条件でインデックスを使えるようにする
+
+使用方法:
+    python -m migrations.reservation_indexes status
+    python -m migrations.reservation_indexes apply
+    python -m migrations.reservation_indexes rollback
+"""
+from connection import get_connection
+from migrations import index_exists
+from utils.db_utils import DBUtils
+
+
+# (テーブル名, インデックス名, カラム)
+INDEXES = [
+    # 空き枠判定: ClientCD + 有効予約 + TimeFrom 範囲 + StylistCD 集計
+    ("tReservationF", "idx_rf_client_active_time", ("ClientCD", "MukouFlg", "Status", "TimeFrom", "StylistCD")),
+    # 予約日程・履歴取得: 部屋番号 + 物件 + 有効予約 + TimeFrom 順
+    ("tReservationF", "idx_rf_user_client_time", ("UserCD", "ClientCD", "MukouFlg", "TimeFrom")),
+    # 第二希望履歴取得: 部屋番号 + 物件 + 有効 + Created 順
+    ("tTaioF", "idx_taio_user_client_created", ("UserCD", "ClientCD", "MukouFlg", "Created")),
+]
+
+
+def status(connection):
+    """各インデックスの有無を返す"""
+    return [
+        {"table": table, "index": name, "columns": list(columns), "exists": index_exists(connection, table, name)}
+        for table, name, columns in INDEXES
+    ]
+
+
+def apply(connection):
+    """未作成のインデックスのみ作成する（作成済みはスキップ）"""
+    applied = []
+    for table, name, columns in INDEXES:
+        if index_exists(connection, table, name):
+            continue
+        column_list = ", ".join(f"`{c}`" for c in columns)
+        DBUtils.execute_update(
+            connection,
+            f"ALTER TABLE `{table}` ADD INDEX `{name}` ({column_list}), ALGORITHM=INPLACE, LOCK=NONE")
+        applied.append(name)
+    return {"result": "ok", "applied": applied}
+
+
+def rollback(connection):
+    """作成済みのインデックスのみ削除する（未作成はスキップ）"""
+    dropped = []
+    for table, name, _columns in reversed(INDEXES):
+        if not index_exists(connection, table, name):
+            continue
+        DBUtils.execute_update(connection, f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+        dropped.append(name)
+    return {"result": "ok", "dropped": dropped}
+
+
+def main() -> None:
+    """CLI エントリポイント"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="tReservationF / tTaioF composite indexes")
+    parser.add_argument("command", choices=["status", "apply", "rollback"])
+    args = parser.parse_args()
+
+    connection = get_connection()
+    try:
+        if args.command == "apply":
+            res = apply(connection)
+        elif args.command == "rollback":
+            res = rollback(connection)
+        else:
+            res = status(connection)
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
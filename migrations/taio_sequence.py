@@ -0,0 +1,83 @@
+"""
+採番テーブル（tSequenceM）の作成
+TaioCD を MAX(TaioCD) + 1 ではなく採番テーブルからブロック単位で払い出せるようにする（utils/id_allocator.py）
+
+使用方法:
+    python -m migrations.taio_sequence status
+    python -m migrations.taio_sequence apply
+    python -m migrations.taio_sequence rollback
+"""
+from connection import get_connection
+from migrations import table_exists
+from utils.db_utils import DBUtils
+from utils.id_allocator import TAIO_CD_SEQUENCE
+
+
+SEQUENCE_TABLE = "tSequenceM"
+
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS `tSequenceM` (
+    `SeqName` VARCHAR(64) NOT NULL,
+    `NextValue` BIGINT NOT NULL,
+    PRIMARY KEY (`SeqName`)
+) ENGINE=InnoDB
+"""
+
+# 採番行が無い場合のみ、既存の最大値 + 1 から開始する
+SEED_TAIO_CD_SQL = """
+INSERT IGNORE INTO `tSequenceM` (`SeqName`, `NextValue`)
+SELECT %s, COALESCE(MAX(TaioCD), 0) + 1 FROM tTaioF
+"""
+
+
+def status(connection):
+    """採番テーブルの有無と現在値を返す"""
+    if not table_exists(connection, SEQUENCE_TABLE):
+        return {"table": SEQUENCE_TABLE, "exists": False, "sequences": []}
+    rows = DBUtils.execute_query(connection, "SELECT SeqName, NextValue FROM tSequenceM ORDER BY SeqName")
+    return {
+        "table": SEQUENCE_TABLE,
+        "exists": True,
+        "sequences": [{"name": row["SeqName"], "next_value": row["NextValue"]} for row in rows],
+    }
+
+
+def apply(connection):
+    """採番テーブルを作成し、TaioCD の採番行を登録する（作成・登録済みはスキップ）"""
+    DBUtils.execute_update(connection, CREATE_SQL)
+    seeded = DBUtils.execute_update(connection, SEED_TAIO_CD_SQL, (TAIO_CD_SEQUENCE,))
+    return {"result": "ok", "seeded": [TAIO_CD_SEQUENCE] if seeded else []}
+
+
+def rollback(connection):
+    """採番テーブルを削除する（以降の TaioCD は MAX(TaioCD) + 1 で採番される）"""
+    if not table_exists(connection, SEQUENCE_TABLE):
+        return {"result": "ok", "dropped": []}
+    DBUtils.execute_update(connection, "DROP TABLE `tSequenceM`")
+    return {"result": "ok", "dropped": [SEQUENCE_TABLE]}
+
+
+def main() -> None:
+    """CLI エントリポイント"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="tSequenceM (TaioCD allocator) table")
+    parser.add_argument("command", choices=["status", "apply", "rollback"])
+    args = parser.parse_args()
+
+    connection = get_connection()
+    try:
+        if args.command == "apply":
+            res = apply(connection)
+        elif args.command == "rollback":
+            res = rollback(connection)
+        else:
+            res = status(connection)
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
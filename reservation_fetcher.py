@@ -7,8 +7,190 @@ import os
 from datetime import datetime, timedelta
 
 # ローカルモジュールをインポート
+from connection import get_connection
 from utils import handle_db_exception
 from utils.db_utils import db_connection, DBUtils
+from utils.pagination import (
+    InvalidCursorError, clamp_page_size, encode_keyset_cursor, decode_keyset_cursor, skip_seen, split_page,
+)
+from utils.async_db_utils import async_db_connection, AsyncDBUtils
+
+
+# 同期版・非同期版で共通のSQL
+RESERVATION_INFO_SQL = """
+            SELECT 
+                rf.TimeFrom AS bookingDateTime,
+                rf.TimeTo AS bookingDateTimeTo,
+                rf.SecondChoice AS secondChoiceText,
+                rf.StylistCD AS stylistCD
+            FROM tReservationF rf
+            JOIN tClientM cm ON rf.ClientCD = cm.ClientCD
+            WHERE rf.UserCD = %s AND rf.ClientCD = %s AND rf.MukouFlg = 0
+            ORDER BY rf.TimeFrom DESC
+            LIMIT 1
+            """
+
+# 予約履歴（tReservationF には一意な列が無いため、同じ (TimeFrom, Created) の行の並びも残りの列で固定する）
+RESERVATION_HISTORY_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status,
+                Created,
+                Updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            ORDER BY TimeFrom DESC, Created DESC, Updated DESC, TimeTo DESC, StylistCD DESC, Status DESC, SecondChoice DESC
+            LIMIT %s
+            """
+
+# 予約履歴の2ページ目以降（カーソルの (TimeFrom, Created) 以降の行。同じキーの行は返した件数だけ読み飛ばす）
+# Created DESC では NULL が最後に並ぶため、NULL の行はキーより後として扱う
+RESERVATION_HISTORY_FROM_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status,
+                Created,
+                Updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            AND TimeFrom <= %s AND (TimeFrom < %s OR Created <= %s OR Created IS NULL)
+            ORDER BY TimeFrom DESC, Created DESC, Updated DESC, TimeTo DESC, StylistCD DESC, Status DESC, SecondChoice DESC
+            LIMIT %s
+            """
+
+# カーソルの Created が NULL の場合（同じ TimeFrom では Created が NULL の行だけが残る）
+RESERVATION_HISTORY_FROM_NULL_CREATED_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status,
+                Created,
+                Updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            AND TimeFrom <= %s AND (TimeFrom < %s OR Created IS NULL)
+            ORDER BY TimeFrom DESC, Created DESC, Updated DESC, TimeTo DESC, StylistCD DESC, Status DESC, SecondChoice DESC
+            LIMIT %s
+            """
+
+# 予約履歴の全件（逐次出力用）
+RESERVATION_HISTORY_STREAM_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status,
+                Created,
+                Updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            ORDER BY TimeFrom DESC, Created DESC, Updated DESC, TimeTo DESC, StylistCD DESC, Status DESC, SecondChoice DESC
+            """
+
+RESERVATION_HISTORY_CURSOR = "reservation_history"
+
+RESERVATION_STATUS_SQL = """
+            SELECT 
+                COUNT(*) as total_reservations,
+                COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
+                COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
+                MAX(TimeFrom) as latest_reservation,
+                MIN(TimeFrom) as earliest_reservation
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            """
+
+UPCOMING_RESERVATIONS_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            AND TimeFrom >= %s AND TimeFrom <= %s
+            ORDER BY TimeFrom ASC
+            """
+
+# 予約サマリー（現在の予約 + 状況 + 今後の予約）を1回で取得するSQL
+# 集計（s）は対象者の予約が無くても1行返り、最新の予約と今後の予約の行だけを LEFT JOIN する
+# パラメータ: (今後の期間の開始, 終了, UserCD, ClientCD, ClientCD, UserCD, ClientCD, 開始, 終了)
+RESERVATION_SUMMARY_SQL = """
+            SELECT 
+                s.total_reservations,
+                s.active_reservations,
+                s.with_second_choice,
+                s.latest_reservation,
+                s.earliest_reservation,
+                cm.ClientCD AS clientCD,
+                rf.TimeFrom,
+                rf.TimeTo,
+                rf.SecondChoice,
+                rf.StylistCD,
+                rf.Status,
+                CASE WHEN rf.TimeFrom = s.latest_reservation THEN 1 ELSE 0 END AS is_latest,
+                CASE WHEN rf.TimeFrom >= %s AND rf.TimeFrom <= %s THEN 1 ELSE 0 END AS is_upcoming
+            FROM (
+                SELECT 
+                    COUNT(*) as total_reservations,
+                    COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
+                    COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
+                    MAX(TimeFrom) as latest_reservation,
+                    MIN(TimeFrom) as earliest_reservation
+                FROM tReservationF 
+                WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            ) s
+            LEFT JOIN tClientM cm ON cm.ClientCD = %s
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = %s AND rf.ClientCD = %s AND rf.MukouFlg = 0
+                AND (rf.TimeFrom = s.latest_reservation OR (rf.TimeFrom >= %s AND rf.TimeFrom <= %s))
+            ORDER BY rf.TimeFrom ASC
+            """
+
+# 予約サマリーの今後の予約の期間（日）
+SUMMARY_DAYS_AHEAD = 30
+
+# 予約データの版（ETag 用）。無効化済みの行も含め、登録・更新・削除のいずれかで値が変わる
+# （更新系の処理はいずれも Updated = NOW() を設定する。同じ秒内の複数回の更新は区別できない）
+RESERVATION_VERSION_SQL = """
+            SELECT COUNT(*) AS row_count, MAX(Updated) AS last_updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s
+            """
+
+# 一括取得で1回のクエリにまとめる (部屋番号, 物件ID) の件数と、1リクエストで受け付ける上限
+BULK_CHUNK_SIZE = 500
+BULK_MAX_PAIRS = 5000
+
+# 複数の (UserCD, ClientCD) の最新の予約を1回で取得するSQL（{pairs} に "(%s, %s)" を件数分並べる）
+BULK_RESERVATION_INFO_SQL = """
+            SELECT 
+                rf.UserCD AS userCD,
+                rf.ClientCD AS clientCD,
+                rf.TimeFrom AS bookingDateTime,
+                rf.TimeTo AS bookingDateTimeTo,
+                rf.SecondChoice AS secondChoiceText,
+                rf.StylistCD AS stylistCD
+            FROM tReservationF rf
+            JOIN tClientM cm ON rf.ClientCD = cm.ClientCD
+            JOIN (
+                SELECT UserCD, ClientCD, MAX(TimeFrom) AS latest
+                FROM tReservationF
+                WHERE MukouFlg = 0 AND (UserCD, ClientCD) IN ({pairs})
+                GROUP BY UserCD, ClientCD
+            ) l ON rf.UserCD = l.UserCD AND rf.ClientCD = l.ClientCD AND rf.TimeFrom = l.latest
+            WHERE rf.MukouFlg = 0
+            """
 
 
 class ReservationFetcher:
@@ -31,77 +213,189 @@ class ReservationFetcher:
         try:
             # 予約情報を取得
             reservation_info = ReservationFetcher._get_reservation_info(room_number, building_id, connection)
-            if "error" in reservation_info:
-                return reservation_info
+            return ReservationFetcher._format_reservation_date(reservation_info)
             
-            return {
-                "result": "ok",
-                "reservation_date": reservation_info["datetime"],
-                "reservation_date_raw": reservation_info["datetime_raw"],
-                "second_choice": reservation_info.get("second_choice"),
-                "stylist_cd": reservation_info.get("stylist_cd"),
-                "time_to": reservation_info.get("time_to"),
-                "has_reservation": True
-            }
+        except Exception as e:
+            return handle_db_exception(e, context_message="予約日程取得", 
+                                     input_params={"room_number": room_number, "building_id": building_id})
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_date_async(room_number: str, building_id: str, connection=None) -> dict:
+        """予約日程を取得する（asyncio 版）"""
+        try:
+            reservation_info = await ReservationFetcher._get_reservation_info_async(room_number, building_id, connection)
+            return ReservationFetcher._format_reservation_date(reservation_info)
             
         except Exception as e:
             return handle_db_exception(e, context_message="予約日程取得", 
                                      input_params={"room_number": room_number, "building_id": building_id})
     
+    @staticmethod
+    def _format_reservation_date(reservation_info):
+        """予約日程のレスポンスを組み立てる"""
+        if "error" in reservation_info:
+            return reservation_info
+        
+        return {
+            "result": "ok",
+            "reservation_date": reservation_info["datetime"],
+            "reservation_date_raw": reservation_info["datetime_raw"],
+            "second_choice": reservation_info.get("second_choice"),
+            "stylist_cd": reservation_info.get("stylist_cd"),
+            "time_to": reservation_info.get("time_to"),
+            "has_reservation": True
+        }
+    
     @staticmethod
     def _get_reservation_info(room_number, building_id, connection):
         """予約情報を取得"""
         try:
-            sql = """
-            SELECT 
-                rf.TimeFrom AS bookingDateTime,
-                rf.TimeTo AS bookingDateTimeTo,
-                rf.SecondChoice AS secondChoiceText,
-                rf.StylistCD AS stylistCD
-            FROM tReservationF rf
-            JOIN tClientM cm ON rf.ClientCD = cm.ClientCD
-            WHERE rf.UserCD = %s AND rf.ClientCD = %s AND rf.MukouFlg = 0
-            ORDER BY rf.TimeFrom DESC
-            LIMIT 1
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
-            
-            if not result or not result.get("bookingDateTime"):
-                return {
-                    "datetime": None,
-                    "datetime_raw": None,
-                    "second_choice": None,
-                    "stylist_cd": None,
-                    "time_to": None,
-                    "has_reservation": False
-                }
+            result = DBUtils.execute_single_query(connection, RESERVATION_INFO_SQL, (room_number, building_id))
+            return ReservationFetcher._format_reservation_info(result)
             
-            booking_datetime = result["bookingDateTime"]
-            booking_datetime_to = result.get("bookingDateTimeTo")
+        except Exception as e:
+            return {"error": f"予約情報取得エラー: {str(e)}"}
+    
+    @staticmethod
+    async def _get_reservation_info_async(room_number, building_id, connection):
+        """予約情報を取得（asyncio 版）"""
+        try:
+            result = await AsyncDBUtils.execute_single_query(connection, RESERVATION_INFO_SQL, (room_number, building_id))
+            return ReservationFetcher._format_reservation_info(result)
             
+        except Exception as e:
+            return {"error": f"予約情報取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _format_reservation_info(result):
+        """予約情報の行を整形"""
+        if not result or not result.get("bookingDateTime"):
             return {
-                "datetime": booking_datetime.strftime("%Y-%m-%d %H:%M"),
-                "datetime_raw": booking_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                "second_choice": result.get("secondChoiceText"),
-                "stylist_cd": result.get("stylistCD"),
-                "time_to": booking_datetime_to.strftime("%Y-%m-%d %H:%M") if booking_datetime_to else None,
-                "has_reservation": True
+                "datetime": None,
+                "datetime_raw": None,
+                "second_choice": None,
+                "stylist_cd": None,
+                "time_to": None,
+                "has_reservation": False
             }
+        
+        booking_datetime = result["bookingDateTime"]
+        booking_datetime_to = result.get("bookingDateTimeTo")
+        
+        return {
+            "datetime": booking_datetime.strftime("%Y-%m-%d %H:%M"),
+            "datetime_raw": booking_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+            "second_choice": result.get("secondChoiceText"),
+            "stylist_cd": result.get("stylistCD"),
+            "time_to": booking_datetime_to.strftime("%Y-%m-%d %H:%M") if booking_datetime_to else None,
+            "has_reservation": True
+        }
+    
+    @staticmethod
+    @db_connection
+    def get_reservation_dates_bulk(pairs, connection=None) -> dict:
+        """
+        複数の (部屋番号, 物件ID) の予約日程をまとめて取得する（架電前の一括確認用）
+        
+        Args:
+            pairs: (room_number, building_id) のリスト
+            connection: データベース接続
+            
+        Returns:
+            dict: 組み合わせごとの予約日程（重複を除いた入力順）
+        """
+        try:
+            keys = ReservationFetcher._bulk_keys(pairs)
+            if isinstance(keys, dict):
+                return keys
+            
+            rows = []
+            for sql, params in ReservationFetcher._bulk_queries(keys):
+                rows.extend(DBUtils.execute_query(connection, sql, params))
+            return ReservationFetcher._format_bulk(keys, rows)
             
         except Exception as e:
-            return {"error": f"予約情報取得エラー: {str(e)}"}
+            return handle_db_exception(e, context_message="予約日程一括取得", 
+                                     input_params={"count": len(pairs)})
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_dates_bulk_async(pairs, connection=None) -> dict:
+        """複数の (部屋番号, 物件ID) の予約日程をまとめて取得する（asyncio 版）"""
+        try:
+            keys = ReservationFetcher._bulk_keys(pairs)
+            if isinstance(keys, dict):
+                return keys
+            
+            rows = []
+            for sql, params in ReservationFetcher._bulk_queries(keys):
+                rows.extend(await AsyncDBUtils.execute_query(connection, sql, params))
+            return ReservationFetcher._format_bulk(keys, rows)
+            
+        except Exception as e:
+            return handle_db_exception(e, context_message="予約日程一括取得", 
+                                     input_params={"count": len(pairs)})
+    
+    @staticmethod
+    def _bulk_keys(pairs):
+        """入力の (部屋番号, 物件ID) を文字列にそろえて重複を除く（不正な場合はエラー）"""
+        keys = list(dict.fromkeys((str(room_number), str(building_id)) for room_number, building_id in pairs))
+        if not keys:
+            return {"error": "部屋番号・物件IDを1件以上指定してください。"}
+        if len(keys) > BULK_MAX_PAIRS:
+            return {"error": f"一度に取得できるのは{BULK_MAX_PAIRS}件までです。"}
+        return keys
+    
+    @staticmethod
+    def _bulk_queries(keys):
+        """BULK_CHUNK_SIZE 件ごとのクエリとパラメータ"""
+        for start in range(0, len(keys), BULK_CHUNK_SIZE):
+            chunk = keys[start:start + BULK_CHUNK_SIZE]
+            sql = BULK_RESERVATION_INFO_SQL.format(pairs=", ".join(["(%s, %s)"] * len(chunk)))
+            yield sql, tuple(value for key in chunk for value in key)
+    
+    @staticmethod
+    def _format_bulk(keys, rows):
+        """一括取得のレスポンスを組み立てる"""
+        latest = {}
+        for row in rows:
+            # 同じ日時の予約が複数ある場合は最初の1件
+            latest.setdefault((str(row["userCD"]), str(row["clientCD"])), row)
+        
+        reservations = []
+        for room_number, building_id in keys:
+            info = ReservationFetcher._format_reservation_info(latest.get((room_number, building_id)))
+            reservations.append({
+                "room_number": room_number,
+                "building_id": building_id,
+                "reservation_date": info["datetime"],
+                "reservation_date_raw": info["datetime_raw"],
+                "second_choice": info["second_choice"],
+                "stylist_cd": info["stylist_cd"],
+                "time_to": info["time_to"],
+                "has_reservation": info["has_reservation"]
+            })
+        
+        return {
+            "result": "ok",
+            "reservations": reservations,
+            "total_count": len(reservations),
+            "found_count": sum(1 for r in reservations if r["has_reservation"])
+        }
     
     @staticmethod
     @db_connection
     def get_reservation_history(room_number: str, building_id: str, 
-                               limit: int = 10, connection=None) -> dict:
+                               limit: int = 10, cursor: str = None, connection=None) -> dict:
         """
-        予約履歴を取得する
+        予約履歴を取得する（新しい順。続きは next_cursor を cursor に渡して取得する）
         
         Args:
             room_number: 部屋番号
             building_id: 物件ID
-            limit: 取得件数上限
+            limit: 1ページの件数（上限 MAX_PAGE_SIZE）
+            cursor: 前のページの next_cursor
             connection: データベース接続
             
         Returns:
@@ -109,44 +403,90 @@ class ReservationFetcher:
         """
         try:
             # 予約履歴を取得
-            sql = """
-            SELECT 
-                TimeFrom,
-                TimeTo,
-                SecondChoice,
-                StylistCD,
-                Status,
-                Created,
-                Updated
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            ORDER BY TimeFrom DESC
-            LIMIT %s
-            """
-            history = DBUtils.execute_query(connection, sql, (room_number, building_id, limit))
-            
-            # 履歴を整形
-            formatted_history = []
-            for record in history:
-                formatted_history.append({
-                    "datetime": record["TimeFrom"].strftime("%Y-%m-%d %H:%M") if record.get("TimeFrom") else None,
-                    "datetime_to": record["TimeTo"].strftime("%Y-%m-%d %H:%M") if record.get("TimeTo") else None,
-                    "second_choice": record.get("SecondChoice"),
-                    "stylist_cd": record.get("StylistCD"),
-                    "status": record.get("Status"),
-                    "created": record["Created"].strftime("%Y-%m-%d %H:%M:%S") if record.get("Created") else None,
-                    "updated": record["Updated"].strftime("%Y-%m-%d %H:%M:%S") if record.get("Updated") else None
-                })
+            limit = clamp_page_size(limit)
+            sql, params, key, seen = ReservationFetcher._history_query(room_number, building_id, limit, cursor)
+            history = DBUtils.execute_query(connection, sql, params)
+            return ReservationFetcher._format_history(history, limit, key, seen)
             
-            return {
-                "result": "ok",
-                "history": formatted_history,
-                "total_count": len(formatted_history)
-            }
+        except InvalidCursorError:
+            return {"error": "cursor が不正です。"}
+        except Exception as e:
+            return {"error": f"予約履歴取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_history_async(room_number: str, building_id: str, 
+                                            limit: int = 10, cursor: str = None, connection=None) -> dict:
+        """予約履歴を取得する（asyncio 版）"""
+        try:
+            limit = clamp_page_size(limit)
+            sql, params, key, seen = ReservationFetcher._history_query(room_number, building_id, limit, cursor)
+            history = await AsyncDBUtils.execute_query(connection, sql, params)
+            return ReservationFetcher._format_history(history, limit, key, seen)
             
+        except InvalidCursorError:
+            return {"error": "cursor が不正です。"}
         except Exception as e:
             return {"error": f"予約履歴取得エラー: {str(e)}"}
     
+    @staticmethod
+    def _history_query(room_number, building_id, limit, cursor):
+        """
+        予約履歴の1ページ分のクエリ（次ページの有無を判定するため limit + 1 件取得する）
+
+        Returns:
+            tuple: (SQL, パラメータ, カーソルのソートキー, そのキーの行を返した件数)
+        """
+        if not cursor:
+            return RESERVATION_HISTORY_SQL, (room_number, building_id, limit + 1), None, 0
+        key, seen = decode_keyset_cursor(RESERVATION_HISTORY_CURSOR, cursor, 2)
+        time_from, created = key
+        if time_from is None:
+            raise InvalidCursorError("cursor mismatch")
+        if created is None:
+            return (RESERVATION_HISTORY_FROM_NULL_CREATED_SQL,
+                    (room_number, building_id, time_from, time_from, limit + seen + 1), key, seen)
+        return (RESERVATION_HISTORY_FROM_SQL,
+                (room_number, building_id, time_from, time_from, created, limit + seen + 1), key, seen)
+    
+    @staticmethod
+    def _history_sort_key(record):
+        return record.get("TimeFrom"), record.get("Created")
+    
+    @staticmethod
+    def _format_history(history, limit, key=None, seen=0):
+        """予約履歴のレスポンスを組み立てる（key, seen はカーソルの内容）"""
+        if key is not None:
+            history, seen = skip_seen(history, ReservationFetcher._history_sort_key, key, seen)
+        page, has_more = split_page(history, limit)
+        # 履歴を整形
+        formatted_history = [ReservationFetcher._format_history_record(record) for record in page]
+        
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_keyset_cursor(
+                RESERVATION_HISTORY_CURSOR, page, ReservationFetcher._history_sort_key, key, seen)
+        
+        return {
+            "result": "ok",
+            "history": formatted_history,
+            "total_count": len(formatted_history),
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def _format_history_record(record):
+        """予約履歴の1行を整形"""
+        return {
+            "datetime": record["TimeFrom"].strftime("%Y-%m-%d %H:%M") if record.get("TimeFrom") else None,
+            "datetime_to": record["TimeTo"].strftime("%Y-%m-%d %H:%M") if record.get("TimeTo") else None,
+            "second_choice": record.get("SecondChoice"),
+            "stylist_cd": record.get("StylistCD"),
+            "status": record.get("Status"),
+            "created": record["Created"].strftime("%Y-%m-%d %H:%M:%S") if record.get("Created") else None,
+            "updated": record["Updated"].strftime("%Y-%m-%d %H:%M:%S") if record.get("Updated") else None
+        }
+    
     @staticmethod
     @db_connection
     def get_reservation_status(room_number: str, building_id: str, connection=None) -> dict:
@@ -163,34 +503,39 @@ class ReservationFetcher:
         """
         try:
             # 予約状況を取得
-            sql = """
-            SELECT 
-                COUNT(*) as total_reservations,
-                COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
-                COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
-                MAX(TimeFrom) as latest_reservation,
-                MIN(TimeFrom) as earliest_reservation
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
-            
-            if not result:
-                return {"error": "予約状況の取得に失敗しました。"}
+            result = DBUtils.execute_single_query(connection, RESERVATION_STATUS_SQL, (room_number, building_id))
+            return ReservationFetcher._format_status(result)
             
-            return {
-                "result": "ok",
-                "total_reservations": result.get("total_reservations", 0),
-                "active_reservations": result.get("active_reservations", 0),
-                "with_second_choice": result.get("with_second_choice", 0),
-                "latest_reservation": result["latest_reservation"].strftime("%Y-%m-%d %H:%M") if result.get("latest_reservation") else None,
-                "earliest_reservation": result["earliest_reservation"].strftime("%Y-%m-%d %H:%M") if result.get("earliest_reservation") else None,
-                "has_reservations": result.get("total_reservations", 0) > 0
-            }
+        except Exception as e:
+            return {"error": f"予約状況取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_status_async(room_number: str, building_id: str, connection=None) -> dict:
+        """予約状況を取得する（asyncio 版）"""
+        try:
+            result = await AsyncDBUtils.execute_single_query(connection, RESERVATION_STATUS_SQL, (room_number, building_id))
+            return ReservationFetcher._format_status(result)
             
         except Exception as e:
             return {"error": f"予約状況取得エラー: {str(e)}"}
     
+    @staticmethod
+    def _format_status(result):
+        """予約状況のレスポンスを組み立てる"""
+        if not result:
+            return {"error": "予約状況の取得に失敗しました。"}
+        
+        return {
+            "result": "ok",
+            "total_reservations": result.get("total_reservations", 0),
+            "active_reservations": result.get("active_reservations", 0),
+            "with_second_choice": result.get("with_second_choice", 0),
+            "latest_reservation": result["latest_reservation"].strftime("%Y-%m-%d %H:%M") if result.get("latest_reservation") else None,
+            "earliest_reservation": result["earliest_reservation"].strftime("%Y-%m-%d %H:%M") if result.get("earliest_reservation") else None,
+            "has_reservations": result.get("total_reservations", 0) > 0
+        }
+    
     @staticmethod
     @db_connection
     def get_upcoming_reservations(room_number: str, building_id: str, 
@@ -210,46 +555,102 @@ class ReservationFetcher:
         try:
             # 今後の予約を取得
             now = datetime.now()
-            future_date = now + timedelta(days=days_ahead)
+            reservations = DBUtils.execute_query(
+                connection, UPCOMING_RESERVATIONS_SQL,
+                ReservationFetcher._upcoming_params(room_number, building_id, now, days_ahead))
+            return ReservationFetcher._format_upcoming(reservations, now, days_ahead)
             
-            sql = """
-            SELECT 
-                TimeFrom,
-                TimeTo,
-                SecondChoice,
-                StylistCD,
-                Status
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            AND TimeFrom >= %s AND TimeFrom <= %s
-            ORDER BY TimeFrom ASC
-            """
-            reservations = DBUtils.execute_query(connection, sql, (
-                room_number, building_id, now.strftime("%Y-%m-%d %H:%M:%S"), 
-                future_date.strftime("%Y-%m-%d %H:%M:%S")
-            ))
+        except Exception as e:
+            return {"error": f"今後の予約取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_upcoming_reservations_async(room_number: str, building_id: str, 
+                                              days_ahead: int = 30, connection=None) -> dict:
+        """今後の予約を取得する（asyncio 版）"""
+        try:
+            now = datetime.now()
+            reservations = await AsyncDBUtils.execute_query(
+                connection, UPCOMING_RESERVATIONS_SQL,
+                ReservationFetcher._upcoming_params(room_number, building_id, now, days_ahead))
+            return ReservationFetcher._format_upcoming(reservations, now, days_ahead)
             
-            # 予約を整形
-            formatted_reservations = []
-            for record in reservations:
-                formatted_reservations.append({
-                    "datetime": record["TimeFrom"].strftime("%Y-%m-%d %H:%M") if record.get("TimeFrom") else None,
-                    "datetime_to": record["TimeTo"].strftime("%Y-%m-%d %H:%M") if record.get("TimeTo") else None,
-                    "second_choice": record.get("SecondChoice"),
-                    "stylist_cd": record.get("StylistCD"),
-                    "status": record.get("Status"),
-                    "days_from_now": (record["TimeFrom"] - now).days if record.get("TimeFrom") else None
-                })
+        except Exception as e:
+            return {"error": f"今後の予約取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _upcoming_params(room_number, building_id, now, days_ahead):
+        """今後の予約取得クエリのパラメータ"""
+        future_date = now + timedelta(days=days_ahead)
+        return (
+            room_number, building_id, now.strftime("%Y-%m-%d %H:%M:%S"), 
+            future_date.strftime("%Y-%m-%d %H:%M:%S")
+        )
+    
+    @staticmethod
+    def _format_upcoming(reservations, now, days_ahead):
+        """今後の予約のレスポンスを組み立てる"""
+        # 予約を整形
+        formatted_reservations = []
+        for record in reservations:
+            formatted_reservations.append({
+                "datetime": record["TimeFrom"].strftime("%Y-%m-%d %H:%M") if record.get("TimeFrom") else None,
+                "datetime_to": record["TimeTo"].strftime("%Y-%m-%d %H:%M") if record.get("TimeTo") else None,
+                "second_choice": record.get("SecondChoice"),
+                "stylist_cd": record.get("StylistCD"),
+                "status": record.get("Status"),
+                "days_from_now": (record["TimeFrom"] - now).days if record.get("TimeFrom") else None
+            })
+        
+        return {
+            "result": "ok",
+            "upcoming_reservations": formatted_reservations,
+            "total_count": len(formatted_reservations),
+            "days_ahead": days_ahead
+        }
+    
+    @staticmethod
+    @db_connection
+    def get_reservation_version(room_number: str, building_id: str, connection=None) -> dict:
+        """
+        予約データの版を取得する（条件付き GET の判定用。レスポンス本体は組み立てない）
+        
+        Args:
+            room_number: 部屋番号
+            building_id: 物件ID
+            connection: データベース接続
             
-            return {
-                "result": "ok",
-                "upcoming_reservations": formatted_reservations,
-                "total_count": len(formatted_reservations),
-                "days_ahead": days_ahead
-            }
+        Returns:
+            dict: {"result": "ok", "version": 版を表す文字列}
+        """
+        try:
+            result = DBUtils.execute_single_query(connection, RESERVATION_VERSION_SQL, (room_number, building_id))
+            return ReservationFetcher._format_version(result)
             
         except Exception as e:
-            return {"error": f"今後の予約取得エラー: {str(e)}"}
+            return {"error": f"予約データの版の取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_version_async(room_number: str, building_id: str, connection=None) -> dict:
+        """予約データの版を取得する（asyncio 版）"""
+        try:
+            result = await AsyncDBUtils.execute_single_query(connection, RESERVATION_VERSION_SQL, (room_number, building_id))
+            return ReservationFetcher._format_version(result)
+            
+        except Exception as e:
+            return {"error": f"予約データの版の取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _format_version(result):
+        """予約データの版（行数と最終更新日時）"""
+        if not result:
+            return {"error": "予約データの版の取得に失敗しました。"}
+        
+        last_updated = result.get("last_updated")
+        if isinstance(last_updated, datetime):
+            last_updated = last_updated.strftime("%Y-%m-%d %H:%M:%S")
+        return {"result": "ok", "version": f"{result.get('row_count', 0)}:{last_updated or ''}"}
     
     @staticmethod
     @db_connection
@@ -266,35 +667,88 @@ class ReservationFetcher:
             dict: 予約サマリー情報
         """
         try:
-            # 1. 現在の予約を取得
-            current_reservation = ReservationFetcher.get_reservation_date(room_number, building_id, connection=connection)
-            if "error" in current_reservation:
-                return current_reservation
-            
-            # 2. 予約状況を取得
-            status_info = ReservationFetcher.get_reservation_status(room_number, building_id, connection=connection)
-            if "error" in status_info:
-                return status_info
-            
-            # 3. 今後の予約を取得
-            upcoming_reservations = ReservationFetcher.get_upcoming_reservations(room_number, building_id, connection=connection)
-            if "error" in upcoming_reservations:
-                return upcoming_reservations
+            # 現在の予約・予約状況・今後の予約を1回のクエリで取得
+            now = datetime.now()
+            rows = DBUtils.execute_query(
+                connection, RESERVATION_SUMMARY_SQL, summary_params(room_number, building_id, now))
+            return build_reservation_summary(rows, now)
             
-            return {
-                "result": "ok",
-                "current_reservation": current_reservation,
-                "status": status_info,
-                "upcoming": upcoming_reservations,
-                "summary": {
-                    "has_current_reservation": current_reservation.get("has_reservation", False),
-                    "total_reservations": status_info.get("total_reservations", 0),
-                    "upcoming_count": upcoming_reservations.get("total_count", 0)
-                }
-            }
+        except Exception as e:
+            return {"error": f"予約サマリー取得エラー: {str(e)}"}
+    
+    @staticmethod
+    @async_db_connection
+    async def get_reservation_summary_async(room_number: str, building_id: str, connection=None) -> dict:
+        """予約サマリーを取得する（asyncio 版）"""
+        try:
+            now = datetime.now()
+            rows = await AsyncDBUtils.execute_query(
+                connection, RESERVATION_SUMMARY_SQL, summary_params(room_number, building_id, now))
+            return build_reservation_summary(rows, now)
             
         except Exception as e:
             return {"error": f"予約サマリー取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _format_summary(current_reservation, status_info, upcoming_reservations):
+        """予約サマリーのレスポンスを組み立てる"""
+        return {
+            "result": "ok",
+            "current_reservation": current_reservation,
+            "status": status_info,
+            "upcoming": upcoming_reservations,
+            "summary": {
+                "has_current_reservation": current_reservation.get("has_reservation", False),
+                "total_reservations": status_info.get("total_reservations", 0),
+                "upcoming_count": upcoming_reservations.get("total_count", 0)
+            }
+        }
+
+
+def summary_params(room_number, building_id, now, days_ahead=SUMMARY_DAYS_AHEAD):
+    """RESERVATION_SUMMARY_SQL のパラメータ"""
+    _, _, time_from, time_to = ReservationFetcher._upcoming_params(room_number, building_id, now, days_ahead)
+    return (time_from, time_to, room_number, building_id, building_id, room_number, building_id, time_from, time_to)
+
+
+def build_reservation_summary(rows, now, days_ahead=SUMMARY_DAYS_AHEAD):
+    """
+    RESERVATION_SUMMARY_SQL の結果から予約サマリーを組み立てる
+    （get_reservation_date / get_reservation_status / get_upcoming_reservations を順に呼んだ場合と同じ内容）
+    
+    Args:
+        rows: RESERVATION_SUMMARY_SQL の結果（先頭行の集計列は全行共通）
+        now: 今後の予約の基準日時（summary_params に渡した値）
+        days_ahead: 今後の予約の期間（日）
+    """
+    if not rows:
+        return {"error": "予約状況の取得に失敗しました。"}
+    
+    head = rows[0]
+    latest = None
+    upcoming = []
+    for row in rows:
+        if row.get("TimeFrom") is None:
+            continue
+        if row.get("is_latest") and latest is None:
+            latest = row
+        if row.get("is_upcoming"):
+            upcoming.append(row)
+    
+    # 現在の予約は物件（tClientM）が登録されている場合のみ（RESERVATION_INFO_SQL と同じ条件）
+    reservation_info = None
+    if latest is not None and head.get("clientCD") is not None:
+        reservation_info = {
+            "bookingDateTime": latest["TimeFrom"],
+            "bookingDateTimeTo": latest.get("TimeTo"),
+            "secondChoiceText": latest.get("SecondChoice"),
+            "stylistCD": latest.get("StylistCD"),
+        }
+    current_reservation = ReservationFetcher._format_reservation_date(
+        ReservationFetcher._format_reservation_info(reservation_info))
+    status_info = ReservationFetcher._format_status(head)
+    upcoming_reservations = ReservationFetcher._format_upcoming(upcoming, now, days_ahead)
+    return ReservationFetcher._format_summary(current_reservation, status_info, upcoming_reservations)
 
 
 # 便利関数（外部から直接呼び出し可能）
@@ -304,11 +758,34 @@ def get_reservation_date(room_number: str, building_id: str, connection=None) ->
     return fetcher.get_reservation_date(room_number, building_id, connection=connection)
 
 
+def get_reservation_dates_bulk(pairs, connection=None) -> dict:
+    """予約日程を一括取得（外部呼び出し用）"""
+    fetcher = ReservationFetcher()
+    return fetcher.get_reservation_dates_bulk(pairs, connection=connection)
+
+
 def get_reservation_history(room_number: str, building_id: str, 
-                          limit: int = 10, connection=None) -> dict:
+                          limit: int = 10, cursor: str = None, connection=None) -> dict:
     """予約履歴を取得（外部呼び出し用）"""
     fetcher = ReservationFetcher()
-    return fetcher.get_reservation_history(room_number, building_id, limit, connection=connection)
+    return fetcher.get_reservation_history(room_number, building_id, limit, cursor, connection=connection)
+
+
+def iter_reservation_history(room_number: str, building_id: str, connection=None):
+    """
+    予約履歴を新しい順に1件ずつ返すジェネレータ（NDJSON の逐次出力用）
+    サーバー側カーソルで読み出すため、履歴の件数に関係なくメモリ使用量は一定
+    """
+    close_conn = False
+    if connection is None:
+        connection = get_connection()
+        close_conn = True
+    try:
+        for record in DBUtils.stream_query(connection, RESERVATION_HISTORY_STREAM_SQL, (room_number, building_id)):
+            yield ReservationFetcher._format_history_record(record)
+    finally:
+        if close_conn:
+            connection.close()
 
 
 def get_reservation_status(room_number: str, building_id: str, connection=None) -> dict:
@@ -330,6 +807,50 @@ def get_reservation_summary(room_number: str, building_id: str, connection=None)
     return fetcher.get_reservation_summary(room_number, building_id, connection=connection)
 
 
+def get_reservation_version(room_number: str, building_id: str, connection=None) -> dict:
+    """予約データの版を取得（外部呼び出し用）"""
+    fetcher = ReservationFetcher()
+    return fetcher.get_reservation_version(room_number, building_id, connection=connection)
+
+
+# 便利関数（asyncio 版）
+async def get_reservation_date_async(room_number: str, building_id: str, connection=None) -> dict:
+    """予約日程を取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_date_async(room_number, building_id, connection=connection)
+
+
+async def get_reservation_dates_bulk_async(pairs, connection=None) -> dict:
+    """予約日程を一括取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_dates_bulk_async(pairs, connection=connection)
+
+
+async def get_reservation_history_async(room_number: str, building_id: str, 
+                                        limit: int = 10, cursor: str = None, connection=None) -> dict:
+    """予約履歴を取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_history_async(room_number, building_id, limit, cursor, connection=connection)
+
+
+async def get_reservation_status_async(room_number: str, building_id: str, connection=None) -> dict:
+    """予約状況を取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_status_async(room_number, building_id, connection=connection)
+
+
+async def get_upcoming_reservations_async(room_number: str, building_id: str, 
+                                          days_ahead: int = 30, connection=None) -> dict:
+    """今後の予約を取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_upcoming_reservations_async(room_number, building_id, days_ahead, connection=connection)
+
+
+async def get_reservation_summary_async(room_number: str, building_id: str, connection=None) -> dict:
+    """予約サマリーを取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_summary_async(room_number, building_id, connection=connection)
+
+
+async def get_reservation_version_async(room_number: str, building_id: str, connection=None) -> dict:
+    """予約データの版を取得（外部呼び出し用・asyncio 版）"""
+    return await ReservationFetcher.get_reservation_version_async(room_number, building_id, connection=connection)
+
+
 if __name__ == "__main__":
     # テスト用のサンプル実行
     print("予約日程取得機能のテスト")
@@ -7,9 +7,171 @@ import os
 from datetime import datetime, timedelta
 
 # ローカルモジュールをインポート
-from user import authenticate_user
+from user import execute_authenticated_query
+from reservation_fetcher import RESERVATION_SUMMARY_SQL, summary_params, build_reservation_summary
 from utils import handle_db_exception
-from utils.db_utils import db_connection, DBUtils
+from utils.db_utils import db_connection
+from utils.pagination import clamp_page_size
+
+
+AUTH_ERROR = {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
+
+# 認証と取得を1回で行うSQL（tUserM を起点に LEFT JOIN するため、認証できた場合は予約が無くても1行返る）
+# トークン認証時は tUserM を参照しない取得のみのSQLを使う
+RESERVATION_INFO_SQL = """
+            SELECT 
+                rf.TimeFrom AS bookingDateTime,
+                rf.TimeTo AS bookingDateTimeTo,
+                rf.SecondChoice AS secondChoiceText,
+                rf.StylistCD AS stylistCD
+            FROM tReservationF rf
+            JOIN tClientM cm ON rf.ClientCD = cm.ClientCD
+            WHERE rf.UserCD = %s AND rf.ClientCD = %s AND rf.MukouFlg = 0
+            ORDER BY rf.TimeFrom DESC
+            LIMIT 1
+            """
+
+AUTH_RESERVATION_INFO_SQL = """
+            SELECT 
+                u.UserCD AS authUserCD,
+                rf.TimeFrom AS bookingDateTime,
+                rf.TimeTo AS bookingDateTimeTo,
+                rf.SecondChoice AS secondChoiceText,
+                rf.StylistCD AS stylistCD
+            FROM tUserM u
+            LEFT JOIN (tReservationF rf JOIN tClientM cm ON rf.ClientCD = cm.ClientCD)
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY rf.TimeFrom DESC
+            LIMIT 1
+            """
+
+RESERVATION_HISTORY_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status,
+                Created,
+                Updated
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            ORDER BY TimeFrom DESC
+            LIMIT %s
+            """
+
+AUTH_RESERVATION_HISTORY_SQL = """
+            SELECT 
+                u.UserCD AS authUserCD,
+                rf.UserCD AS reservationUserCD,
+                rf.TimeFrom,
+                rf.TimeTo,
+                rf.SecondChoice,
+                rf.StylistCD,
+                rf.Status,
+                rf.Created,
+                rf.Updated
+            FROM tUserM u
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY rf.TimeFrom DESC
+            LIMIT %s
+            """
+
+RESERVATION_STATUS_SQL = """
+            SELECT 
+                COUNT(*) as total_reservations,
+                COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
+                COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
+                MAX(TimeFrom) as latest_reservation,
+                MIN(TimeFrom) as earliest_reservation
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            """
+
+AUTH_RESERVATION_STATUS_SQL = """
+            SELECT 
+                u.UserCD AS authUserCD,
+                COUNT(rf.UserCD) as total_reservations,
+                COUNT(CASE WHEN rf.Status = 1 THEN 1 END) as active_reservations,
+                COUNT(CASE WHEN rf.SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
+                MAX(rf.TimeFrom) as latest_reservation,
+                MIN(rf.TimeFrom) as earliest_reservation
+            FROM tUserM u
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            GROUP BY u.UserCD
+            """
+
+UPCOMING_RESERVATIONS_SQL = """
+            SELECT 
+                TimeFrom,
+                TimeTo,
+                SecondChoice,
+                StylistCD,
+                Status
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            AND TimeFrom >= %s AND TimeFrom <= %s
+            ORDER BY TimeFrom ASC
+            """
+
+AUTH_UPCOMING_RESERVATIONS_SQL = """
+            SELECT 
+                u.UserCD AS authUserCD,
+                rf.UserCD AS reservationUserCD,
+                rf.TimeFrom,
+                rf.TimeTo,
+                rf.SecondChoice,
+                rf.StylistCD,
+                rf.Status
+            FROM tUserM u
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+                AND rf.TimeFrom >= %s AND rf.TimeFrom <= %s
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY rf.TimeFrom ASC
+            """
+
+# 予約サマリー（RESERVATION_SUMMARY_SQL の認証あり版）
+# パラメータ: (今後の期間の開始, 終了, UserCD, ClientCD, 開始, 終了, UserCD, Passwd, ClientCD)
+AUTH_RESERVATION_SUMMARY_SQL = """
+            SELECT 
+                u.UserCD AS authUserCD,
+                s.total_reservations,
+                s.active_reservations,
+                s.with_second_choice,
+                s.latest_reservation,
+                s.earliest_reservation,
+                cm.ClientCD AS clientCD,
+                rf.TimeFrom,
+                rf.TimeTo,
+                rf.SecondChoice,
+                rf.StylistCD,
+                rf.Status,
+                CASE WHEN rf.TimeFrom = s.latest_reservation THEN 1 ELSE 0 END AS is_latest,
+                CASE WHEN rf.TimeFrom >= %s AND rf.TimeFrom <= %s THEN 1 ELSE 0 END AS is_upcoming
+            FROM tUserM u
+            CROSS JOIN (
+                SELECT 
+                    COUNT(*) as total_reservations,
+                    COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
+                    COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
+                    MAX(TimeFrom) as latest_reservation,
+                    MIN(TimeFrom) as earliest_reservation
+                FROM tReservationF 
+                WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
+            ) s
+            LEFT JOIN tClientM cm ON cm.ClientCD = u.ClientCD
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+                AND (rf.TimeFrom = s.latest_reservation OR (rf.TimeFrom >= %s AND rf.TimeFrom <= %s))
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY rf.TimeFrom ASC
+            """
 
 
 class ReservationFetcher:
@@ -31,15 +193,15 @@ class ReservationFetcher:
             dict: 予約日程情報
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
+            # 認証と予約情報の取得を1回のクエリで行う
+            rows = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_RESERVATION_INFO_SQL, (room_number, password, building_id),
+                RESERVATION_INFO_SQL, (room_number, building_id), row_key="bookingDateTime")
+            if rows is None:
+                return AUTH_ERROR
             
-            # 2. 予約情報を取得
-            reservation_info = ReservationFetcher._get_reservation_info(room_number, building_id, connection)
-            if "error" in reservation_info:
-                return reservation_info
+            reservation_info = ReservationFetcher._format_reservation_info(rows[0] if rows else None)
             
             return {
                 "result": "ok",
@@ -56,47 +218,29 @@ class ReservationFetcher:
                                      input_params={"room_number": room_number, "building_id": building_id})
     
     @staticmethod
-    def _get_reservation_info(room_number, building_id, connection):
-        """予約情報を取得"""
-        try:
-            sql = """
-            SELECT 
-                rf.TimeFrom AS bookingDateTime,
-                rf.TimeTo AS bookingDateTimeTo,
-                rf.SecondChoice AS secondChoiceText,
-                rf.StylistCD AS stylistCD
-            FROM tReservationF rf
-            JOIN tClientM cm ON rf.ClientCD = cm.ClientCD
-            WHERE rf.UserCD = %s AND rf.ClientCD = %s AND rf.MukouFlg = 0
-            ORDER BY rf.TimeFrom DESC
-            LIMIT 1
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
-            
-            if not result or not result.get("bookingDateTime"):
-                return {
-                    "datetime": None,
-                    "datetime_raw": None,
-                    "second_choice": None,
-                    "stylist_cd": None,
-                    "time_to": None,
-                    "has_reservation": False
-                }
-            
-            booking_datetime = result["bookingDateTime"]
-            booking_datetime_to = result.get("bookingDateTimeTo")
-            
+    def _format_reservation_info(result):
+        """予約情報を整形"""
+        if not result or not result.get("bookingDateTime"):
             return {
-                "datetime": booking_datetime.strftime("%Y-%m-%d %H:%M"),
-                "datetime_raw": booking_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                "second_choice": result.get("secondChoiceText"),
-                "stylist_cd": result.get("stylistCD"),
-                "time_to": booking_datetime_to.strftime("%Y-%m-%d %H:%M") if booking_datetime_to else None,
-                "has_reservation": True
+                "datetime": None,
+                "datetime_raw": None,
+                "second_choice": None,
+                "stylist_cd": None,
+                "time_to": None,
+                "has_reservation": False
             }
-            
-        except Exception as e:
-            return {"error": f"予約情報取得エラー: {str(e)}"}
+        
+        booking_datetime = result["bookingDateTime"]
+        booking_datetime_to = result.get("bookingDateTimeTo")
+        
+        return {
+            "datetime": booking_datetime.strftime("%Y-%m-%d %H:%M"),
+            "datetime_raw": booking_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+            "second_choice": result.get("secondChoiceText"),
+            "stylist_cd": result.get("stylistCD"),
+            "time_to": booking_datetime_to.strftime("%Y-%m-%d %H:%M") if booking_datetime_to else None,
+            "has_reservation": True
+        }
     
     @staticmethod
     @db_connection
@@ -109,34 +253,21 @@ class ReservationFetcher:
             room_number: 部屋番号
             password: パスワード
             building_id: 物件ID
-            limit: 取得件数上限
+            limit: 取得件数上限（上限 MAX_PAGE_SIZE）
             connection: データベース接続
             
         Returns:
             dict: 予約履歴情報
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
-            
-            # 2. 予約履歴を取得
-            sql = """
-            SELECT 
-                TimeFrom,
-                TimeTo,
-                SecondChoice,
-                StylistCD,
-                Status,
-                Created,
-                Updated
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            ORDER BY TimeFrom DESC
-            LIMIT %s
-            """
-            history = DBUtils.execute_query(connection, sql, (room_number, building_id, limit))
+            limit = clamp_page_size(limit)
+            # 認証と予約履歴の取得を1回のクエリで行う
+            history = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_RESERVATION_HISTORY_SQL, (room_number, password, building_id, limit),
+                RESERVATION_HISTORY_SQL, (room_number, building_id, limit), row_key="reservationUserCD")
+            if history is None:
+                return AUTH_ERROR
             
             # 履歴を整形
             formatted_history = []
@@ -176,23 +307,14 @@ class ReservationFetcher:
             dict: 予約状況情報
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
-            
-            # 2. 予約状況を取得
-            sql = """
-            SELECT 
-                COUNT(*) as total_reservations,
-                COUNT(CASE WHEN Status = 1 THEN 1 END) as active_reservations,
-                COUNT(CASE WHEN SecondChoice IS NOT NULL THEN 1 END) as with_second_choice,
-                MAX(TimeFrom) as latest_reservation,
-                MIN(TimeFrom) as earliest_reservation
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
+            # 認証と予約状況の集計を1回のクエリで行う
+            rows = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_RESERVATION_STATUS_SQL, (room_number, password, building_id),
+                RESERVATION_STATUS_SQL, (room_number, building_id))
+            if rows is None:
+                return AUTH_ERROR
+            result = rows[0] if rows else None
             
             if not result:
                 return {"error": "予約状況の取得に失敗しました。"}
@@ -228,31 +350,19 @@ class ReservationFetcher:
             dict: 今後の予約情報
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
-            
-            # 2. 今後の予約を取得
             now = datetime.now()
             future_date = now + timedelta(days=days_ahead)
+            time_from = now.strftime("%Y-%m-%d %H:%M:%S")
+            time_to = future_date.strftime("%Y-%m-%d %H:%M:%S")
             
-            sql = """
-            SELECT 
-                TimeFrom,
-                TimeTo,
-                SecondChoice,
-                StylistCD,
-                Status
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0
-            AND TimeFrom >= %s AND TimeFrom <= %s
-            ORDER BY TimeFrom ASC
-            """
-            reservations = DBUtils.execute_query(connection, sql, (
-                room_number, building_id, now.strftime("%Y-%m-%d %H:%M:%S"), 
-                future_date.strftime("%Y-%m-%d %H:%M:%S")
-            ))
+            # 認証と今後の予約の取得を1回のクエリで行う
+            reservations = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_UPCOMING_RESERVATIONS_SQL, (time_from, time_to, room_number, password, building_id),
+                UPCOMING_RESERVATIONS_SQL, (room_number, building_id, time_from, time_to),
+                row_key="reservationUserCD")
+            if reservations is None:
+                return AUTH_ERROR
             
             # 予約を整形
             formatted_reservations = []
@@ -292,32 +402,19 @@ class ReservationFetcher:
             dict: 予約サマリー情報
         """
         try:
-            # 1. 現在の予約を取得
-            current_reservation = ReservationFetcher.get_reservation_date(room_number, password, building_id, connection=connection)
-            if "error" in current_reservation:
-                return current_reservation
-            
-            # 2. 予約状況を取得
-            status_info = ReservationFetcher.get_reservation_status(room_number, password, building_id, connection=connection)
-            if "error" in status_info:
-                return status_info
-            
-            # 3. 今後の予約を取得
-            upcoming_reservations = ReservationFetcher.get_upcoming_reservations(room_number, password, building_id, connection=connection)
-            if "error" in upcoming_reservations:
-                return upcoming_reservations
+            # 認証と現在の予約・予約状況・今後の予約の取得を1回のクエリで行う
+            now = datetime.now()
+            params = summary_params(room_number, building_id, now)
+            time_from, time_to = params[0], params[1]
+            rows = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_RESERVATION_SUMMARY_SQL,
+                (time_from, time_to, room_number, building_id, time_from, time_to, room_number, password, building_id),
+                RESERVATION_SUMMARY_SQL, params)
+            if rows is None:
+                return AUTH_ERROR
             
-            return {
-                "result": "ok",
-                "current_reservation": current_reservation,
-                "status": status_info,
-                "upcoming": upcoming_reservations,
-                "summary": {
-                    "has_current_reservation": current_reservation.get("has_reservation", False),
-                    "total_reservations": status_info.get("total_reservations", 0),
-                    "upcoming_count": upcoming_reservations.get("total_count", 0)
-                }
-            }
+            return build_reservation_summary(rows, now)
             
         except Exception as e:
             return {"error": f"予約サマリー取得エラー: {str(e)}"}
@@ -15,8 +15,8 @@ class SecondChoiceContentLogic:
         self.waku_patterns = {}
         self.time_slots = {}
         try:
-            from utils.waku_loader import load_waku_patterns
-            self.waku_patterns = load_waku_patterns()
+            from utils.waku_loader import get_waku_pattern_registry
+            self.waku_patterns = get_waku_pattern_registry().get_patterns()
             # print(self.waku_patterns)
         except Exception:
             pass
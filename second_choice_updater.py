@@ -6,9 +6,13 @@ import sys
 import os
 
 # ローカルモジュールをインポート
-from taio_record import insert_taio_record
+from connection import get_connection
+from taio_writer import log_taio_record
 from utils import handle_db_exception
 from utils.db_utils import db_connection, DBUtils
+from utils.pagination import (
+    InvalidCursorError, clamp_page_size, encode_keyset_cursor, decode_keyset_cursor, skip_seen, split_page,
+)
 from second_choice_content_logic import (
     build_second_choice_string,
     validate_second_choice_input,
@@ -17,6 +21,52 @@ from typing import Optional
 from utils.pattern_utils import PatternUtils
 
 
+# 対応履歴のうち第二希望関連の記録（新しい順。同じ日時は TaioCD の大きい順）
+# LIKE のワイルドカードはパラメータ展開と区別するため %% と書く
+SECOND_CHOICE_HISTORY_SQL = """
+            SELECT TaioCD, TaioNotes, Created, Category
+            FROM tTaioF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            AND (Category LIKE '%%|2|%%' OR TaioNotes LIKE '%%第二希望%%')
+            ORDER BY Created DESC, TaioCD DESC, TaioNotes DESC, Category DESC 
+            LIMIT %s
+            """
+
+# 2ページ目以降（カーソルの (Created, TaioCD) 以降の行。同じキーの行は返した件数だけ読み飛ばす）
+# Created DESC では NULL が最後に並ぶため、NULL の行はキーより後として扱う
+SECOND_CHOICE_HISTORY_FROM_SQL = """
+            SELECT TaioCD, TaioNotes, Created, Category
+            FROM tTaioF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            AND (Category LIKE '%%|2|%%' OR TaioNotes LIKE '%%第二希望%%')
+            AND (Created < %s OR (Created = %s AND TaioCD <= %s) OR Created IS NULL)
+            ORDER BY Created DESC, TaioCD DESC, TaioNotes DESC, Category DESC 
+            LIMIT %s
+            """
+
+# カーソルの Created が NULL の場合
+SECOND_CHOICE_HISTORY_FROM_NULL_CREATED_SQL = """
+            SELECT TaioCD, TaioNotes, Created, Category
+            FROM tTaioF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            AND (Category LIKE '%%|2|%%' OR TaioNotes LIKE '%%第二希望%%')
+            AND Created IS NULL AND TaioCD <= %s
+            ORDER BY Created DESC, TaioCD DESC, TaioNotes DESC, Category DESC 
+            LIMIT %s
+            """
+
+# 全件（逐次出力用）
+SECOND_CHOICE_HISTORY_STREAM_SQL = """
+            SELECT TaioCD, TaioNotes, Created, Category
+            FROM tTaioF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            AND (Category LIKE '%%|2|%%' OR TaioNotes LIKE '%%第二希望%%')
+            ORDER BY Created DESC, TaioCD DESC, TaioNotes DESC, Category DESC
+            """
+
+SECOND_CHOICE_HISTORY_CURSOR = "second_choice_history"
+
+
 class SecondChoiceUpdater:
     """第二希望更新処理を管理するクラス"""
     
@@ -170,7 +220,7 @@ class SecondChoiceUpdater:
             masked_choice = second_choice_text[:50] + "..." if len(second_choice_text) > 50 else second_choice_text
             notes = f"[AI電話第二希望更新] {masked_choice}"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -268,7 +318,7 @@ class SecondChoiceUpdater:
         try:
             notes = "[AI電話第二希望クリア] 第二希望を削除しました"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -283,39 +333,66 @@ class SecondChoiceUpdater:
     @staticmethod
     @db_connection
     def get_second_choice_history(room_number: str, building_id: str, 
-                                limit: int = 10, connection=None) -> dict:
+                                limit: int = 10, cursor: str = None, connection=None) -> dict:
         """
-        第二希望の変更履歴を取得
+        第二希望の変更履歴を取得（新しい順。続きは next_cursor を cursor に渡して取得する）
         
         Args:
             room_number: 部屋番号
             building_id: 物件ID
-            limit: 取得件数上限
+            limit: 1ページの件数（上限 MAX_PAGE_SIZE）
+            cursor: 前のページの next_cursor
             connection: データベース接続
             
         Returns:
             dict: 第二希望変更履歴
         """
         try:
-            # 対応履歴から第二希望関連の記録を取得
-            sql = """
-            SELECT TaioNotes, Created, Category
-            FROM tTaioF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
-            AND (Category LIKE '%|2|%' OR TaioNotes LIKE '%第二希望%')
-            ORDER BY Created DESC 
-            LIMIT %s
-            """
-            history = DBUtils.execute_query(connection, sql, (room_number, building_id, limit))
+            # 対応履歴から第二希望関連の記録を取得（次ページの有無を判定するため limit + 1 件）
+            limit = clamp_page_size(limit)
+            key, seen = None, 0
+            if cursor:
+                key, seen = decode_keyset_cursor(SECOND_CHOICE_HISTORY_CURSOR, cursor, 2)
+                created, taio_cd = key
+                if taio_cd is None:
+                    raise InvalidCursorError("cursor mismatch")
+                if created is None:
+                    rows = DBUtils.execute_query(connection, SECOND_CHOICE_HISTORY_FROM_NULL_CREATED_SQL, (
+                        room_number, building_id, taio_cd, limit + seen + 1))
+                else:
+                    rows = DBUtils.execute_query(connection, SECOND_CHOICE_HISTORY_FROM_SQL, (
+                        room_number, building_id, created, created, taio_cd, limit + seen + 1))
+                rows, seen = skip_seen(rows, SecondChoiceUpdater._history_sort_key, key, seen)
+            else:
+                rows = DBUtils.execute_query(connection, SECOND_CHOICE_HISTORY_SQL, (room_number, building_id, limit + 1))
+            
+            page, has_more = split_page(rows, limit)
+            history = [SecondChoiceUpdater._format_history_record(row) for row in page]
+            next_cursor = None
+            if has_more:
+                next_cursor = encode_keyset_cursor(
+                    SECOND_CHOICE_HISTORY_CURSOR, page, SecondChoiceUpdater._history_sort_key, key, seen)
             
             return {
                 "result": "ok",
                 "history": history,
-                "total_count": len(history)
+                "total_count": len(history),
+                "next_cursor": next_cursor
             }
             
+        except InvalidCursorError:
+            return {"error": "cursor が不正です。"}
         except Exception as e:
             return {"error": f"第二希望履歴取得エラー: {str(e)}"}
+    
+    @staticmethod
+    def _history_sort_key(row):
+        return row.get("Created"), row.get("TaioCD")
+    
+    @staticmethod
+    def _format_history_record(row):
+        """第二希望の変更履歴の1行（ソート用の TaioCD は返さない）"""
+        return {"TaioNotes": row.get("TaioNotes"), "Created": row.get("Created"), "Category": row.get("Category")}
 
 
 # 便利関数（外部から直接呼び出し可能）
@@ -349,10 +426,27 @@ def clear_second_choice(room_number: str, building_id: str, connection=None) ->
 
 
 def get_second_choice_history(room_number: str, building_id: str, 
-                             limit: int = 10, connection=None) -> dict:
+                             limit: int = 10, cursor: str = None, connection=None) -> dict:
     """第二希望の変更履歴を取得（外部呼び出し用）"""
     updater = SecondChoiceUpdater()
-    return updater.get_second_choice_history(room_number, building_id, limit, connection=connection)
+    return updater.get_second_choice_history(room_number, building_id, limit, cursor, connection=connection)
+
+
+def iter_second_choice_history(room_number: str, building_id: str, connection=None):
+    """
+    第二希望の変更履歴を新しい順に1件ずつ返すジェネレータ（NDJSON の逐次出力用）
+    サーバー側カーソルで読み出すため、履歴の件数に関係なくメモリ使用量は一定
+    """
+    close_conn = False
+    if connection is None:
+        connection = get_connection()
+        close_conn = True
+    try:
+        for row in DBUtils.stream_query(connection, SECOND_CHOICE_HISTORY_STREAM_SQL, (room_number, building_id)):
+            yield SecondChoiceUpdater._format_history_record(row)
+    finally:
+        if close_conn:
+            connection.close()
 
 
 if __name__ == "__main__":
@@ -6,10 +6,11 @@ import sys
 import os
 
 # ローカルモジュールをインポート
-from user import authenticate_user
-from taio_record import insert_taio_record
+from user import authenticate_user, execute_authenticated_query
+from taio_writer import log_taio_record
 from utils import handle_db_exception
 from utils.db_utils import db_connection, DBUtils
+from utils.pagination import clamp_page_size
 from second_choice_content_logic import (
     build_second_choice_string,
     validate_second_choice_input,
@@ -18,6 +19,48 @@ from typing import Optional
 from utils.pattern_utils import PatternUtils
 
 
+AUTH_ERROR = {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
+
+# 認証と取得を1回で行うSQL（tUserM を起点に LEFT JOIN するため、認証できた場合はデータが無くても1行返る）
+# トークン認証時は tUserM を参照しない取得のみのSQLを使う
+CURRENT_RESERVATION_SQL = """
+            SELECT TimeFrom, SecondChoice
+            FROM tReservationF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            ORDER BY TimeFrom DESC LIMIT 1
+            """
+
+AUTH_CURRENT_RESERVATION_SQL = """
+            SELECT u.UserCD AS authUserCD, rf.TimeFrom, rf.SecondChoice
+            FROM tUserM u
+            LEFT JOIN tReservationF rf
+                ON rf.UserCD = u.UserCD AND rf.ClientCD = u.ClientCD AND rf.MukouFlg = 0
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY rf.TimeFrom DESC LIMIT 1
+            """
+
+# LIKE のワイルドカードはパラメータ展開と区別するため %% と書く
+SECOND_CHOICE_HISTORY_SQL = """
+            SELECT TaioNotes, Created, Category
+            FROM tTaioF 
+            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
+            AND (Category LIKE '%%|2|%%' OR TaioNotes LIKE '%%第二希望%%')
+            ORDER BY Created DESC 
+            LIMIT %s
+            """
+
+AUTH_SECOND_CHOICE_HISTORY_SQL = """
+            SELECT u.UserCD AS authUserCD, tf.UserCD AS taioUserCD, tf.TaioNotes, tf.Created, tf.Category
+            FROM tUserM u
+            LEFT JOIN tTaioF tf
+                ON tf.UserCD = u.UserCD AND tf.ClientCD = u.ClientCD AND tf.MukouFlg = 0
+                AND (tf.Category LIKE '%%|2|%%' OR tf.TaioNotes LIKE '%%第二希望%%')
+            WHERE u.UserCD = %s AND u.Passwd = %s AND u.ClientCD = %s
+            ORDER BY tf.Created DESC 
+            LIMIT %s
+            """
+
+
 class SecondChoiceUpdater:
     """第二希望更新処理を管理するクラス"""
     
@@ -102,25 +145,23 @@ class SecondChoiceUpdater:
     def _get_current_reservation(room_number, building_id, connection):
         """現在の予約情報を取得"""
         try:
-            sql = """
-            SELECT TimeFrom, SecondChoice
-            FROM tReservationF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
-            ORDER BY TimeFrom DESC LIMIT 1
-            """
-            result = DBUtils.execute_single_query(connection, sql, (room_number, building_id))
-            
-            if not result or not result.get("TimeFrom"):
-                return {"error": "現在の予約情報が見つかりません。"}
-            
-            return {
-                "datetime": result["TimeFrom"].strftime("%Y-%m-%d %H:%M"),
-                "current_second_choice": result.get("SecondChoice")
-            }
+            result = DBUtils.execute_single_query(connection, CURRENT_RESERVATION_SQL, (room_number, building_id))
+            return SecondChoiceUpdater._format_current_reservation(result)
             
         except Exception as e:
             return {"error": f"予約情報取得エラー: {str(e)}"}
     
+    @staticmethod
+    def _format_current_reservation(result):
+        """現在の予約情報を整形"""
+        if not result or not result.get("TimeFrom"):
+            return {"error": "現在の予約情報が見つかりません。"}
+        
+        return {
+            "datetime": result["TimeFrom"].strftime("%Y-%m-%d %H:%M"),
+            "current_second_choice": result.get("SecondChoice")
+        }
+    
     @staticmethod
     def _validate_second_choice_text(second_choice_text):
         """第二希望テキストの検証"""
@@ -177,7 +218,7 @@ class SecondChoiceUpdater:
             masked_choice = second_choice_text[:50] + "..." if len(second_choice_text) > 50 else second_choice_text
             notes = f"[AI電話第二希望更新] {masked_choice}"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -205,14 +246,15 @@ class SecondChoiceUpdater:
             dict: 現在の第二希望情報
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
-            
-            # 2. 現在の予約情報を取得
-            current_reservation = SecondChoiceUpdater._get_current_reservation(
-                room_number, building_id, connection)
+            # 認証と現在の予約情報の取得を1回のクエリで行う
+            rows = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_CURRENT_RESERVATION_SQL, (room_number, password, building_id),
+                CURRENT_RESERVATION_SQL, (room_number, building_id))
+            if rows is None:
+                return AUTH_ERROR
+            
+            current_reservation = SecondChoiceUpdater._format_current_reservation(rows[0] if rows else None)
             if "error" in current_reservation:
                 return current_reservation
             
@@ -287,7 +329,7 @@ class SecondChoiceUpdater:
         try:
             notes = "[AI電話第二希望クリア] 第二希望を削除しました"
             
-            insert_taio_record(
+            log_taio_record(
                 room_number=room_number,
                 building_id=building_id,
                 notes=notes,
@@ -310,28 +352,25 @@ class SecondChoiceUpdater:
             room_number: 部屋番号
             password: パスワード
             building_id: 物件ID
-            limit: 取得件数上限
+            limit: 取得件数上限（上限 MAX_PAGE_SIZE）
             connection: データベース接続
             
         Returns:
             dict: 第二希望変更履歴
         """
         try:
-            # 1. 認証チェック
-            auth_result = authenticate_user(room_number, password, building_id, connection)
-            if "error" in auth_result:
-                return {"error": "認証に失敗しました。部屋番号・パスワード・物件管理番号をご確認ください。"}
-            
-            # 2. 対応履歴から第二希望関連の記録を取得
-            sql = """
-            SELECT TaioNotes, Created, Category
-            FROM tTaioF 
-            WHERE UserCD = %s AND ClientCD = %s AND MukouFlg = 0 
-            AND (Category LIKE '%|2|%' OR TaioNotes LIKE '%第二希望%')
-            ORDER BY Created DESC 
-            LIMIT %s
-            """
-            history = DBUtils.execute_query(connection, sql, (room_number, building_id, limit))
+            limit = clamp_page_size(limit)
+            # 認証と対応履歴（第二希望関連）の取得を1回のクエリで行う
+            rows = execute_authenticated_query(
+                connection, room_number, password, building_id,
+                AUTH_SECOND_CHOICE_HISTORY_SQL, (room_number, password, building_id, limit),
+                SECOND_CHOICE_HISTORY_SQL, (room_number, building_id, limit), row_key="taioUserCD")
+            if rows is None:
+                return AUTH_ERROR
+            history = [
+                {"TaioNotes": row.get("TaioNotes"), "Created": row.get("Created"), "Category": row.get("Category")}
+                for row in rows
+            ]
             
             return {
                 "result": "ok",
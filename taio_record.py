@@ -9,13 +9,68 @@ import os
 from connection import get_connection
 from utils import handle_db_exception
 from utils.db_utils import DBUtils
+from utils.async_db_utils import async_db_connection, AsyncDBUtils
+from utils.id_allocator import (
+    SequenceUnavailableError, get_taio_cd_allocator, next_taio_cd, next_taio_cd_async,
+)
+
+
+# MySQL の重複キーエラー（ER_DUP_ENTRY）
+DUPLICATE_KEY_ERROR = 1062
+
+
+MAX_TAIO_CD_SQL = "SELECT MAX(TaioCD) AS max_taio_cd FROM tTaioF"
+INSERT_TAIO_SQL = """
+    INSERT INTO tTaioF (
+        TaioCD, ClientCD, UserCD, Category, TaioNotes, LastTimeNittei, Creator, Updater, Created, Updated
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
+    )
+"""
+# 複数行の一括登録用（行数分の VALUES をつなげて1回の INSERT にする。登録日時は1件ずつの登録と同じく DB の NOW()）
+# executemany の複数行への書き換えは VALUES がプレースホルダのみの場合に限られるため、文は INSERT_TAIO_BATCH_ROW から組み立てる
+INSERT_TAIO_BATCH_SQL = """
+    INSERT INTO tTaioF (
+        TaioCD, ClientCD, UserCD, Category, TaioNotes, LastTimeNittei, Creator, Updater, Created, Updated
+    ) VALUES
+"""
+INSERT_TAIO_BATCH_ROW = "(%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())"
+
+
+def _is_duplicate_key(e):
+    """重複キーエラーかどうか"""
+    return bool(getattr(e, "args", None)) and e.args[0] == DUPLICATE_KEY_ERROR
+
+
+def _allocate_taio_cd(connection):
+    """
+    TaioCD を採番テーブルから払い出す
+    採番テーブル・採番行が存在しない場合のみ従来どおり MAX(TaioCD) + 1 で採番する
+    （その他のエラーは呼び出し元に返す。確保済みの範囲を持つ他のワーカーとの重複を避けるため）
+    """
+    try:
+        return next_taio_cd(connection)
+    except SequenceUnavailableError as e:
+        print(f"[insert_taio_record] 採番テーブルを使用できないため MAX(TaioCD)+1 で採番します: {e}")
+        row = DBUtils.execute_single_query(connection, MAX_TAIO_CD_SQL, None)
+        return (row["max_taio_cd"] or 0) + 1
+
+
+async def _allocate_taio_cd_async(connection):
+    """TaioCD を採番テーブルから払い出す（asyncio 版）"""
+    try:
+        return await next_taio_cd_async(connection)
+    except SequenceUnavailableError as e:
+        print(f"[insert_taio_record_async] 採番テーブルを使用できないため MAX(TaioCD)+1 で採番します: {e}")
+        row = await AsyncDBUtils.execute_single_query(connection, MAX_TAIO_CD_SQL, None)
+        return (row["max_taio_cd"] or 0) + 1
 
 
 def insert_taio_record(room_number: str, building_id: str, notes: str, category: str, 
                       creator: str, updater: str, last_time_nittei=None, connection=None) -> dict:
     """
     tTaioF（対応履歴）テーブルにレコードを登録する
-    TaioCDは最新値+1で採番する
+    TaioCDは採番テーブル（tSequenceM）からプロセス内にまとめて確保した値を使う
     
     Args:
         room_number: 部屋番号
@@ -38,24 +93,24 @@ def insert_taio_record(room_number: str, building_id: str, notes: str, category:
     try:
         print(f"[insert_taio_record] params: room_number={room_number}, building_id={building_id}, notes={notes}, category={category}, creator={creator}, updater={updater}, last_time_nittei={last_time_nittei}")
         
-        # TaioCDの最新値を取得し+1
-        row = DBUtils.execute_single_query(connection, "SELECT MAX(TaioCD) AS max_taio_cd FROM tTaioF", None)
-        new_taio_cd = (row["max_taio_cd"] or 0) + 1
+        # TaioCDを採番
+        new_taio_cd = _allocate_taio_cd(connection)
         
-        sql = """
-            INSERT INTO tTaioF (
-                TaioCD, ClientCD, UserCD, Category, TaioNotes, LastTimeNittei, Creator, Updater, Created, Updated
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
-            )
-        """
         last_time_value = last_time_nittei if last_time_nittei and str(last_time_nittei).strip() else None
         print(f"[insert_taio_record] LastTimeNittei処理: 元の値='{last_time_nittei}', 設定値='{last_time_value}'")
         
         params = [new_taio_cd, building_id, room_number, category, notes, last_time_value, creator, updater]
         print(f"[insert_taio_record] SQL params: {params}")
         
-        DBUtils.execute_update(connection, sql, tuple(params))
+        try:
+            DBUtils.execute_update(connection, INSERT_TAIO_SQL, tuple(params))
+        except Exception as e:
+            if not _is_duplicate_key(e):
+                raise
+            # 採番テーブルを経由しない登録とIDが重複した場合は確保済みのIDを破棄して1回だけ採番し直す
+            get_taio_cd_allocator().discard()
+            new_taio_cd = params[0] = _allocate_taio_cd(connection)
+            DBUtils.execute_update(connection, INSERT_TAIO_SQL, tuple(params))
         print(f"[insert_taio_record] 登録完了: TaioCD={new_taio_cd}")
         
         return {"result": "ok", "TaioCD": new_taio_cd}
@@ -73,6 +128,91 @@ def insert_taio_record(room_number: str, building_id: str, notes: str, category:
             connection.close()
 
 
+def insert_taio_records(records, connection=None) -> dict:
+    """
+    複数の対応履歴を1回の複数行 INSERT で登録する（書き込みキューからの一括登録用）
+    
+    Args:
+        records: insert_taio_record の引数（room_number, building_id, notes, category, creator,
+                 updater, last_time_nittei）を持つ dict のリスト（Created / Updated は登録時の NOW()）
+        connection: データベース接続
+        
+    Returns:
+        dict: 登録結果（TaioCD は records と同じ順序のリスト）
+    """
+    if not records:
+        return {"result": "ok", "TaioCD": []}
+    
+    close_conn = False
+    if connection is None:
+        connection = get_connection()
+        close_conn = True
+    
+    try:
+        taio_cds = [_allocate_taio_cd(connection) for _ in records]
+        params = []
+        for taio_cd, record in zip(taio_cds, records):
+            last_time_nittei = record.get("last_time_nittei")
+            last_time_value = last_time_nittei if last_time_nittei and str(last_time_nittei).strip() else None
+            params.extend((
+                taio_cd, record["building_id"], record["room_number"], record["category"], record["notes"],
+                last_time_value, record["creator"], record["updater"],
+            ))
+        
+        sql = INSERT_TAIO_BATCH_SQL + ",\n".join([INSERT_TAIO_BATCH_ROW] * len(records))
+        DBUtils.execute_update(connection, sql, tuple(params))
+        print(f"[insert_taio_records] 登録完了: {len(taio_cds)}件 TaioCD={taio_cds[0]}〜{taio_cds[-1]}")
+        
+        return {"result": "ok", "TaioCD": taio_cds}
+            
+    except Exception as e:
+        if connection:
+            connection.rollback()
+        if _is_duplicate_key(e):
+            # 次回の採番で確保し直す（呼び出し側は1件ずつの登録に切り替える）
+            get_taio_cd_allocator().discard()
+        print(f"[insert_taio_records] 例外発生: {e}")
+        return handle_db_exception(e, context_message="tTaioF一括登録", 
+                                 input_params={"count": len(records)})
+    finally:
+        if close_conn:
+            connection.close()
+
+
+@async_db_connection
+async def insert_taio_record_async(room_number: str, building_id: str, notes: str, category: str, 
+                                   creator: str, updater: str, last_time_nittei=None, connection=None) -> dict:
+    """
+    tTaioF（対応履歴）テーブルにレコードを登録する（asyncio 版）
+    引数・戻り値は insert_taio_record と同じ
+    """
+    try:
+        new_taio_cd = await _allocate_taio_cd_async(connection)
+        
+        last_time_value = last_time_nittei if last_time_nittei and str(last_time_nittei).strip() else None
+        params = [new_taio_cd, building_id, room_number, category, notes, last_time_value, creator, updater]
+        
+        try:
+            await AsyncDBUtils.execute_update(connection, INSERT_TAIO_SQL, tuple(params))
+        except Exception as e:
+            if not _is_duplicate_key(e):
+                raise
+            get_taio_cd_allocator().discard()
+            new_taio_cd = params[0] = await _allocate_taio_cd_async(connection)
+            await AsyncDBUtils.execute_update(connection, INSERT_TAIO_SQL, tuple(params))
+        print(f"[insert_taio_record_async] 登録完了: TaioCD={new_taio_cd}")
+        
+        return {"result": "ok", "TaioCD": new_taio_cd}
+            
+    except Exception as e:
+        await connection.rollback()
+        print(f"[insert_taio_record_async] 例外発生: {e}")
+        return handle_db_exception(e, context_message="tTaioF登録", 
+                                 input_params={"room_number": room_number, "building_id": building_id, 
+                                             "notes": notes, "category": category, "creator": creator, 
+                                             "updater": updater, "last_time_nittei": last_time_nittei})
+
+
 if __name__ == "__main__":
     # テスト用のサンプル実行
     print("対応履歴記録機能のテスト")
@@ -0,0 +1,277 @@
+"""
+対応履歴（tTaioF）の非同期書き込み
+対応履歴をプロセス内の上限付きキューに溜め、バックグラウンドのスレッドが件数または経過時間を契機に
+複数行の INSERT（executemany）でまとめて登録する
+無効時（既定）・キューが満杯の場合は従来どおり呼び出し元の接続で登録する
+"""
+import os
+import queue
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from taio_record import insert_taio_record, insert_taio_record_async, insert_taio_records
+
+
+WRITER_DEFAULTS = {
+    "enabled": False,
+    # キューに溜められる件数（超えた分は呼び出し元で登録する）
+    "max_queue_size": 1000,
+    # 1回の INSERT にまとめる件数
+    "batch_size": 50,
+    # 最初の1件をキューから取り出してから登録するまでの最大待ち時間（秒）
+    "flush_interval": 1.0,
+    # 終了時にキューの残りを登録し終えるまで待つ最大時間（秒）
+    "drain_timeout": 10.0,
+}
+
+_RECORD_KEYS = ("room_number", "building_id", "notes", "category", "creator", "updater", "last_time_nittei")
+
+
+class TaioWriteBehindQueue:
+    """対応履歴をキューに溜めてバックグラウンドでまとめて登録するクラス"""
+
+    def __init__(self, max_queue_size=1000, batch_size=50, flush_interval=1.0, writer=insert_taio_records):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._writer = writer
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "rejected": 0, "written": 0, "batches": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        """書き込みスレッドを開始する（開始済みの場合は何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="taio-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record):
+        """
+        対応履歴をキューに追加する（待たずに戻る）
+
+        Returns:
+            bool: 追加できた場合 True（停止中・キューが満杯の場合は False）
+        """
+        # 停止の開始と同時に追加された分が書き込みスレッドの終了後に残らないよう、確認と追加はロック内で行う
+        with self._lock:
+            if self._stopping.is_set():
+                return False
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                return False
+            self._stats["enqueued"] += 1
+        return True
+
+    def stop(self, timeout=None):
+        """
+        新規の受け付けを止め、キューの残りを登録し終えてからスレッドを終了する
+
+        Returns:
+            int: 時間内に登録できずキューに残った件数
+        """
+        with self._lock:
+            self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self._queue.qsize()
+
+    def stats(self):
+        """キューの利用状況"""
+        with self._lock:
+            stats = dict(self._stats)
+        running = self._thread is not None and self._thread.is_alive()
+        return {
+            "enabled": True,
+            "running": running,
+            "pending": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            **stats,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self):
+        """件数が batch_size に達するか flush_interval を過ぎるまでキューから取り出す"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # 停止中は待たずにキューに残っている分だけを取り出す
+            timeout = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        if self._write(batch):
+            self._count("written", len(batch))
+            self._count("batches")
+            return
+        # 一括登録に失敗した場合は1件ずつ登録し直し、失敗した行だけを記録に残す
+        self._count("retried", len(batch))
+        for record in batch:
+            if self._write([record]):
+                self._count("written")
+            else:
+                self._count("failed")
+                print(f"[taio_writer] 対応履歴を登録できませんでした: {record}")
+
+    def _write(self, records):
+        try:
+            result = self._writer(records)
+        except Exception as e:
+            print(f"[taio_writer] 登録エラー: {e}")
+            return False
+        return isinstance(result, dict) and "error" not in result
+
+
+_writer = None
+_writer_settings = None
+# close_taio_writer 後は新しいキューを作らず、呼び出し元の接続で登録する（終了処理中の追加分を失わないため）
+_writer_closed = False
+_writer_lock = threading.Lock()
+
+
+def load_writer_settings():
+    """環境変数（.env を含む）から書き込みキューの設定を読み込む"""
+    load_dotenv()
+    settings = dict(WRITER_DEFAULTS)
+    settings["enabled"] = os.getenv("TAIO_WRITE_BEHIND_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+    for key in ("max_queue_size", "batch_size"):
+        settings[key] = int(os.getenv(f"TAIO_WRITE_BEHIND_{key.upper()}", settings[key]))
+    for key in ("flush_interval", "drain_timeout"):
+        settings[key] = float(os.getenv(f"TAIO_WRITE_BEHIND_{key.upper()}", settings[key]))
+    return settings
+
+
+def _build_writer(settings):
+    """設定から書き込みキューを作成して開始する（無効時は None）"""
+    if not settings["enabled"]:
+        return None
+    writer = TaioWriteBehindQueue(
+        max_queue_size=settings["max_queue_size"],
+        batch_size=settings["batch_size"],
+        flush_interval=settings["flush_interval"],
+    )
+    writer.start()
+    return writer
+
+
+def configure_taio_writer(**settings):
+    """
+    書き込みキューを設定し直す（指定しない項目は環境変数・デフォルト値）
+    既存のキューは残りを登録し終えてから終了する（close_taio_writer の後に呼び出した場合は再開する）
+    """
+    global _writer, _writer_settings, _writer_closed
+    merged = load_writer_settings()
+    merged.update(settings)
+    with _writer_lock:
+        old, _writer = _writer, _build_writer(merged)
+        _writer_settings = merged
+        _writer_closed = False
+    if old is not None:
+        old.stop(merged["drain_timeout"])
+    return _writer
+
+
+def get_taio_writer():
+    """有効な書き込みキューを取得（無効時・close_taio_writer の後は None）"""
+    global _writer, _writer_settings
+    if _writer_settings is None:
+        # 終了処理と同時に呼び出された場合に新しいキューを作らないよう、確認と作成はロック内で行う
+        with _writer_lock:
+            if _writer_settings is None and not _writer_closed:
+                settings = load_writer_settings()
+                _writer = _build_writer(settings)
+                _writer_settings = settings
+            return _writer
+    return _writer
+
+
+def get_taio_writer_stats():
+    """書き込みキューの利用状況（監視用）"""
+    writer = get_taio_writer()
+    if writer is None:
+        return {"enabled": False}
+    return writer.stats()
+
+
+def close_taio_writer(timeout=None):
+    """
+    書き込みキューの残りを登録して終了する（アプリ終了時に呼び出す）
+    以降の log_taio_record は呼び出し元の接続で登録する
+
+    Returns:
+        int: 時間内に登録できずに残った件数
+    """
+    global _writer, _writer_settings, _writer_closed
+    with _writer_lock:
+        writer, _writer = _writer, None
+        settings, _writer_settings = _writer_settings, None
+        _writer_closed = True
+    if writer is None:
+        return 0
+    remaining = writer.stop(timeout if timeout is not None else settings["drain_timeout"])
+    if remaining:
+        print(f"[taio_writer] 終了時に登録できなかった対応履歴: {remaining}件")
+    return remaining
+
+
+def _make_record(**values):
+    return {key: values.get(key) for key in _RECORD_KEYS}
+
+
+def log_taio_record(room_number: str, building_id: str, notes: str, category: str,
+                    creator: str, updater: str, last_time_nittei=None, connection=None) -> dict:
+    """
+    対応履歴を記録する（書き込みキューが有効な場合はキューに追加して待たずに戻る）
+    引数は insert_taio_record と同じ
+
+    Returns:
+        dict: キューに追加した場合は {"result": "ok", "queued": True}、それ以外は insert_taio_record の結果
+    """
+    writer = get_taio_writer()
+    if writer is not None and writer.submit(_make_record(
+            room_number=room_number, building_id=building_id, notes=notes, category=category,
+            creator=creator, updater=updater, last_time_nittei=last_time_nittei)):
+        return {"result": "ok", "queued": True}
+    return insert_taio_record(room_number, building_id, notes, category, creator, updater,
+                              last_time_nittei=last_time_nittei, connection=connection)
+
+
+async def log_taio_record_async(room_number: str, building_id: str, notes: str, category: str,
+                                creator: str, updater: str, last_time_nittei=None, connection=None) -> dict:
+    """対応履歴を記録する（asyncio 版。キューが無効・満杯の場合は insert_taio_record_async で登録する）"""
+    writer = get_taio_writer()
+    if writer is not None and writer.submit(_make_record(
+            room_number=room_number, building_id=building_id, notes=notes, category=category,
+            creator=creator, updater=updater, last_time_nittei=last_time_nittei)):
+        return {"result": "ok", "queued": True}
+    return await insert_taio_record_async(room_number, building_id, notes, category, creator, updater,
+                                          last_time_nittei=last_time_nittei, connection=connection)
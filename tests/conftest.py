@@ -0,0 +1,21 @@
+"""
+テスト共通の準備
+ベンチマーク用の SQLite 接続（benchmarks/sqlite_db.py）を MySQL の代わりに使う
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sqlite_db import SQLiteConnection  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    """スキーマのみを作成した SQLite 接続"""
+    connection = SQLiteConnection()
+    connection.init_schema()
+    yield connection
+    connection.dispose()
@@ -0,0 +1,29 @@
+"""
+建物名の索引（utils/building_index.py の BuildingNameIndex）
+"""
+from utils.building_index import BuildingNameIndex, _MISSING
+
+
+def test_negative_entries_are_capped(conn):
+    """存在しない ClientCD の記録は上限を超えると古いものから捨てる"""
+    index = BuildingNameIndex(negative_max_entries=3)
+    index.load(conn)
+    for client_cd in range(9000, 9010):
+        assert index.fetch(client_cd, conn) is None
+    stats = index.stats()
+    assert stats["negative_entries"] == 3
+    assert stats["negative_max_entries"] == 3
+    assert stats["negative_evictions"] == 7
+    assert index.lookup(9009) is None
+    assert index.lookup(9000) is _MISSING
+
+
+def test_expired_negative_entries_are_purged(conn):
+    """期限切れの記録は次の記録時に捨てる（上限による破棄には数えない）"""
+    index = BuildingNameIndex(negative_ttl_seconds=0)
+    index.load(conn)
+    for client_cd in range(9000, 9010):
+        index.fetch(client_cd, conn)
+    stats = index.stats()
+    assert stats["negative_entries"] == 0
+    assert stats["negative_evictions"] == 0
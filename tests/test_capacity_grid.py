@@ -0,0 +1,55 @@
+"""
+空き枠の一括判定（capacity_grid.DayCapacityGrid）と 1枠ずつの判定（SlotAvailabilityChecker）の一致
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from availability_checker import SlotAvailabilityChecker
+from benchmarks.seed import seed_database
+from benchmarks.sqlite_db import SQLiteConnection
+from utils.building_profile import invalidate_building_profile
+from utils.occupancy import invalidate_occupancy
+
+pytest.importorskip("numpy")
+
+from capacity_grid import DayCapacityGrid  # noqa: E402
+
+
+DAYS = 7
+
+
+@pytest.fixture
+def seeded():
+    connection = SQLiteConnection()
+    invalidate_building_profile()
+    invalidate_occupancy()
+    dataset = seed_database(connection, buildings=4, users_per_building=60, days=DAYS, fill_ratio=0.9)
+    yield connection, dataset
+    invalidate_building_profile()
+    invalidate_occupancy()
+    connection.dispose()
+
+
+@pytest.mark.parametrize("exclude_usercd", [None, "101"])
+def test_grid_matches_check_slot_availability(seeded, exclude_usercd):
+    """全物件・全日・全枠・全メニューで、一括判定の結果が check_slot_availability と一致する"""
+    connection, dataset = seeded
+    start_date = date.fromisoformat(dataset["start_date"])
+    outcomes = set()
+    for building in dataset["buildings"]:
+        client_cd = building["client_cd"]
+        menus = connection.db.execute(
+            "SELECT MenuCD, MinuteType FROM tMenuM WHERE ClientCD = ?", (client_cd,)).fetchall()
+        with SlotAvailabilityChecker(client_cd, connection) as checker:
+            for offset in range(DAYS):
+                day = start_date + timedelta(days=offset)
+                grid = DayCapacityGrid.from_checker(checker, day, exclude_usercd)
+                for idx, start_time in enumerate(grid.pattern.start_times):
+                    for menu_cd, minute_type in menus:
+                        expected = checker.check_slot_availability(
+                            f"{day.strftime('%Y-%m-%d')} {start_time}", exclude_usercd, menu_cd=menu_cd)
+                        assert grid.cell(idx, int(minute_type or 1)) == expected, (client_cd, day, start_time, menu_cd)
+                        outcomes.add(expected["available"])
+    # 空きあり・空きなしの両方を比較している
+    assert outcomes == {True, False}
@@ -0,0 +1,62 @@
+"""
+予約占有状況のキャッシュ（utils/occupancy.py の OccupancyCache）
+"""
+from datetime import date
+
+import utils.occupancy as occupancy
+from utils.occupancy import OccupancyCache
+
+
+BUILDING = "3700"
+DAY_FROM = date(2031, 5, 12)
+DAY_TO = date(2031, 5, 13)
+
+INSERT_RESERVATION_SQL = """
+    INSERT INTO tReservationF (UserCD, ClientCD, TimeFrom, TimeTo, StylistCD, Status, MukouFlg, Created, Updated)
+    VALUES (?, ?, ?, ?, ?, 1, 0, ?, ?)
+"""
+
+
+def _reserve(conn, user_cd, time_from, updated="2031-01-01 00:00:00"):
+    conn.db.execute(INSERT_RESERVATION_SQL, (user_cd, BUILDING, time_from, time_from, "1", updated, updated))
+
+
+def test_move_during_load_is_not_cached_stale(conn, monkeypatch):
+    """読み込み中に予約が移動した日は、読み込み前の内容のままキャッシュしない"""
+    _reserve(conn, "101", "2031-05-12 10:00:00")
+    cache = OccupancyCache(reconcile_interval=3600)
+    # 照合基準を作っておく（移動が自身の更新として扱われる状態）
+    assert cache.get_days(conn, BUILDING, DAY_FROM)[DAY_FROM].total(600) == 1
+
+    original_load = occupancy.load_occupancy
+
+    def load_then_move(connection, building_id, date_from, days=1, exclude_usercd=None):
+        snapshot = original_load(connection, building_id, date_from, days, exclude_usercd)
+        # 読み込みの直後（キャッシュへの登録前）に別のリクエストが DAY_TO へ予約を移動して確定する
+        updated = "2031-01-02 00:00:00"
+        conn.db.execute("UPDATE tReservationF SET TimeFrom = '2031-05-13 11:00:00', Updated = ? WHERE UserCD = '101'",
+                        (updated,))
+        cache.record_reservation_move(BUILDING, "2031-05-12 10:00:00", "2031-05-13 11:00:00", "1", updated)
+        return snapshot
+
+    monkeypatch.setattr(occupancy, "load_occupancy", load_then_move)
+    assert cache.get_days(conn, BUILDING, DAY_TO)[DAY_TO].total(660) == 0
+    monkeypatch.setattr(occupancy, "load_occupancy", original_load)
+
+    # 移動後の内容を読み直す（読み込み前の内容がキャッシュに残っていない）
+    assert cache.get_days(conn, BUILDING, DAY_TO)[DAY_TO].total(660) == 1
+    assert cache.get_days(conn, BUILDING, DAY_FROM)[DAY_FROM].total(600) == 0
+
+
+def test_move_adjusts_cached_days_without_reload(conn):
+    """キャッシュ済みの日は予約の移動を差分で反映する"""
+    _reserve(conn, "101", "2031-05-12 10:00:00")
+    cache = OccupancyCache(reconcile_interval=3600)
+    cache.get_days(conn, BUILDING, DAY_FROM, days=2)
+    cache.record_reservation_move(BUILDING, "2031-05-12 10:00:00", "2031-05-13 11:00:00", "1", "2031-01-02 00:00:00")
+
+    conn.reset_stats()
+    days = cache.get_days(conn, BUILDING, DAY_FROM, days=2)
+    assert conn.stats["queries"] == 0
+    assert days[DAY_FROM].total(600) == 0
+    assert days[DAY_TO].total(660) == 1
@@ -0,0 +1,30 @@
+"""キーセット方式のページング（utils/pagination.py）"""
+import pytest
+
+from reservation_fetcher import ReservationFetcher
+from utils.pagination import (
+    MAX_CURSOR_SEEN, InvalidCursorError, decode_keyset_cursor, encode_cursor,
+)
+
+
+KIND = "reservation_history"
+KEY = ["2026-01-05 10:00:00", "2025-12-01 09:00:00"]
+
+
+def test_decode_accepts_seen_within_bound():
+    assert decode_keyset_cursor(KIND, encode_cursor(KIND, KEY + [MAX_CURSOR_SEEN]), 2) == (KEY, MAX_CURSOR_SEEN)
+
+
+@pytest.mark.parametrize("seen", [0, -1, MAX_CURSOR_SEEN + 1, 10 ** 12, True, "3", 1.5])
+def test_decode_rejects_forged_seen(seen):
+    with pytest.raises(InvalidCursorError):
+        decode_keyset_cursor(KIND, encode_cursor(KIND, KEY + [seen]), 2)
+
+
+def test_history_rejects_unbounded_limit(conn):
+    # 改ざんされたカーソルで LIMIT が膨らむクエリを実行しない
+    cursor = encode_cursor(KIND, KEY + [10 ** 12])
+    conn.reset_stats()
+    result = ReservationFetcher.get_reservation_history("101", "3700", limit=10, cursor=cursor, connection=conn)
+    assert result == {"error": "cursor が不正です。"}
+    assert conn.stats["queries"] == 0
@@ -0,0 +1,41 @@
+"""
+認証トークン（utils/session_token.py）と login_user
+"""
+import pytest
+
+import utils.session_token as session_token
+from user import authenticate_user, login_user
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(session_token, "_secret", b"test-secret")
+
+
+@pytest.fixture
+def user_conn(conn):
+    conn.db.execute("INSERT INTO tUserM (UserCD, ClientCD, Passwd) VALUES ('101', '3700', 'pw101')")
+    return conn
+
+
+@pytest.mark.parametrize("value", ["st1.あ.b", "st1.YQ.あ", "st1.ＡＢ.ｃ"])
+def test_non_ascii_token_is_rejected(value):
+    assert session_token.decode_session_token(value) is None
+
+
+@pytest.mark.parametrize("value", ["st1.あ.b", "st1.YQ.あ"])
+def test_non_ascii_token_fails_login_and_auth(user_conn, value):
+    assert login_user("101", value, "3700", connection=user_conn) == {"error": "認証に失敗しました。"}
+    assert authenticate_user("101", value, "3700", connection=user_conn) == {"error": "認証に失敗しました。"}
+
+
+def test_issued_token_verifies():
+    token, _expires_at = session_token.issue_session_token("101", "3700")
+    assert session_token.verify_session_token(token, "101", "3700") == {"room_number": "101"}
+    assert "error" in session_token.verify_session_token(token, "102", "3700")
+
+
+def test_login_rejects_token_as_password(user_conn):
+    result = login_user("101", "pw101", "3700", connection=user_conn)
+    assert result["result"] == "ok"
+    assert login_user("101", result["token"], "3700", connection=user_conn) == {"error": "認証に失敗しました。"}
@@ -0,0 +1,67 @@
+"""
+予約枠単位のプロセス内ロック（utils/slot_locks.py の StripedSlotLocks）
+"""
+import asyncio
+import threading
+
+import pytest
+
+from utils.slot_locks import SlotLockTimeout, StripedSlotLocks
+
+
+KEY = ("3700", "2031-05-12", 0)
+
+
+def test_coroutines_acquire_in_waiting_order():
+    """同じイベントループのコルーチン同士は待ち始めた順に取得する"""
+    locks = StripedSlotLocks(stripes=1, wait_seconds=5)
+    order = []
+
+    async def worker(n):
+        async with locks.hold_async(KEY):
+            order.append(n)
+            await asyncio.sleep(0.001)
+
+    async def main():
+        async with locks.hold_async(KEY):
+            tasks = []
+            for n in range(5):
+                tasks.append(asyncio.create_task(worker(n)))
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert locks.stats()["contended"] == 5
+
+
+def test_async_waits_for_thread_holder():
+    """スレッドが保持している間は待ち、解放後に取得する（待ち時間を超えた場合は SlotLockTimeout）"""
+    locks = StripedSlotLocks(stripes=1, wait_seconds=5)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with locks.hold(KEY):
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait()
+
+    async def main():
+        with pytest.raises(SlotLockTimeout):
+            async with locks.hold_async(KEY, timeout=0.05):
+                pass
+        threading.Timer(0.05, release.set).start()
+        async with locks.hold_async(KEY):
+            return True
+
+    try:
+        assert asyncio.run(main())
+    finally:
+        release.set()
+        thread.join()
+    stats = locks.stats()
+    assert stats["timeouts"] == 1 and stats["acquired"] == 2
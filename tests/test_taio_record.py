@@ -0,0 +1,24 @@
+"""
+対応履歴の一括登録（taio_record.insert_taio_records）
+"""
+from taio_record import insert_taio_records
+from utils.id_allocator import TAIO_CD_SEQUENCE, get_taio_cd_allocator
+
+
+def _record(notes):
+    return {"room_number": "101", "building_id": "3700", "notes": notes, "category": "|1|",
+            "creator": "0", "updater": "0", "last_time_nittei": None}
+
+
+def test_batch_insert_stamps_db_time(conn):
+    """登録日時は呼び出し側の値ではなく DB の NOW()（1件ずつの登録と同じ）"""
+    get_taio_cd_allocator().discard()
+    conn.db.execute("INSERT INTO tSequenceM (SeqName, NextValue) VALUES (?, 1)", (TAIO_CD_SEQUENCE,))
+    result = insert_taio_records([_record("a"), _record("b"), _record("c")], connection=conn)
+    assert result["result"] == "ok" and len(result["TaioCD"]) == 3
+    rows = conn.db.execute(
+        "SELECT TaioNotes, Created, Updated, datetime('now','localtime') FROM tTaioF ORDER BY TaioCD").fetchall()
+    assert [row[0] for row in rows] == ["a", "b", "c"]
+    for _, created, updated, now in rows:
+        assert created is not None and created == updated and created <= now
+    get_taio_cd_allocator().discard()
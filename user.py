@@ -1,8 +1,25 @@
+import time
+from datetime import datetime
+
 from connection import get_connection
 from utils import handle_db_exception
 from utils.db_utils import DBUtils
+from utils.session_token import (
+    SessionTokenUnavailableError, decode_session_token, verify_session_token, issue_session_token,
+)
 
 def authenticate_user(room_number: str, password: str, building_id: str, connection=None) -> dict:
+    """
+    tUserM で認証する
+    password に login_user で発行したトークンを渡した場合は、DBを参照せずに署名と有効期限で検証する
+    """
+    if decode_session_token(password) is not None:
+        return verify_session_token(password, room_number, building_id)
+    return _authenticate_password(room_number, password, building_id, connection)
+
+
+def _authenticate_password(room_number: str, password: str, building_id: str, connection=None) -> dict:
+    """tUserM のパスワードで認証する（トークンは受け付けない）"""
     close_conn = False
     if connection is None:
         connection = get_connection()
@@ -25,6 +42,59 @@ def authenticate_user(room_number: str, password: str, building_id: str, connect
             connection.close()
 
 
+def execute_authenticated_query(connection, room_number: str, password: str, building_id: str,
+                                auth_sql: str, auth_params: tuple, sql: str, params: tuple, row_key: str = None):
+    """
+    認証とデータ取得を1回のクエリで行う
+    
+    Args:
+        auth_sql: tUserM を起点にデータを LEFT JOIN した SQL（認証できた場合は必ず1行以上返る。
+                  WHERE に UserCD / Passwd / ClientCD の条件を含む）
+        auth_params: auth_sql のパラメータ（password を含む）
+        sql: トークン認証時に使うデータ取得のみの SQL（トークンはDBを参照せずに検証する）
+        params: sql のパラメータ
+        row_key: auth_sql の結果のうち、この列が NULL の行（LEFT JOIN で対応するデータが無い行）を除く
+        
+    Returns:
+        list: 取得した行（認証に失敗した場合は None）
+    """
+    if decode_session_token(password) is not None:
+        if "error" in verify_session_token(password, room_number, building_id):
+            return None
+        return DBUtils.execute_query(connection, sql, params)
+    
+    rows = DBUtils.execute_query(connection, auth_sql, auth_params)
+    if not rows:
+        return None
+    if row_key is not None:
+        rows = [row for row in rows if row.get(row_key) is not None]
+    return rows
+
+
+def login_user(room_number: str, password: str, building_id: str, connection=None) -> dict:
+    """
+    tUserM で1回認証し、(UserCD, ClientCD) に紐づく有効期限付きのトークンを発行する
+    以降の認証ありAPIは password の代わりにこのトークンを受け付ける
+    （トークンでのログインは受け付けない。トークンを発行し直して有効期限を延ばし続けられないようにするため）
+    """
+    if decode_session_token(password) is not None:
+        return {"error": "認証に失敗しました。"}
+    auth_result = _authenticate_password(room_number, password, building_id, connection)
+    if "error" in auth_result:
+        return auth_result
+    try:
+        token, expires_at = issue_session_token(room_number, building_id)
+    except SessionTokenUnavailableError as e:
+        print(f"[login_user] {e}")
+        return {"error": "トークンを発行できません。運営までご連絡ください。"}
+    return {
+        "result": "ok",
+        "token": token,
+        "expires_at": datetime.fromtimestamp(expires_at).strftime("%Y-%m-%d %H:%M:%S"),
+        "expires_in": max(0, expires_at - int(time.time())),
+    }
+
+
 def update_user_tel(room_number: str, building_id: str, tel: str, connection=None):
     """
     tUserMのTELカラムを更新する
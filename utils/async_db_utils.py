@@ -0,0 +1,137 @@
+"""
+データベース操作関連のユーティリティ関数（asyncio 版）
+aiomysql の接続プールを使い、DBUtils と同じ呼び出し方で非同期にクエリを実行する
+"""
+import asyncio
+import time
+from functools import wraps
+
+try:
+    import aiomysql
+except ImportError:  # aiomysql はオプション（非同期APIを使う場合のみ必要）
+    aiomysql = None
+
+from connection import get_connection_settings, load_pool_settings
+from utils.query_stats import record_query
+
+
+_async_pool = None
+_async_pool_lock = None
+
+
+def _require_aiomysql():
+    if aiomysql is None:
+        raise RuntimeError("非同期DBアクセスには aiomysql が必要です（pip install aiomysql）")
+
+
+async def get_async_pool():
+    """
+    aiomysql の接続プールを取得（初回呼び出し時に作成）
+    サイズは同期プールと同じ環境変数 DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE を使用する
+    """
+    global _async_pool, _async_pool_lock
+    _require_aiomysql()
+    if _async_pool is not None:
+        return _async_pool
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+    async with _async_pool_lock:
+        if _async_pool is None:
+            settings = load_pool_settings()
+            _async_pool = await aiomysql.create_pool(
+                minsize=settings["min_size"],
+                maxsize=settings["max_size"],
+                pool_recycle=int(settings["idle_timeout"]) if settings["idle_timeout"] else -1,
+                autocommit=False,
+                cursorclass=aiomysql.DictCursor,
+                **get_connection_settings(),
+            )
+    return _async_pool
+
+
+async def close_async_pool():
+    """aiomysql の接続プールを終了する（アプリ終了時に呼び出す）"""
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+def get_async_pool_stats():
+    """aiomysql の接続プールの利用状況"""
+    if _async_pool is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "size": _async_pool.size,
+        "idle": _async_pool.freesize,
+        "in_use": _async_pool.size - _async_pool.freesize,
+        "min_size": _async_pool.minsize,
+        "max_size": _async_pool.maxsize,
+    }
+
+
+def async_db_connection(func):
+    """データベース接続を自動管理するデコレータ（asyncio 版。接続はプールから借りて返却する）"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        connection = kwargs.get('connection')
+        if connection is not None:
+            return await func(*args, **kwargs)
+        
+        pool = await get_async_pool()
+        connection = await pool.acquire()
+        kwargs['connection'] = connection
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            try:
+                await connection.rollback()
+            except Exception:
+                pass
+            pool.release(connection)
+    
+    return wrapper
+
+
+class AsyncDBUtils:
+    """データベース操作関連のユーティリティクラス（asyncio 版。実行したクエリはリクエスト単位で計測される）"""
+    
+    @staticmethod
+    async def execute_query(connection, sql, params=None):
+        """クエリを実行して結果を取得"""
+        started = time.perf_counter()
+        rows = ()
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql, params or ())
+                rows = await cursor.fetchall()
+                return rows
+        finally:
+            record_query(sql, started, len(rows))
+    
+    @staticmethod
+    async def execute_single_query(connection, sql, params=None):
+        """単一結果のクエリを実行"""
+        started = time.perf_counter()
+        row = None
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql, params or ())
+                row = await cursor.fetchone()
+                return row
+        finally:
+            record_query(sql, started, 0 if row is None else 1)
+    
+    @staticmethod
+    async def execute_update(connection, sql, params=None):
+        """更新クエリを実行"""
+        started = time.perf_counter()
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql, params or ())
+                await connection.commit()
+                return cursor.rowcount
+        finally:
+            record_query(sql, started)
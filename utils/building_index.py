@@ -0,0 +1,252 @@
+"""
+建物名（tClientM の ClientCD → MansionName）のプロセス内索引
+起動時に全件をまとめて読み込み、以降は更新日時（Updated）の最大値を基準に変更分だけを取り込む
+索引に無い ClientCD は1件ずつDBで確認し、存在しない場合は一定時間「存在しない」ことを保持する
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from utils.db_utils import db_connection, DBUtils
+
+
+# 変更分を取り込む間隔（秒）
+DEFAULT_REFRESH_SECONDS = 60
+# 存在しない ClientCD を保持する時間（秒）
+DEFAULT_NEGATIVE_TTL_SECONDS = 60
+# 存在しない ClientCD を保持する件数の上限（任意の ClientCD を指定したリクエストで索引が肥大化しないよう、古いものから捨てる）
+DEFAULT_NEGATIVE_MAX_ENTRIES = 10000
+# 全件を読み込み直す間隔（秒。削除された物件は変更分の取り込みでは検出できないため）
+DEFAULT_FULL_RELOAD_SECONDS = 3600
+# 読み込み・取り込みに失敗した場合に再試行するまでの秒数（失敗が続く間は refresh_seconds まで倍にしていく）
+DEFAULT_RETRY_SECONDS = 5
+
+ALL_BUILDINGS_SQL = "SELECT ClientCD, MansionName, Updated FROM tClientM"
+# 同じ秒内の更新を取りこぼさないよう、基準の日時と同じ行も読み直す
+CHANGED_BUILDINGS_SQL = "SELECT ClientCD, MansionName, Updated FROM tClientM WHERE Updated >= %s"
+BUILDING_SQL = "SELECT ClientCD, MansionName, Updated FROM tClientM WHERE ClientCD = %s LIMIT 1"
+
+_MISSING = object()
+
+
+class BuildingNameIndex:
+    """ClientCD → MansionName の索引（存在しない ClientCD の記録を含む）"""
+
+    def __init__(self, refresh_seconds=DEFAULT_REFRESH_SECONDS, negative_ttl_seconds=DEFAULT_NEGATIVE_TTL_SECONDS,
+                 full_reload_seconds=DEFAULT_FULL_RELOAD_SECONDS, retry_seconds=DEFAULT_RETRY_SECONDS,
+                 negative_max_entries=DEFAULT_NEGATIVE_MAX_ENTRIES):
+        self.refresh_seconds = refresh_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.retry_seconds = retry_seconds
+        self.negative_max_entries = negative_max_entries
+        self._names = {}
+        self._negative = OrderedDict()  # ClientCD → 期限（time.monotonic。記録した順 = 期限の順）
+        self._watermark = None  # 取り込み済みの Updated の最大値
+        self._loaded_at = None
+        self._refreshed_at = None
+        self._failures = 0  # 連続して失敗した回数
+        self._retry_at = None  # 失敗後、次に読み込み・取り込みを試みる時刻（time.monotonic）
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "refreshes": 0, "full_loads": 0,
+                       "refresh_errors": 0, "negative_evictions": 0}
+
+    def lookup(self, client_cd):
+        """
+        索引のみを参照する（DBは参照しない）
+
+        Returns:
+            建物名（未設定は None）。索引に無く、存在しない記録も無い（期限切れ）場合は _MISSING
+        """
+        key = str(client_cd)
+        with self._lock:
+            if key in self._names:
+                self._stats["hits"] += 1
+                return self._names[key]
+            expires = self._negative.get(key)
+            if expires is not None:
+                if time.monotonic() < expires:
+                    self._stats["negative_hits"] += 1
+                    return None
+                del self._negative[key]
+            self._stats["misses"] += 1
+        return _MISSING
+
+    def needs_refresh(self):
+        """全件の読み込み・変更分の取り込みが必要か（失敗後の再試行待ちの間は不要とする）"""
+        now = time.monotonic()
+        if self._retry_at is not None and now < self._retry_at:
+            return False
+        return (self._loaded_at is None
+                or now - self._refreshed_at >= self.refresh_seconds
+                or now - self._loaded_at >= self.full_reload_seconds)
+
+    def refresh(self, connection):
+        """
+        未読み込み・全件の読み込み直しの時期であれば全件を、それ以外は変更分を取り込む
+        （他のスレッドが取り込み中の場合は待たずに戻り、現在の索引を使う。
+        失敗した場合も例外は返さず、現在の索引を使い続けて retry_seconds 後に再試行する）
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.needs_refresh():
+                return
+            try:
+                self._refresh(connection)
+            except Exception as e:
+                self.refresh_failed(e)
+                return
+            with self._lock:
+                self._failures = 0
+                self._retry_at = None
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, connection):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.full_reload_seconds:
+            self.load(connection)
+            return
+        rows = DBUtils.execute_query(connection, CHANGED_BUILDINGS_SQL, (self._watermark,)) if self._watermark else ()
+        with self._lock:
+            self._apply(rows)
+            self._refreshed_at = now
+            self._stats["refreshes"] += 1
+
+    def refresh_failed(self, error):
+        """読み込み・取り込みの失敗を記録し、再試行までの待ち時間を延ばす"""
+        with self._lock:
+            self._failures += 1
+            delay = min(self.refresh_seconds, self.retry_seconds * 2 ** (self._failures - 1))
+            self._retry_at = time.monotonic() + delay
+            self._stats["refresh_errors"] += 1
+        print(f"[building_index] 建物名の索引の更新エラー（{delay}秒後に再試行）: {error}")
+
+    def load(self, connection):
+        """全件を読み込み直す"""
+        rows = DBUtils.execute_query(connection, ALL_BUILDINGS_SQL)
+        now = time.monotonic()
+        with self._lock:
+            self._names = {}
+            self._negative = OrderedDict()
+            self._watermark = None
+            self._apply(rows)
+            self._loaded_at = self._refreshed_at = now
+            self._stats["full_loads"] += 1
+
+    def fetch(self, client_cd, connection):
+        """索引に無い ClientCD を1件だけDBで確認し、結果（存在しない場合を含む）を索引に記録する"""
+        row = DBUtils.execute_single_query(connection, BUILDING_SQL, (client_cd,))
+        with self._lock:
+            if row:
+                self._apply((row,))
+                return self._names[str(row["ClientCD"])]
+            self._remember_missing(str(client_cd))
+            return None
+
+    def _remember_missing(self, key):
+        """
+        存在しない ClientCD を記録する（呼び出し元で self._lock を保持する）
+        期限切れの記録を捨て、それでも上限を超える場合は古いものから捨てる
+        """
+        now = time.monotonic()
+        self._negative.pop(key, None)
+        self._negative[key] = now + self.negative_ttl_seconds
+        while self._negative:
+            oldest_key, expires = next(iter(self._negative.items()))
+            if expires > now and len(self._negative) <= self.negative_max_entries:
+                break
+            del self._negative[oldest_key]
+            if expires > now:
+                self._stats["negative_evictions"] += 1
+
+    def _apply(self, rows):
+        """読み込んだ行を索引に反映する（呼び出し元で self._lock を保持する）"""
+        for row in rows:
+            key = str(row["ClientCD"])
+            self._names[key] = row.get("MansionName") or None
+            self._negative.pop(key, None)
+            updated = row.get("Updated")
+            if updated is not None and (self._watermark is None or updated > self._watermark):
+                self._watermark = updated
+
+    def invalidate(self):
+        """索引を破棄する（次回の参照時に全件を読み込み直す）"""
+        with self._lock:
+            self._names = {}
+            self._negative = OrderedDict()
+            self._watermark = None
+            self._loaded_at = self._refreshed_at = None
+            self._failures = 0
+            self._retry_at = None
+
+    def stats(self):
+        """索引の利用状況"""
+        with self._lock:
+            return {
+                "loaded": self._loaded_at is not None,
+                "entries": len(self._names),
+                "negative_entries": len(self._negative),
+                "watermark": str(self._watermark) if self._watermark is not None else None,
+                "refresh_seconds": self.refresh_seconds,
+                "negative_ttl_seconds": self.negative_ttl_seconds,
+                "negative_max_entries": self.negative_max_entries,
+                **self._stats,
+            }
+
+
+_building_index = BuildingNameIndex()
+
+
+@db_connection
+def _lookup_from_db(client_cd, connection=None):
+    _building_index.refresh(connection)
+    name = _building_index.lookup(client_cd)
+    if name is _MISSING:
+        name = _building_index.fetch(client_cd, connection)
+    return name
+
+
+def lookup_building_name(client_cd, connection=None):
+    """
+    建物名を取得する（索引にあればDBに接続しない）
+
+    Returns:
+        Optional[str]: 建物名（ClientCD が存在しない・建物名が未設定の場合は None）
+    """
+    needs_refresh = _building_index.needs_refresh()
+    if not needs_refresh:
+        name = _building_index.lookup(client_cd)
+        if name is not _MISSING:
+            return name
+    try:
+        return _lookup_from_db(client_cd, connection=connection)
+    except Exception as e:
+        # DBに接続できない場合も、索引にある建物名はそのまま返す（取り込みを試みられなかった場合は失敗として記録する）
+        if not needs_refresh:
+            raise
+        if _building_index.needs_refresh():
+            _building_index.refresh_failed(e)
+        name = _building_index.lookup(client_cd)
+        if name is _MISSING:
+            raise
+        return name
+
+
+@db_connection
+def load_building_index(connection=None):
+    """全件を読み込む（アプリ起動時に呼び出す）"""
+    _building_index.load(connection)
+    return _building_index.stats()
+
+
+def invalidate_building_index():
+    """索引を破棄する（tClientM を直接変更した場合などに呼び出す）"""
+    _building_index.invalidate()
+
+
+def get_building_index_stats():
+    """索引の利用状況を取得"""
+    return _building_index.stats()
@@ -0,0 +1,185 @@
+"""
+物件ごとの参照データ（tSettingM / tStylistM / tMenuM）のキャッシュ
+1回の処理の中で何度も参照される設定値を、物件単位でまとめて取得してプロセス内に保持する
+"""
+import threading
+import time
+from collections import OrderedDict
+from utils.db_utils import DBUtils
+from utils.async_db_utils import AsyncDBUtils
+
+
+# キャッシュの有効期間（秒）と保持する物件数の上限
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 512
+
+SETTING_SQL = "SELECT MinuteUnit, WakuPattern, WakuRange FROM tSettingM WHERE ClientCD = %s"
+STYLISTS_SQL = """
+    SELECT StylistCD, StylistName, NumberOfLines
+    FROM tStylistM
+    WHERE ClientCD = %s AND MukouFlg = 0
+    AND (WakugoeFlg IS NULL OR WakugoeFlg = 0)
+    ORDER BY StylistCD
+"""
+MENUS_SQL = "SELECT MenuCD, MinuteType FROM tMenuM WHERE ClientCD = %s AND MukouFlg = 0"
+
+
+class BuildingProfile:
+    """物件（ClientCD）単位の参照データ"""
+
+    def __init__(self, client_cd, setting, stylists, menus):
+        self.client_cd = client_cd
+        self.setting = setting  # tSettingM の1行（MinuteUnit, WakuPattern, WakuRange）または None
+        self.stylists = stylists  # 通常スタイリスト（WakugoeFlg != 1）を StylistCD 順に保持
+        self.menu_minute_types = {}
+        for menu in menus:
+            self.menu_minute_types.setdefault(str(menu["MenuCD"]), menu.get("MinuteType"))
+        self.loaded_at = time.monotonic()
+
+    @property
+    def minute_unit(self):
+        """分単位（未設定・不正値は60）"""
+        try:
+            if self.setting and self.setting.get('MinuteUnit') not in (None, '', 0, '0'):
+                return int(self.setting['MinuteUnit'])
+            return 60  # デフォルト値
+        except Exception:
+            return 60  # デフォルト値
+
+    @property
+    def waku_pattern_id(self):
+        """枠パターンID（未設定は None）"""
+        if self.setting and 'WakuPattern' in self.setting:
+            return self.setting['WakuPattern']
+        return None
+
+    @property
+    def waku_range(self):
+        """WakuRange を '-' で分割した枠ごとの上限リスト（未設定は空リスト）"""
+        if not self.setting or not self.setting.get('WakuRange'):
+            return []
+        return [int(x) if x.isdigit() else 0 for x in self.setting['WakuRange'].split('-')]
+
+    def minute_type(self, menu_cd):
+        """メニューの分タイプ（連続枠数。未登録・未設定は1）"""
+        minute_type = self.menu_minute_types.get(str(menu_cd))
+        try:
+            return int(minute_type) if minute_type else 1
+        except Exception:
+            return 1
+
+
+def load_building_profile(connection, building_id):
+    """物件の参照データを1回のクエリバッチで取得する"""
+    setting = DBUtils.execute_single_query(connection, SETTING_SQL, (building_id,))
+    stylists = DBUtils.execute_query(connection, STYLISTS_SQL, (building_id,))
+    menus = DBUtils.execute_query(connection, MENUS_SQL, (building_id,))
+    return BuildingProfile(building_id, setting, list(stylists), list(menus))
+
+
+async def load_building_profile_async(connection, building_id):
+    """物件の参照データを1回のクエリバッチで取得する（asyncio 版）"""
+    setting = await AsyncDBUtils.execute_single_query(connection, SETTING_SQL, (building_id,))
+    stylists = await AsyncDBUtils.execute_query(connection, STYLISTS_SQL, (building_id,))
+    menus = await AsyncDBUtils.execute_query(connection, MENUS_SQL, (building_id,))
+    return BuildingProfile(building_id, setting, list(stylists), list(menus))
+
+
+class BuildingProfileCache:
+    """BuildingProfile を TTL + LRU で保持するキャッシュ"""
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, building_id, connection):
+        """キャッシュから取得し、無い（期限切れの）場合はDBから読み込む"""
+        profile = self.peek(building_id)
+        if profile is not None:
+            return profile
+
+        # DB読み込み中はロックを保持しない（取得失敗時はキャッシュしない）
+        profile = load_building_profile(connection, building_id)
+        self.put(building_id, profile)
+        return profile
+
+    async def get_async(self, building_id, connection):
+        """キャッシュから取得し、無い（期限切れの）場合はDBから読み込む（asyncio 版）"""
+        profile = self.peek(building_id)
+        if profile is not None:
+            return profile
+
+        profile = await load_building_profile_async(connection, building_id)
+        self.put(building_id, profile)
+        return profile
+
+    def peek(self, building_id):
+        """有効期限内のキャッシュのみを返す（無い場合は None）"""
+        key = str(building_id)
+        with self._lock:
+            profile = self._entries.get(key)
+            if profile is not None and time.monotonic() - profile.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return profile
+            self._misses += 1
+        return None
+
+    def put(self, building_id, profile):
+        """読み込んだ参照データを登録する"""
+        key = str(building_id)
+        with self._lock:
+            self._entries[key] = profile
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, building_id=None):
+        """指定物件（未指定時は全物件）のキャッシュを破棄する"""
+        with self._lock:
+            if building_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(building_id), None)
+
+    def stats(self):
+        """キャッシュの利用状況"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+_profile_cache = BuildingProfileCache()
+
+
+def get_building_profile(building_id, connection):
+    """物件の参照データを取得（プロセス内キャッシュ経由）"""
+    return _profile_cache.get(building_id, connection)
+
+
+async def get_building_profile_async(building_id, connection):
+    """物件の参照データを取得（プロセス内キャッシュ経由。asyncio 版）"""
+    return await _profile_cache.get_async(building_id, connection)
+
+
+def invalidate_building_profile(building_id=None):
+    """
+    物件の参照データのキャッシュを破棄する（building_id 未指定時は全物件）
+    tSettingM（MinuteUnit / WakuPattern / WakuRange）・tStylistM・tMenuM を変更した処理の後に呼び出す
+    （呼び出したプロセスのキャッシュのみ破棄する。他のワーカー・DBを直接変更した場合は ttl_seconds 以内に反映される）
+    """
+    _profile_cache.invalidate(building_id)
+
+
+def get_building_profile_cache_stats():
+    """参照データキャッシュの利用状況を取得"""
+    return _profile_cache.stats()
@@ -0,0 +1,115 @@
+"""
+同期接続の MySQL ドライバーの切り替え
+pymysql（純Python）と mysqlclient（MySQLdb。C拡張のため行の変換が速い）を設定で選び、
+接続の作成・カーソルクラス・死活確認の違いを吸収する
+どちらも %s 形式のパラメータと辞書形式の行（DictCursor）で扱えるため、呼び出し側はドライバーを意識しない
+"""
+import os
+import threading
+
+import pymysql
+import pymysql.cursors
+from dotenv import load_dotenv
+
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError:  # mysqlclient はオプション（DB_DRIVER=mysqlclient / auto の場合のみ使用）
+    MySQLdb = None
+
+
+# 環境変数 DB_DRIVER で指定できる値（auto は mysqlclient がインストールされていれば mysqlclient）
+DRIVER_NAMES = ("pymysql", "mysqlclient", "auto")
+DEFAULT_DRIVER = "pymysql"
+
+
+def _require_mysqlclient():
+    if MySQLdb is None:
+        raise RuntimeError("DB_DRIVER=mysqlclient には mysqlclient が必要です（pip install mysqlclient）")
+
+
+class PyMySQLDriver:
+    """pymysql（既定）"""
+
+    name = "pymysql"
+    dict_cursor = pymysql.cursors.DictCursor
+    # サーバー側カーソル（結果を全件読み込まずに fetchmany で順に読み出す）
+    stream_cursor = pymysql.cursors.SSDictCursor
+
+    def connect(self, settings):
+        """接続を作成する（settings は connection.get_connection_settings() の形式）"""
+        return pymysql.connect(cursorclass=self.dict_cursor, **settings)
+
+    def ping(self, raw):
+        """死活確認（再接続はしない。切断済みの場合は例外）"""
+        raw.ping(reconnect=False)
+
+
+class MySQLClientDriver:
+    """mysqlclient（MySQLdb）"""
+
+    name = "mysqlclient"
+
+    def __init__(self):
+        _require_mysqlclient()
+        self.dict_cursor = MySQLdb.cursors.DictCursor
+        self.stream_cursor = MySQLdb.cursors.SSDictCursor
+
+    def connect(self, settings):
+        """接続を作成する（引数名の違いをここで吸収する）"""
+        return MySQLdb.connect(
+            host=settings["host"],
+            user=settings["user"],
+            passwd=settings["password"],
+            db=settings["db"],
+            charset=settings["charset"],
+            cursorclass=self.dict_cursor,
+        )
+
+    def ping(self, raw):
+        """死活確認（mysqlclient の ping は既定で再接続しない）"""
+        raw.ping()
+
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def load_driver_name():
+    """環境変数（.env を含む）からドライバー名を読み込む"""
+    load_dotenv()
+    return os.getenv("DB_DRIVER", DEFAULT_DRIVER).lower()
+
+
+def configure_db_driver(name=None):
+    """
+    使用するドライバーを設定する（未指定時は環境変数 DB_DRIVER）
+    接続プールの接続は作成時のドライバーのまま使われるため、プールを使う場合は configure_pool の前に呼び出す
+
+    Raises:
+        ValueError: ドライバー名が不正な場合
+        RuntimeError: mysqlclient を指定したがインストールされていない場合
+    """
+    global _driver
+    name = (name or load_driver_name()).lower()
+    if name not in DRIVER_NAMES:
+        raise ValueError(f"DB_DRIVER は {DRIVER_NAMES} のいずれかを指定してください: {name}")
+    if name == "auto":
+        name = "mysqlclient" if MySQLdb is not None else "pymysql"
+    driver = MySQLClientDriver() if name == "mysqlclient" else PyMySQLDriver()
+    with _driver_lock:
+        _driver = driver
+    return driver
+
+
+def get_db_driver():
+    """使用中のドライバーを取得（初回呼び出し時に環境変数から設定する）"""
+    driver = _driver
+    if driver is None:
+        driver = configure_db_driver()
+    return driver
+
+
+def get_db_driver_name():
+    """使用中のドライバー名を取得（ヘルスチェック用）"""
+    return get_db_driver().name
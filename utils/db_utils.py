@@ -1,8 +1,12 @@
 """
 データベース操作関連のユーティリティ関数
 """
+import time
 from functools import wraps
+
 from connection import get_connection
+from utils.db_driver import get_db_driver
+from utils.query_stats import record_query
 
 
 def db_connection(func):
@@ -27,26 +31,74 @@ def db_connection(func):
 
 
 class DBUtils:
-    """データベース操作関連のユーティリティクラス"""
+    """データベース操作関連のユーティリティクラス（実行したクエリはリクエスト単位で計測される）"""
     
     @staticmethod
     def execute_query(connection, sql, params=None):
         """クエリを実行して結果を取得"""
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or ())
-            return cursor.fetchall()
+        started = time.perf_counter()
+        rows = ()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params or ())
+                rows = cursor.fetchall()
+                return rows
+        finally:
+            record_query(sql, started, len(rows))
     
     @staticmethod
     def execute_single_query(connection, sql, params=None):
         """単一結果のクエリを実行"""
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or ())
-            return cursor.fetchone()
+        started = time.perf_counter()
+        row = None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params or ())
+                row = cursor.fetchone()
+                return row
+        finally:
+            record_query(sql, started, 0 if row is None else 1)
     
     @staticmethod
     def execute_update(connection, sql, params=None):
         """更新クエリを実行"""
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params or ())
-            connection.commit()
-            return cursor.rowcount
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params or ())
+                connection.commit()
+                return cursor.rowcount
+        finally:
+            record_query(sql, started)
+    
+    @staticmethod
+    def execute_many(connection, sql, params_list):
+        """同じ更新クエリを複数のパラメータでまとめて実行（INSERT は複数行の INSERT 1回で送信される）"""
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params_list)
+                connection.commit()
+                return cursor.rowcount
+        finally:
+            record_query(sql, started)
+    
+    @staticmethod
+    def stream_query(connection, sql, params=None, batch_size=100):
+        """
+        サーバー側カーソル（SSDictCursor）で結果を batch_size 件ずつ読み出し、1行ずつ返すジェネレータ
+        結果全体をメモリに載せないため、件数の多い一覧の逐次出力に使う
+        """
+        started = time.perf_counter()
+        rows = 0
+        try:
+            with connection.cursor(get_db_driver().stream_cursor) as cursor:
+                cursor.execute(sql, params or ())
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    rows += len(batch)
+                    yield from batch
+        finally:
+            record_query(sql, started, rows)
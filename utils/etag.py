@@ -0,0 +1,35 @@
+"""
+条件付き GET（ETag / If-None-Match）
+データの版（最終更新日時など）から ETag を作り、クライアントが送った If-None-Match と一致すれば
+レスポンス本体を組み立てずに 304 を返すための補助関数
+"""
+import hashlib
+
+
+def make_etag(*parts):
+    """
+    版を表す値から ETag（引用符付き）を作る
+
+    Args:
+        *parts: ETag に反映する値（一覧の種類・対象・版など。いずれかが変われば別の ETag になる）
+    """
+    key = "\x1f".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match ヘッダーが etag に一致するか（弱い比較。複数指定・"*" に対応）
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
@@ -0,0 +1,198 @@
+"""
+採番テーブル（tSequenceM）を使ったID採番
+採番テーブルの値をまとめて（ブロック単位で）確保してプロセス内に保持し、
+登録のたびに MAX(...) + 1 を読まずに重複しないIDを払い出す
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from utils.db_utils import DBUtils
+from utils.async_db_utils import AsyncDBUtils
+
+
+# 1回の確保で払い出すIDの件数（環境変数 ID_BLOCK_SIZE で変更可能）
+DEFAULT_BLOCK_SIZE = 50
+
+# 採番テーブル・採番行が存在しなかった場合に再確認するまでの秒数
+DEFAULT_RETRY_SECONDS = 60
+
+TAIO_CD_SEQUENCE = "TaioCD"
+
+# MySQL のテーブル未作成エラー（ER_NO_SUCH_TABLE）
+NO_SUCH_TABLE_ERROR = 1146
+
+LOCK_SEQUENCE_SQL = "SELECT NextValue FROM tSequenceM WHERE SeqName = %s FOR UPDATE"
+ADVANCE_SEQUENCE_SQL = "UPDATE tSequenceM SET NextValue = %s WHERE SeqName = %s"
+
+
+class SequenceUnavailableError(Exception):
+    """採番テーブル（または対象の採番行）が存在しない"""
+
+
+def _is_missing_table(e):
+    """テーブル未作成エラーかどうか"""
+    return bool(getattr(e, "args", None)) and e.args[0] == NO_SUCH_TABLE_ERROR
+
+
+class BlockIdAllocator:
+    """採番テーブルからIDをブロック単位で確保して払い出すクラス（スレッドセーフ）"""
+
+    def __init__(self, sequence_name, block_size=DEFAULT_BLOCK_SIZE, retry_seconds=DEFAULT_RETRY_SECONDS):
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self.retry_seconds = retry_seconds
+        # 確保済みで未使用の範囲 [next, end) のキュー
+        self._blocks = deque()
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self._issued = 0
+        self._reserved_blocks = 0
+
+    def next_id(self, connection):
+        """IDを1件払い出す（確保済みの範囲が無い場合のみ採番テーブルを更新する）"""
+        while True:
+            value = self._take()
+            if value is not None:
+                return value
+            self._check_available()
+            try:
+                block = self._reserve_block(connection)
+            except SequenceUnavailableError:
+                self._mark_unavailable()
+                raise
+            except Exception as e:
+                if not _is_missing_table(e):
+                    # ロック待ちのタイムアウト・切断などは一時的なエラーとして呼び出し元に返す
+                    # （他のワーカーが確保済みの範囲と重なるため MAX(...) + 1 には切り替えない）
+                    try:
+                        connection.rollback()
+                    except Exception:
+                        pass
+                    raise
+                self._mark_unavailable()
+                raise SequenceUnavailableError(str(e)) from e
+            self._add_block(block)
+
+    async def next_id_async(self, connection):
+        """IDを1件払い出す（asyncio 版）"""
+        while True:
+            value = self._take()
+            if value is not None:
+                return value
+            self._check_available()
+            try:
+                block = await self._reserve_block_async(connection)
+            except SequenceUnavailableError:
+                self._mark_unavailable()
+                raise
+            except Exception as e:
+                if not _is_missing_table(e):
+                    # ロック待ちのタイムアウト・切断などは一時的なエラーとして呼び出し元に返す
+                    # （他のワーカーが確保済みの範囲と重なるため MAX(...) + 1 には切り替えない）
+                    try:
+                        await connection.rollback()
+                    except Exception:
+                        pass
+                    raise
+                self._mark_unavailable()
+                raise SequenceUnavailableError(str(e)) from e
+            self._add_block(block)
+
+    def discard(self):
+        """確保済みの未使用IDを破棄する（他の採番方法で登録されたIDとの重複を検知した場合など）"""
+        with self._lock:
+            self._blocks.clear()
+
+    def stats(self):
+        """採番の利用状況"""
+        with self._lock:
+            return {
+                "sequence": self.sequence_name,
+                "block_size": self.block_size,
+                "cached": sum(end - start for start, end in self._blocks),
+                "issued": self._issued,
+                "reserved_blocks": self._reserved_blocks,
+                "available": time.monotonic() >= self._unavailable_until,
+            }
+
+    def _take(self):
+        with self._lock:
+            while self._blocks:
+                start, end = self._blocks[0]
+                if start < end:
+                    self._blocks[0] = (start + 1, end)
+                    self._issued += 1
+                    return start
+                self._blocks.popleft()
+            return None
+
+    def _add_block(self, block):
+        with self._lock:
+            self._blocks.append(block)
+            self._reserved_blocks += 1
+
+    def _check_available(self):
+        if time.monotonic() < self._unavailable_until:
+            raise SequenceUnavailableError(f"採番テーブルが使用できません（{self.sequence_name}）")
+
+    def _mark_unavailable(self):
+        self._unavailable_until = time.monotonic() + self.retry_seconds
+
+    def _reserve_block(self, connection):
+        """採番行をロックして block_size 件分進め、確保した範囲を返す"""
+        row = DBUtils.execute_single_query(connection, LOCK_SEQUENCE_SQL, (self.sequence_name,))
+        if not row:
+            connection.rollback()
+            raise SequenceUnavailableError(f"採番行がありません（{self.sequence_name}）")
+        start = int(row["NextValue"])
+        DBUtils.execute_update(connection, ADVANCE_SEQUENCE_SQL, (start + self.block_size, self.sequence_name))
+        return start, start + self.block_size
+
+    async def _reserve_block_async(self, connection):
+        """採番行をロックして block_size 件分進め、確保した範囲を返す（asyncio 版）"""
+        row = await AsyncDBUtils.execute_single_query(connection, LOCK_SEQUENCE_SQL, (self.sequence_name,))
+        if not row:
+            await connection.rollback()
+            raise SequenceUnavailableError(f"採番行がありません（{self.sequence_name}）")
+        start = int(row["NextValue"])
+        await AsyncDBUtils.execute_update(
+            connection, ADVANCE_SEQUENCE_SQL, (start + self.block_size, self.sequence_name))
+        return start, start + self.block_size
+
+
+def _block_size_from_env():
+    try:
+        return max(1, int(os.getenv("ID_BLOCK_SIZE", DEFAULT_BLOCK_SIZE)))
+    except ValueError:
+        return DEFAULT_BLOCK_SIZE
+
+
+_taio_cd_allocator = BlockIdAllocator(TAIO_CD_SEQUENCE, _block_size_from_env())
+
+
+def get_taio_cd_allocator():
+    """TaioCD の採番オブジェクトを取得"""
+    return _taio_cd_allocator
+
+
+def next_taio_cd(connection):
+    """
+    TaioCD を1件払い出す
+
+    Raises:
+        SequenceUnavailableError: 採番テーブル・採番行が存在しない場合
+        Exception: それ以外のDBエラー（ロック待ちのタイムアウト等。ロールバック済み）
+    """
+    return _taio_cd_allocator.next_id(connection)
+
+
+async def next_taio_cd_async(connection):
+    """TaioCD を1件払い出す（asyncio 版）"""
+    return await _taio_cd_allocator.next_id_async(connection)
+
+
+def get_id_allocator_stats():
+    """採番の利用状況を取得"""
+    return {"TaioCD": _taio_cd_allocator.stats()}
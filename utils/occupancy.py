@@ -0,0 +1,480 @@
+"""
+予約占有状況（分単位・スタイリスト単位の有効予約数）関連のユーティリティ
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from utils.db_utils import DBUtils
+from utils.async_db_utils import AsyncDBUtils
+from utils.time_utils import TimeUtils
+
+
+# 外部からの予約変更を検知する照合（Updated の最大値の確認）の間隔（秒）と保持する日数の上限
+DEFAULT_RECONCILE_INTERVAL_SECONDS = 30
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class DayOccupancy:
+    """1日分の有効予約数を「分(0-1439) × StylistCD」で保持するクラス"""
+
+    def __init__(self, counts=None):
+        # {minute_of_day: {StylistCD(str or None): 予約数}}
+        self.counts = counts if counts is not None else {}
+        self.totals = {minute: sum(by_stylist.values()) for minute, by_stylist in self.counts.items()}
+
+    def total(self, minute_of_day):
+        """指定分の予約数（スタイリストを問わない合計）"""
+        return self.totals.get(minute_of_day, 0)
+
+    def stylist(self, minute_of_day, stylist_cd):
+        """指定分・指定スタイリストの予約数"""
+        by_stylist = self.counts.get(minute_of_day)
+        if not by_stylist:
+            return 0
+        return by_stylist.get(_stylist_key(stylist_cd), 0)
+    
+    def adjusted(self, minute_of_day, stylist_cd, delta):
+        """指定分・指定スタイリストの予約数を delta 増減した新しい DayOccupancy を返す（自身は変更しない）"""
+        counts = dict(self.counts)
+        by_stylist = dict(counts.get(minute_of_day, {}))
+        key = _stylist_key(stylist_cd)
+        value = by_stylist.get(key, 0) + delta
+        if value > 0:
+            by_stylist[key] = value
+        else:
+            by_stylist.pop(key, None)
+        if by_stylist:
+            counts[minute_of_day] = by_stylist
+        else:
+            counts.pop(minute_of_day, None)
+        return DayOccupancy(counts)
+
+
+def _stylist_key(stylist_cd):
+    """StylistCDの型差（数値/文字列）を吸収するためのキー"""
+    return None if stylist_cd is None else str(stylist_cd)
+
+
+def load_occupancy(connection, building_id, date_from, days=1, exclude_usercd=None):
+    """
+    指定物件の有効予約（MukouFlg = 0 AND Status = 1）を日付範囲分まとめて取得し、
+    日付ごとの DayOccupancy に集計して返す
+
+    Args:
+        connection: データベース接続
+        building_id: 物件ID
+        date_from: 開始日（date）
+        days: 取得日数
+        exclude_usercd: 集計から除外するUserCD
+
+    Returns:
+        dict: {date: DayOccupancy}（予約が無い日も空の DayOccupancy を含む）
+    """
+    sql, params = _occupancy_query(building_id, date_from, days, exclude_usercd)
+    rows = DBUtils.execute_query(connection, sql, params)
+    return _aggregate_occupancy(rows, date_from, days)
+
+
+async def load_occupancy_async(connection, building_id, date_from, days=1, exclude_usercd=None):
+    """load_occupancy の asyncio 版"""
+    sql, params = _occupancy_query(building_id, date_from, days, exclude_usercd)
+    rows = await AsyncDBUtils.execute_query(connection, sql, params)
+    return _aggregate_occupancy(rows, date_from, days)
+
+
+def _occupancy_query(building_id, date_from, days, exclude_usercd):
+    """予約占有状況の集計クエリとパラメータ"""
+    range_start = datetime(date_from.year, date_from.month, date_from.day)
+    range_end = range_start + timedelta(days=days)
+
+    sql = """
+    SELECT
+        DATE(TimeFrom) AS day,
+        HOUR(TimeFrom) * 60 + MINUTE(TimeFrom) AS minute_of_day,
+        StylistCD,
+        COUNT(*) AS cnt
+    FROM tReservationF
+    WHERE MukouFlg = 0 AND Status = 1 AND ClientCD = %s
+    AND TimeFrom >= %s AND TimeFrom < %s
+    """
+    params = [building_id, range_start.strftime("%Y-%m-%d %H:%M:%S"), range_end.strftime("%Y-%m-%d %H:%M:%S")]
+    if exclude_usercd:
+        sql += " AND UserCD != %s"
+        params.append(exclude_usercd)
+    sql += " GROUP BY day, minute_of_day, StylistCD"
+    return sql, tuple(params)
+
+
+def _aggregate_occupancy(rows, date_from, days):
+    """集計クエリの結果を日付ごとの DayOccupancy にまとめる"""
+    counts_by_day = {(date_from + timedelta(days=i)): {} for i in range(days)}
+    for row in rows:
+        day = row["day"]
+        if isinstance(day, datetime):
+            day = day.date()
+        by_minute = counts_by_day.setdefault(day, {})
+        by_stylist = by_minute.setdefault(int(row["minute_of_day"]), {})
+        key = _stylist_key(row["StylistCD"])
+        by_stylist[key] = by_stylist.get(key, 0) + int(row["cnt"])
+
+    return {day: DayOccupancy(counts) for day, counts in counts_by_day.items()}
+
+
+# 予約確定の排他用に物件の設定行をロックする
+# 枠にまだ有効予約が無い場合、予約の行への FOR UPDATE はギャップロックしか取らず、ギャップロック同士は競合しないため
+# 同時に空きと判定して二重に予約できてしまう。必ず存在する行を先にロックして、同じ物件の予約確定を順番に実行する
+BUILDING_LOCK_SQL = "SELECT ClientCD FROM tSettingM WHERE ClientCD = %s FOR UPDATE"
+
+# 枠の時間帯の有効予約（予約確定前の空き判定用）
+# 物件の設定行のロックを取得した後に読むため、待った側はロック取得後に確定済みの予約を読む
+# （ロック読み取りのため、トランザクション開始時点のスナップショットではなく最新の確定済みの行を読む）
+SLOT_RESERVATIONS_FOR_UPDATE_SQL = """
+    SELECT TimeFrom, StylistCD
+    FROM tReservationF
+    WHERE ClientCD = %s AND MukouFlg = 0 AND Status = 1
+    AND TimeFrom >= %s AND TimeFrom < %s
+    FOR UPDATE
+"""
+
+
+def lock_slot_occupancy(connection, building_id, day, minute_from, minute_to):
+    """
+    物件の設定行をロックしてから、指定日の時間帯（0時からの経過分 minute_from 〜 minute_to 未満）の
+    有効予約を行ロック付きで読み込む（ロックは呼び出し元のトランザクションの commit / rollback まで保持される）
+
+    Returns:
+        DayOccupancy: 時間帯内の予約数のみを持つ DayOccupancy
+    """
+    DBUtils.execute_query(connection, BUILDING_LOCK_SQL, (building_id,))
+    rows = DBUtils.execute_query(
+        connection, SLOT_RESERVATIONS_FOR_UPDATE_SQL, _slot_params(building_id, day, minute_from, minute_to))
+    return _slot_occupancy(rows)
+
+
+async def lock_slot_occupancy_async(connection, building_id, day, minute_from, minute_to):
+    """lock_slot_occupancy の asyncio 版"""
+    await AsyncDBUtils.execute_query(connection, BUILDING_LOCK_SQL, (building_id,))
+    rows = await AsyncDBUtils.execute_query(
+        connection, SLOT_RESERVATIONS_FOR_UPDATE_SQL, _slot_params(building_id, day, minute_from, minute_to))
+    return _slot_occupancy(rows)
+
+
+def _slot_params(building_id, day, minute_from, minute_to):
+    day_start = datetime(day.year, day.month, day.day)
+    return (building_id,
+            (day_start + timedelta(minutes=minute_from)).strftime("%Y-%m-%d %H:%M:%S"),
+            (day_start + timedelta(minutes=minute_to)).strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def _slot_occupancy(rows):
+    """予約の行を分・スタイリストごとに集計する"""
+    counts = {}
+    for row in rows:
+        time_from = _to_datetime(row["TimeFrom"])
+        by_stylist = counts.setdefault(time_from.hour * 60 + time_from.minute, {})
+        key = _stylist_key(row["StylistCD"])
+        by_stylist[key] = by_stylist.get(key, 0) + 1
+    return DayOccupancy(counts)
+
+
+def _to_datetime(value):
+    """datetime / "YYYY-MM-DD HH:MM[:SS]" を datetime に変換"""
+    if isinstance(value, datetime):
+        return value
+    return TimeUtils.parse_datetime(value)
+
+
+WATERMARK_SQL = """
+    SELECT Updated, COUNT(*) AS cnt
+    FROM tReservationF
+    WHERE ClientCD = %s
+    AND Updated = (SELECT MAX(Updated) FROM tReservationF WHERE ClientCD = %s)
+    GROUP BY Updated
+"""
+
+
+def _probe_watermark(connection, building_id):
+    """物件の予約の Updated の最大値と、その値を持つ行数を取得"""
+    row = DBUtils.execute_single_query(connection, WATERMARK_SQL, (building_id, building_id))
+    return _watermark_from_row(row)
+
+
+async def _probe_watermark_async(connection, building_id):
+    """_probe_watermark の asyncio 版"""
+    row = await AsyncDBUtils.execute_single_query(connection, WATERMARK_SQL, (building_id, building_id))
+    return _watermark_from_row(row)
+
+
+def _watermark_from_row(row):
+    if not row or row.get("Updated") is None:
+        return {"updated": None, "known": Counter()}
+    return {"updated": row["Updated"], "known": Counter({row["Updated"]: int(row["cnt"])})}
+
+
+class OccupancyCache:
+    """
+    (ClientCD, 日付) 単位の DayOccupancy のプロセス内キャッシュ
+    
+    - 本サービスの予約変更は record_reservation_move で差分を反映する（再読み込みしない）
+    - 本サービス以外の変更は、一定間隔で tReservationF.Updated の最大値を照合して検知し、
+      変更があった物件のキャッシュを破棄する
+    - DayOccupancy は差し替え方式で更新するため、取得済みのオブジェクトは変化しない
+    """
+    
+    def __init__(self, reconcile_interval=DEFAULT_RECONCILE_INTERVAL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.reconcile_interval = reconcile_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # {ClientCD: {"updated": 照合済みの Updated 最大値, "known": 把握済みの {Updated: 行数}}}
+        self._watermarks = {}
+        # 物件ごとの世代（予約の移動・破棄のたびに進める）。読み込み中に世代が変わった日はキャッシュしない
+        self._generations = Counter()
+        self._epoch = 0  # 全物件の破棄で進める世代
+        self._lock = threading.Lock()
+        self._last_reconciled = time.monotonic()
+        self._hits = 0
+        self._misses = 0
+        self._applied = 0
+        self._invalidated = 0
+        self._reconciliations = 0
+    
+    def get_days(self, connection, building_id, date_from, days=1):
+        """指定期間の DayOccupancy を取得（キャッシュに無い日だけを1クエリでまとめて読み込む）"""
+        if self._reconcile_due():
+            self.reconcile(connection)
+        
+        result, missing, need_watermark, generation = self._lookup(building_id, date_from, days)
+        if not missing:
+            return result
+        
+        # 照合の基準は予約の読み込みより前に取得する（読み込み中の変更を取りこぼさない）
+        watermark = _probe_watermark(connection, building_id) if need_watermark else None
+        loaded = load_occupancy(connection, building_id, missing[0], (missing[-1] - missing[0]).days + 1)
+        return self._store(building_id, result, missing, loaded, watermark, generation)
+    
+    async def get_days_async(self, connection, building_id, date_from, days=1):
+        """get_days の asyncio 版"""
+        if self._reconcile_due():
+            await self.reconcile_async(connection)
+        
+        result, missing, need_watermark, generation = self._lookup(building_id, date_from, days)
+        if not missing:
+            return result
+        
+        watermark = await _probe_watermark_async(connection, building_id) if need_watermark else None
+        loaded = await load_occupancy_async(
+            connection, building_id, missing[0], (missing[-1] - missing[0]).days + 1)
+        return self._store(building_id, result, missing, loaded, watermark, generation)
+    
+    def _reconcile_due(self):
+        return time.monotonic() - self._last_reconciled >= self.reconcile_interval
+    
+    def _lookup(self, building_id, date_from, days):
+        """キャッシュ済みの日と未読み込みの日を振り分ける"""
+        client = str(building_id)
+        wanted = [date_from + timedelta(days=i) for i in range(days)]
+        result = {}
+        with self._lock:
+            for day in wanted:
+                occupancy = self._entries.get((client, day))
+                if occupancy is not None:
+                    self._entries.move_to_end((client, day))
+                    result[day] = occupancy
+            missing = [day for day in wanted if day not in result]
+            self._hits += len(result)
+            self._misses += len(missing)
+            need_watermark = bool(missing) and client not in self._watermarks
+            generation = (self._epoch, self._generations[client])
+        return result, missing, need_watermark, generation
+    
+    def _store(self, building_id, result, missing, loaded, watermark, generation):
+        """読み込んだ日をキャッシュに登録する（generation は _lookup 時点の世代）"""
+        client = str(building_id)
+        with self._lock:
+            # 読み込み中に予約が移動・破棄された場合、読み込んだ内容は移動前の可能性があり、
+            # 移動は自身の更新として照合の対象外になるため、キャッシュすると誤った空き状況が残り続ける
+            if generation != (self._epoch, self._generations[client]):
+                result.update((day, loaded[day]) for day in missing)
+                return result
+            if watermark is not None:
+                self._watermarks.setdefault(client, watermark)
+            # 読み込み中に照合基準が破棄された場合は照合できないためキャッシュしない
+            cacheable = client in self._watermarks
+            for day in missing:
+                result[day] = loaded[day]
+                if not cacheable:
+                    continue
+                self._entries[(client, day)] = loaded[day]
+                self._entries.move_to_end((client, day))
+            while len(self._entries) > self.max_entries:
+                (evicted_client, _day), _occupancy = self._entries.popitem(last=False)
+                if not any(key[0] == evicted_client for key in self._entries):
+                    self._watermarks.pop(evicted_client, None)
+        return result
+    
+    def record_reservation_move(self, building_id, old_time_from, new_time_from, stylist_cd, updated=None):
+        """
+        本サービスで有効予約1件の TimeFrom を移動したことを反映する
+        （旧時刻の予約数を1減らし、新時刻の予約数を1増やす。updated は更新後の Updated の値）
+        """
+        client = str(building_id)
+        old_dt = _to_datetime(old_time_from)
+        new_dt = _to_datetime(new_time_from)
+        with self._lock:
+            for dt, delta in ((old_dt, -1), (new_dt, 1)):
+                key = (client, dt.date())
+                occupancy = self._entries.get(key)
+                if occupancy is not None:
+                    self._entries[key] = occupancy.adjusted(dt.hour * 60 + dt.minute, stylist_cd, delta)
+            self._applied += 1
+            self._generations[client] += 1
+            # 自身の更新による Updated の変化は照合で外部変更とみなさない
+            watermark = self._watermarks.get(client)
+            if watermark is not None:
+                if updated is None:
+                    self._drop_client(client)
+                else:
+                    watermark["known"][updated] += 1
+    
+    def invalidate(self, building_id=None, day=None):
+        """指定物件・指定日（未指定時は全物件・全日）のキャッシュを破棄する"""
+        with self._lock:
+            if building_id is None:
+                self._invalidated += len(self._entries)
+                self._entries.clear()
+                self._watermarks.clear()
+                self._epoch += 1
+            elif day is None:
+                self._drop_client(str(building_id))
+            else:
+                self._generations[str(building_id)] += 1
+                if self._entries.pop((str(building_id), day), None) is not None:
+                    self._invalidated += 1
+    
+    def _drop_client(self, client):
+        """物件のキャッシュと照合基準を破棄（ロック取得済みで呼び出す）"""
+        self._generations[client] += 1
+        for key in [key for key in self._entries if key[0] == client]:
+            del self._entries[key]
+            self._invalidated += 1
+        self._watermarks.pop(client, None)
+    
+    def reconcile(self, connection):
+        """
+        キャッシュ中の物件について tReservationF.Updated を照合し、
+        本サービス以外で変更された物件のキャッシュを破棄する（1クエリ）
+        """
+        plan = self._reconcile_plan()
+        if plan is None:
+            return {"checked": 0, "invalidated": []}
+        watermarks, sql, params = plan
+        return self._reconcile_apply(watermarks, DBUtils.execute_query(connection, sql, params))
+    
+    async def reconcile_async(self, connection):
+        """reconcile の asyncio 版"""
+        plan = self._reconcile_plan()
+        if plan is None:
+            return {"checked": 0, "invalidated": []}
+        watermarks, sql, params = plan
+        return self._reconcile_apply(watermarks, await AsyncDBUtils.execute_query(connection, sql, params))
+    
+    def _reconcile_plan(self):
+        """照合クエリを組み立てる（キャッシュ中の物件が無い場合は None）"""
+        self._last_reconciled = time.monotonic()
+        with self._lock:
+            watermarks = {client: dict(state, known=Counter(state["known"])) for client, state in self._watermarks.items()}
+        if not watermarks:
+            return None
+        
+        floors = [state["updated"] for state in watermarks.values() if state["updated"] is not None]
+        floor = min(floors) if len(floors) == len(watermarks) else datetime(1900, 1, 1)
+        placeholders = ", ".join(["%s"] * len(watermarks))
+        sql = f"""
+        SELECT ClientCD, Updated, COUNT(*) AS cnt
+        FROM tReservationF
+        WHERE ClientCD IN ({placeholders}) AND Updated >= %s
+        GROUP BY ClientCD, Updated
+        """
+        return watermarks, sql, tuple(watermarks) + (floor,)
+    
+    def _reconcile_apply(self, watermarks, rows):
+        """照合結果を反映し、外部で変更された物件のキャッシュを破棄する"""
+        observed = {client: Counter() for client in watermarks}
+        for row in rows:
+            client = str(row["ClientCD"])
+            state = watermarks.get(client)
+            if state is None or row["Updated"] is None:
+                continue
+            if state["updated"] is None or row["Updated"] >= state["updated"]:
+                observed[client][row["Updated"]] += int(row["cnt"])
+        
+        invalidated = []
+        with self._lock:
+            self._reconciliations += 1
+            for client, seen in observed.items():
+                current = self._watermarks.get(client)
+                if current is None:
+                    continue
+                known = current["known"]
+                if any(cnt > known.get(updated, 0) for updated, cnt in seen.items()):
+                    self._drop_client(client)
+                    invalidated.append(client)
+                elif seen:
+                    latest = max(seen)
+                    current["updated"] = latest
+                    current["known"] = Counter({latest: seen[latest]})
+        return {"checked": len(observed), "invalidated": invalidated}
+    
+    def stats(self):
+        """キャッシュの利用状況"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "buildings": len(self._watermarks),
+                "max_entries": self.max_entries,
+                "reconcile_interval_seconds": self.reconcile_interval,
+                "hits": self._hits,
+                "misses": self._misses,
+                "applied_moves": self._applied,
+                "invalidated": self._invalidated,
+                "reconciliations": self._reconciliations,
+            }
+
+
+_occupancy_cache = OccupancyCache()
+
+
+def get_occupancy_cache():
+    """プロセス共通の予約占有状況キャッシュを取得"""
+    return _occupancy_cache
+
+
+def get_cached_occupancy(connection, building_id, date_from, days=1):
+    """指定期間の予約占有状況を取得（プロセス内キャッシュ経由）"""
+    return _occupancy_cache.get_days(connection, building_id, date_from, days)
+
+
+def record_reservation_move(building_id, old_time_from, new_time_from, stylist_cd, updated=None):
+    """本サービスでの予約の TimeFrom 移動をキャッシュに反映する"""
+    _occupancy_cache.record_reservation_move(building_id, old_time_from, new_time_from, stylist_cd, updated)
+
+
+async def get_cached_occupancy_async(connection, building_id, date_from, days=1):
+    """get_cached_occupancy の asyncio 版"""
+    return await _occupancy_cache.get_days_async(connection, building_id, date_from, days)
+
+
+def invalidate_occupancy(building_id=None, day=None):
+    """予約占有状況のキャッシュを破棄する"""
+    _occupancy_cache.invalidate(building_id, day)
+
+
+def reconcile_occupancy(connection):
+    """外部での予約変更を照合し、変更のあった物件のキャッシュを破棄する"""
+    return _occupancy_cache.reconcile(connection)
+
+
+def get_occupancy_cache_stats():
+    """予約占有状況キャッシュの利用状況を取得"""
+    return _occupancy_cache.stats()
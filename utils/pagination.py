@@ -0,0 +1,142 @@
+"""
+キーセット方式のページング
+直前のページの最後の行のソートキーを不透明なカーソル文字列にして返し、
+次のページは OFFSET ではなく「そのキー以降」の条件で取得する
+一意な列が無いテーブルでも取りこぼさないよう、カーソルには最後のキーと同じキーの行を返した件数も含め、
+次のページではその件数だけ先頭の同じキーの行を読み飛ばす
+"""
+import base64
+import json
+from datetime import datetime
+
+
+# 1ページの既定件数と上限
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 200
+
+# カーソルに含める「同じキーの行を返した件数」の上限
+# 件数はクライアントから送られる値で取得件数（LIMIT）に加算されるため、改ざんされたカーソルで大量の行を読まないよう制限する
+# （同じソートキーの行がこの件数を超えて続く一覧はページングできない）
+MAX_CURSOR_SEEN = MAX_PAGE_SIZE * 10
+
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class InvalidCursorError(ValueError):
+    """カーソル文字列が不正（改ざん・別の一覧のカーソル等）"""
+
+
+def clamp_page_size(limit):
+    """ページの件数を 1〜MAX_PAGE_SIZE に丸める"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.strftime(_DATETIME_FORMAT)
+    return value
+
+
+def encode_cursor(kind, values):
+    """
+    ソートキーをカーソル文字列にする
+
+    Args:
+        kind: 一覧の種類（別の一覧のカーソルを受け付けないための識別子）
+        values: 最後の行のソートキー
+    """
+    payload = json.dumps([kind] + [_to_json(v) for v in values], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(kind, cursor, size):
+    """
+    カーソル文字列からソートキーを取り出す
+
+    Returns:
+        list: ソートキー（size 件）
+
+    Raises:
+        InvalidCursorError: 形式・種類・件数が一致しない場合
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload.decode("utf-8"))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(str(e)) from e
+    if not isinstance(values, list) or len(values) != size + 1 or values[0] != kind:
+        raise InvalidCursorError("cursor mismatch")
+    return values[1:]
+
+
+def split_page(rows, limit):
+    """
+    limit + 1 件取得した結果を1ページ分と次ページの有無に分ける
+
+    Returns:
+        tuple: (1ページ分の行, 次のページがあるか)
+    """
+    if len(rows) > limit:
+        return rows[:limit], True
+    return rows, False
+
+
+def cursor_key(values):
+    """ソートキーをカーソルに保存する形式（日時は文字列）に揃える"""
+    return [_to_json(v) for v in values]
+
+
+def encode_keyset_cursor(kind, page, key_of, key=None, seen=0):
+    """
+    ページの最後の行から次のページのカーソル文字列を作る
+
+    Args:
+        kind: 一覧の種類
+        page: 返すページの行（1件以上）
+        key_of: 行からソートキーを取り出す関数
+        key, seen: このページを取得したカーソルの内容（decode_keyset_cursor の戻り値。1ページ目は省略）
+    """
+    last = cursor_key(key_of(page[-1]))
+    count = 0
+    for row in reversed(page):
+        if cursor_key(key_of(row)) != last:
+            break
+        count += 1
+    # ページ全体が前のカーソルと同じキーの場合は、前のページまでに返した件数を引き継ぐ
+    if count == len(page) and last == key:
+        count += seen
+    return encode_cursor(kind, last + [count])
+
+
+def decode_keyset_cursor(kind, cursor, size):
+    """
+    encode_keyset_cursor のカーソル文字列を取り出す
+
+    Returns:
+        tuple: (ソートキー（size 件）, そのキーの行を返した件数)
+
+    Raises:
+        InvalidCursorError: 形式・種類・件数が一致しない場合、件数が 1〜MAX_CURSOR_SEEN の範囲外の場合
+    """
+    values = decode_cursor(kind, cursor, size + 1)
+    seen = values[-1]
+    if not isinstance(seen, int) or isinstance(seen, bool) or not 1 <= seen <= MAX_CURSOR_SEEN:
+        raise InvalidCursorError("cursor mismatch")
+    return values[:-1], seen
+
+
+def skip_seen(rows, key_of, key, seen):
+    """
+    「カーソルのキー以降」で取得した行から、前のページまでに返した同じキーの行（先頭の最大 seen 件）を除く
+
+    Returns:
+        tuple: (残りの行, 除いた件数)
+    """
+    skipped = 0
+    while skipped < min(seen, len(rows)) and cursor_key(key_of(rows[skipped])) == key:
+        skipped += 1
+    return rows[skipped:], skipped
@@ -3,7 +3,8 @@
 """
 import requests
 import json
-from utils.db_utils import DBUtils
+from utils.building_profile import get_building_profile
+from utils.waku_loader import get_waku_pattern_registry, compile_waku_pattern
 
 
 class PatternUtils:
@@ -13,10 +14,7 @@ class PatternUtils:
     def get_minute_unit(building_id, connection):
         """分単位を取得"""
         try:
-            row = DBUtils.execute_single_query(connection, "SELECT MinuteUnit FROM tSettingM WHERE ClientCD = %s", (building_id,))
-            if row and row.get('MinuteUnit') not in (None, '', 0, '0'):
-                return int(row['MinuteUnit'])
-            return 60  # デフォルト値
+            return get_building_profile(building_id, connection).minute_unit
         except Exception:
             return 60  # デフォルト値
     
@@ -24,9 +22,7 @@ class PatternUtils:
     def get_minute_type(menu_cd, building_id, connection):
         """メニューの分タイプを取得"""
         try:
-            sql = "SELECT MinuteType FROM tMenuM WHERE MenuCD = %s AND ClientCD = %s AND MukouFlg = 0"
-            row = DBUtils.execute_single_query(connection, sql, (menu_cd, building_id))
-            return int(row['MinuteType']) if row and row.get('MinuteType') else 1
+            return get_building_profile(building_id, connection).minute_type(menu_cd)
         except Exception:
             return 1  # デフォルト値
     
@@ -35,15 +31,34 @@ class PatternUtils:
         """枠パターンIDを取得"""
         # WakuPatternIDではなくWakuPatternを取得するように修正
         try:
-            row = DBUtils.execute_single_query(connection, "SELECT WakuPattern FROM tSettingM WHERE ClientCD = %s", (building_id))
-            if row and 'WakuPattern' in row:
-                return row['WakuPattern']
+            return get_building_profile(building_id, connection).waku_pattern_id
         except Exception:
             return None
     
+    @staticmethod
+    def get_waku_pattern(waku_pattern_id):
+        """
+        枠パターン定義を取得（ローカルのパターンレジストリから参照。HTTP通信は行わない）
+        定義が1件も読み込めない場合はデフォルトパターンを使用する
+        """
+        patterns = get_waku_pattern_registry().get_patterns()
+        if not patterns:
+            patterns = dict(enumerate(PatternUtils._get_default_patterns()))
+        return patterns.get(int(waku_pattern_id))
+    
+    @staticmethod
+    def get_compiled_pattern(waku_pattern_id):
+        """枠パターンを分単位の配列に変換済みの形で取得（レジストリ読み込み時に変換済みのものを使う）"""
+        compiled = get_waku_pattern_registry().get_compiled(int(waku_pattern_id))
+        if compiled is None:
+            pattern = PatternUtils.get_waku_pattern(waku_pattern_id)
+            if pattern is not None:
+                compiled = compile_waku_pattern(pattern)
+        return compiled
+    
     @staticmethod
     def load_wakupatterns_from_php():
-        """PHPスクリプトから枠パターンを読み込み"""
+        """PHPスクリプトから枠パターンを読み込み（レガシー。get_pattern_info では使用しない）"""
         try:
             # PHPスクリプトのURL（実際の環境に合わせて調整）
             php_url = "http://localhost/wakupatterns.php"  # 実際のURLに変更
@@ -71,19 +86,25 @@ class PatternUtils:
     @staticmethod
     def get_pattern_info(building_id, connection):
         """枠パターン情報を取得"""
+        return PatternUtils.pattern_info_for(PatternUtils.get_waku_pattern_id(building_id, connection))
+    
+    @staticmethod
+    def pattern_info_for(waku_pattern_id):
+        """枠パターンIDから枠パターン情報を組み立てる（DBアクセスなし）"""
         try:
-            waku_pattern_id = PatternUtils.get_waku_pattern_id(building_id, connection)
-            wakupatterns = PatternUtils.load_wakupatterns_from_php()
+            if waku_pattern_id is None:
+                return None
             
-            if waku_pattern_id is None or waku_pattern_id >= len(wakupatterns):
+            pattern = PatternUtils.get_waku_pattern(waku_pattern_id)
+            if pattern is None:
                 return None
             
-            pattern = wakupatterns[waku_pattern_id]
             return {
                 'pattern_id': waku_pattern_id,
                 'pattern': pattern,
                 'start_times': pattern.get("StartTime", []),
-                'end_times': pattern.get("EndTime", [])
+                'end_times': pattern.get("EndTime", []),
+                'compiled': PatternUtils.get_compiled_pattern(waku_pattern_id)
             }
         except Exception:
             return None
@@ -0,0 +1,168 @@
+"""
+リクエスト単位のDBクエリ計測
+DBUtils / AsyncDBUtils が実行したクエリの件数・合計時間・最も遅いクエリ・取得行数を
+リクエストごとに記録し、ルート単位で集計する
+"""
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+
+# 最も遅いクエリとして保持する SQL の最大文字数
+MAX_SQL_LENGTH = 200
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_current_stats = ContextVar("db_query_stats", default=None)
+
+
+def _compact_sql(sql):
+    """SQL の空白を詰めて先頭 MAX_SQL_LENGTH 文字にする（パラメータは含めない）"""
+    text = _WHITESPACE_RE.sub(" ", str(sql)).strip()
+    return text if len(text) <= MAX_SQL_LENGTH else text[:MAX_SQL_LENGTH] + "..."
+
+
+class RequestQueryStats:
+    """1リクエスト分のクエリ計測値"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed_ms, rows):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.rows += rows
+            if self.slowest_sql is None or elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_sql = sql
+
+    @property
+    def elapsed_ms(self):
+        """リクエスト開始からの経過時間（ミリ秒）"""
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Server-Timing ヘッダーの値"""
+        return (f'db;dur={self.total_ms:.2f};desc="{self.count} queries, {self.rows} rows", '
+                f'app;dur={self.elapsed_ms:.2f}')
+
+    def to_dict(self):
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.total_ms, 3),
+            "rows": self.rows,
+            "slowest_ms": round(self.slowest_ms, 3),
+            "slowest_sql": _compact_sql(self.slowest_sql) if self.slowest_sql is not None else None,
+        }
+
+
+def begin_request_stats():
+    """
+    現在のコンテキスト（リクエスト）でクエリ計測を開始する
+
+    Returns:
+        tuple: (RequestQueryStats, end_request_stats に渡すトークン)
+    """
+    stats = RequestQueryStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request_stats(token):
+    """クエリ計測を終了する"""
+    _current_stats.reset(token)
+
+
+def get_request_stats():
+    """現在のリクエストの計測値（計測中でない場合は None）"""
+    return _current_stats.get()
+
+
+def record_query(sql, started, rows=0):
+    """
+    クエリ1件の実行結果を現在のリクエストに記録する（計測中でない場合は何もしない）
+
+    Args:
+        sql: 実行した SQL
+        started: time.perf_counter() で取得した実行開始時刻
+        rows: 取得した行数（更新系は 0）
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(sql, (time.perf_counter() - started) * 1000, rows)
+
+
+class QueryMetrics:
+    """ルートごとのクエリ計測値の集計"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, stats):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0, "queries": 0, "max_queries": 0, "db_time_ms": 0.0,
+                    "max_db_time_ms": 0.0, "rows": 0, "slowest_ms": 0.0, "slowest_sql": None,
+                }
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["db_time_ms"] += stats.total_ms
+            entry["max_db_time_ms"] = max(entry["max_db_time_ms"], stats.total_ms)
+            entry["rows"] += stats.rows
+            if stats.slowest_sql is not None and stats.slowest_ms > entry["slowest_ms"]:
+                entry["slowest_ms"] = stats.slowest_ms
+                entry["slowest_sql"] = stats.slowest_sql
+
+    def snapshot(self):
+        """ルートごとの集計（1リクエストあたりのクエリ数が多い順）"""
+        with self._lock:
+            routes = {route: dict(entry) for route, entry in self._routes.items()}
+        result = []
+        for route, entry in routes.items():
+            requests = entry["requests"] or 1
+            result.append({
+                "route": route,
+                "requests": entry["requests"],
+                "queries_per_request": round(entry["queries"] / requests, 2),
+                "max_queries": entry["max_queries"],
+                "db_time_ms_per_request": round(entry["db_time_ms"] / requests, 3),
+                "max_db_time_ms": round(entry["max_db_time_ms"], 3),
+                "rows_per_request": round(entry["rows"] / requests, 2),
+                "slowest_ms": round(entry["slowest_ms"], 3),
+                "slowest_sql": _compact_sql(entry["slowest_sql"]) if entry["slowest_sql"] is not None else None,
+            })
+        result.sort(key=lambda r: (-r["queries_per_request"], r["route"]))
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+_metrics = QueryMetrics()
+
+
+def record_request_metrics(route, stats):
+    """1リクエスト分の計測値をルート単位の集計に加える"""
+    _metrics.add(route, stats)
+
+
+def get_query_metrics():
+    """ルートごとのクエリ計測値の集計を取得"""
+    return _metrics.snapshot()
+
+
+def reset_query_metrics():
+    """ルートごとのクエリ計測値の集計を破棄する"""
+    _metrics.reset()
@@ -0,0 +1,122 @@
+"""
+認証済みセッションの署名付きトークン
+ログイン時に1回だけ tUserM で認証し、(UserCD, ClientCD) と有効期限を HMAC-SHA256 で署名したトークンを発行する
+以降の認証ありAPIはパスワードの代わりにトークンを受け取り、DBを参照せずに署名と有効期限だけで検証する
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+from dotenv import load_dotenv
+
+
+# トークンの先頭に付ける識別子（パスワードと区別するため）
+TOKEN_PREFIX = "st1."
+
+# 既定の有効期限（秒）
+DEFAULT_TTL = 900
+
+_FIELD_SEPARATOR = "\x1f"
+
+_secret = None
+
+
+class SessionTokenUnavailableError(RuntimeError):
+    """署名鍵（SESSION_TOKEN_SECRET）が未設定のためトークンを発行できない"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _get_secret():
+    """
+    署名鍵（環境変数 SESSION_TOKEN_SECRET）
+    未設定時は None（ワーカーごとに別の鍵を使うと発行したワーカー以外で検証できないため、鍵を生成しない）
+    """
+    global _secret
+    if _secret is None:
+        load_dotenv()
+        value = os.getenv("SESSION_TOKEN_SECRET")
+        if value:
+            _secret = value.encode("utf-8")
+    return _secret
+
+
+def get_token_ttl():
+    """トークンの有効期限（秒。環境変数 SESSION_TOKEN_TTL）"""
+    try:
+        return max(1, int(os.getenv("SESSION_TOKEN_TTL", DEFAULT_TTL)))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def _sign(payload, secret):
+    return _b64encode(hmac.new(secret, (TOKEN_PREFIX + payload).encode("ascii"), hashlib.sha256).digest())
+
+
+def is_session_token(value):
+    """トークン形式の文字列かどうか（署名は検証しない。トークンは ASCII のみで構成される）"""
+    return isinstance(value, str) and value.isascii() and value.startswith(TOKEN_PREFIX) and value.count(".") == 2
+
+
+def issue_session_token(room_number, building_id, ttl=None):
+    """
+    (UserCD, ClientCD) に紐づくトークンを発行する
+
+    Returns:
+        tuple: (トークン, 有効期限の UNIX 時刻)
+
+    Raises:
+        SessionTokenUnavailableError: SESSION_TOKEN_SECRET が未設定の場合
+    """
+    secret = _get_secret()
+    if secret is None:
+        raise SessionTokenUnavailableError("SESSION_TOKEN_SECRET が未設定のためトークンを発行できません")
+    expires_at = int(time.time()) + (ttl or get_token_ttl())
+    fields = _FIELD_SEPARATOR.join((str(room_number), str(building_id), str(expires_at)))
+    payload = _b64encode(fields.encode("utf-8"))
+    return f"{TOKEN_PREFIX}{payload}.{_sign(payload, secret)}", expires_at
+
+
+def decode_session_token(token):
+    """
+    トークンの署名を検証して内容を取り出す（有効期限は判定しない）
+
+    Returns:
+        dict: {"room_number", "building_id", "expires_at"}（形式・署名が不正な場合、署名鍵が未設定の場合は None）
+    """
+    if not is_session_token(token):
+        return None
+    secret = _get_secret()
+    if secret is None:
+        return None
+    payload, signature = token[len(TOKEN_PREFIX):].split(".")
+    if not hmac.compare_digest(signature, _sign(payload, secret)):
+        return None
+    try:
+        room_number, building_id, expires_at = _b64decode(payload).decode("utf-8").split(_FIELD_SEPARATOR)
+        return {"room_number": room_number, "building_id": building_id, "expires_at": int(expires_at)}
+    except ValueError:
+        return None
+
+
+def verify_session_token(token, room_number, building_id):
+    """
+    トークンが (room_number, building_id) に対して有効かを検証する（DBは参照しない）
+
+    Returns:
+        dict: 有効な場合は {"room_number": ...}、無効な場合は {"error": ...}
+    """
+    claims = decode_session_token(token)
+    if claims is None or claims["room_number"] != str(room_number) or claims["building_id"] != str(building_id):
+        return {"error": "認証に失敗しました。"}
+    if claims["expires_at"] <= time.time():
+        return {"error": "認証の有効期限が切れました。再度ログインしてください。"}
+    return {"room_number": claims["room_number"]}
@@ -0,0 +1,165 @@
+"""
+予約枠単位のプロセス内ロック
+同じ枠（物件・日付・枠番号）への予約確定をワーカー内で順番に実行し、DBの行ロック待ちが MySQL 側に積み重ならないようにする
+ロックは固定数のストライプに分散して保持し、別の枠・別の物件は（同じストライプに当たらない限り）並行して実行する
+待っている処理の取得順は保証しない（FIFO ではない）。同じイベントループのコルーチン同士は待ち始めた順に取得するが、
+スレッド同士・スレッドとコルーチンの間では順序を決めない
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+
+# ストライプ数（環境変数 SLOT_LOCK_STRIPES で変更可能）
+DEFAULT_STRIPES = 256
+
+# ロックを待つ最大秒数（環境変数 SLOT_LOCK_WAIT_SECONDS で変更可能）
+DEFAULT_WAIT_SECONDS = 10.0
+
+# asyncio 版で、スレッドが保持しているロックの空きを確認する間隔（秒。最初の間隔から倍にしていき、最大間隔で止める）
+_ASYNC_POLL_SECONDS = 0.001
+_ASYNC_POLL_MAX_SECONDS = 0.05
+
+
+class SlotLockTimeout(Exception):
+    """枠ロックを待ち時間内に取得できなかった"""
+
+
+class StripedSlotLocks:
+    """枠のキーをストライプに割り当てて排他するロック（スレッド・asyncio のどちらからも使える）"""
+
+    def __init__(self, stripes=DEFAULT_STRIPES, wait_seconds=DEFAULT_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+        # asyncio 版でコルーチン同士を待たせるロック（イベントループごと・ストライプごとに必要になった時点で作成）
+        self._async_locks = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self._stats = {"acquired": 0, "contended": 0, "timeouts": 0, "max_wait_ms": 0.0}
+
+    def _stripe(self, key):
+        return hash(key) % len(self._locks)
+
+    def _lock_for(self, key):
+        return self._locks[self._stripe(key)]
+
+    def _async_lock_for(self, key):
+        """実行中のイベントループでのストライプの asyncio.Lock"""
+        loop = asyncio.get_running_loop()
+        stripe = self._stripe(key)
+        with self._stats_lock:
+            locks = self._async_locks.get(loop)
+            if locks is None:
+                locks = self._async_locks[loop] = {}
+            lock = locks.get(stripe)
+            if lock is None:
+                lock = locks[stripe] = asyncio.Lock()
+        return lock
+
+    @contextmanager
+    def hold(self, key, timeout=None):
+        """
+        枠ロックを取得して保持する（key が None の場合はロックしない）
+
+        Raises:
+            SlotLockTimeout: timeout（未指定時は wait_seconds）秒以内に取得できない場合
+        """
+        if key is None:
+            yield
+            return
+        lock = self._lock_for(key)
+        started = time.monotonic()
+        contended = not lock.acquire(blocking=False)
+        if contended and not lock.acquire(timeout=self.wait_seconds if timeout is None else timeout):
+            self._record(started, contended, timed_out=True)
+            raise SlotLockTimeout(f"枠ロックの待ち時間を超えました: {key}")
+        self._record(started, contended)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @asynccontextmanager
+    async def hold_async(self, key, timeout=None):
+        """
+        枠ロックを取得して保持する（asyncio 版。待つ間はイベントループを止めない）
+        同じイベントループのコルーチン同士はストライプの asyncio.Lock で待ち（確認の繰り返しなし）、
+        スレッドが保持している場合のみ間隔を倍にしながら空きを確認する
+        """
+        if key is None:
+            yield
+            return
+        async_lock = self._async_lock_for(key)
+        lock = self._lock_for(key)
+        started = time.monotonic()
+        deadline = started + (self.wait_seconds if timeout is None else timeout)
+        contended = async_lock.locked()
+        try:
+            await asyncio.wait_for(async_lock.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._record(started, True, timed_out=True)
+            raise SlotLockTimeout(f"枠ロックの待ち時間を超えました: {key}") from None
+        try:
+            delay = _ASYNC_POLL_SECONDS
+            while not lock.acquire(blocking=False):
+                contended = True
+                if time.monotonic() >= deadline:
+                    self._record(started, contended, timed_out=True)
+                    raise SlotLockTimeout(f"枠ロックの待ち時間を超えました: {key}")
+                await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                delay = min(delay * 2, _ASYNC_POLL_MAX_SECONDS)
+            self._record(started, contended)
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            async_lock.release()
+
+    def _record(self, started, contended, timed_out=False):
+        wait_ms = (time.monotonic() - started) * 1000
+        with self._stats_lock:
+            if timed_out:
+                self._stats["timeouts"] += 1
+            else:
+                self._stats["acquired"] += 1
+            if contended:
+                self._stats["contended"] += 1
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], round(wait_ms, 3))
+
+    def stats(self):
+        """ロックの利用状況"""
+        with self._stats_lock:
+            return {"stripes": len(self._locks), "wait_seconds": self.wait_seconds, **self._stats}
+
+
+def _settings_from_env():
+    try:
+        stripes = max(1, int(os.getenv("SLOT_LOCK_STRIPES", DEFAULT_STRIPES)))
+    except ValueError:
+        stripes = DEFAULT_STRIPES
+    try:
+        wait_seconds = max(0.0, float(os.getenv("SLOT_LOCK_WAIT_SECONDS", DEFAULT_WAIT_SECONDS)))
+    except ValueError:
+        wait_seconds = DEFAULT_WAIT_SECONDS
+    return stripes, wait_seconds
+
+
+_slot_locks = StripedSlotLocks(*_settings_from_env())
+
+
+def hold_slot_lock(key):
+    """枠ロックを取得して保持する（with 文で使う。key は (物件ID, 日付, 枠番号)）"""
+    return _slot_locks.hold(key)
+
+
+def hold_slot_lock_async(key):
+    """枠ロックを取得して保持する（async with 文で使う）"""
+    return _slot_locks.hold_async(key)
+
+
+def get_slot_lock_stats():
+    """枠ロックの利用状況を取得"""
+    return _slot_locks.stats()
@@ -2,9 +2,13 @@
 時間処理関連のユーティリティ関数
 """
 from datetime import datetime, timedelta
+from functools import lru_cache
 import re
 
 
+_HHMM_RE = re.compile(r'(\d{1,2}):(\d{1,2})')
+
+
 class TimeUtils:
     """時間処理関連のユーティリティクラス"""
     
@@ -63,6 +67,39 @@ class TimeUtils:
         total_minutes = minute_unit * minute_type
         return start_dt + timedelta(minutes=total_minutes)
     
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def hhmm_to_minutes(time_str):
+        """
+        "HH:MM" を0時からの経過分に変換（datetime.strptime(time_str, "%H:%M") と同じ書式を受け付ける）
+        解析できない場合は None。同じ文字列の変換結果はキャッシュする
+        """
+        if not isinstance(time_str, str):
+            return None
+        match = _HHMM_RE.fullmatch(time_str)
+        if not match:
+            return None
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            return None
+        return hour * 60 + minute
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse_date(date_str):
+        """"YYYY-MM-DD" を date に変換（不正な値は ValueError。変換結果はキャッシュする）"""
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    
+    @staticmethod
+    def minute_range(datetime_str):
+        """
+        "YYYY-MM-DD HH:MM" の1分間を半開区間 [開始, 終了) の文字列で返す
+        （TimeFrom のインデックスを使える範囲条件を組み立てるため）
+        """
+        start_dt = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M")
+        end_dt = start_dt + timedelta(minutes=1)
+        return start_dt.strftime("%Y-%m-%d %H:%M:%S"), end_dt.strftime("%Y-%m-%d %H:%M:%S")
+    
     @staticmethod
     def is_within_period(now, start_date, end_date):
         """期間内かどうかを判定"""
@@ -1,7 +1,15 @@
 import json
 import os
 import re
-from typing import Dict, Any
+import threading
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional
+
+from utils.time_utils import TimeUtils
+
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'waku_patterns.json')
+DEFAULT_SYSTEM_PROPERTIES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'system.properties')
 
 
 def _parse_system_properties(system_properties_path: str) -> Dict[int, Dict[str, Any]]:
@@ -82,9 +90,9 @@ def load_waku_patterns(config_path: str = None, system_properties_path: str = No
     優先順位: JSONコンフィグ > system.properties パース > 空の辞書
     """
     if config_path is None:
-        config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'waku_patterns.json')
+        config_path = DEFAULT_CONFIG_PATH
     if system_properties_path is None:
-        system_properties_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'system.properties')
+        system_properties_path = DEFAULT_SYSTEM_PROPERTIES_PATH
 
     try:
         if os.path.exists(config_path):
@@ -105,12 +113,138 @@ def load_waku_patterns(config_path: str = None, system_properties_path: str = No
     return {}
 
 
+class CompiledWakuPattern:
+    """
+    枠パターンを0時からの経過分（int）の配列に変換したもの
+    スロット番号の判定を文字列解析なしの二分探索で行う
+    """
+
+    def __init__(self, start_times: List[str], end_times: List[str], ampm: List[str] = None, jikan_tani=None):
+        self.start_times = list(start_times or [])
+        self.end_times = list(end_times or [])
+        self.start_minutes = [TimeUtils.hhmm_to_minutes(t) for t in self.start_times]
+        self.end_minutes = [TimeUtils.hhmm_to_minutes(t) for t in self.end_times]
+        self.ampm = list(ampm or [])
+        try:
+            self.jikan_tani = int(jikan_tani) if jikan_tani not in (None, '') else None
+        except (TypeError, ValueError):
+            self.jikan_tani = None
+
+        # 完全一致判定（同じ開始時刻が複数ある場合は先頭の枠）
+        self._exact: Dict[str, int] = {}
+        for idx, st in enumerate(self.start_times):
+            self._exact.setdefault(st, idx)
+
+        # 範囲判定の対象は、先頭から開始・終了とも解析できる枠まで（従来の逐次判定と同じ範囲）
+        candidates = []
+        for idx, (st, et) in enumerate(zip(self.start_minutes, self.end_minutes)):
+            if st is None or et is None:
+                break
+            if st < et:
+                candidates.append((st, et, idx))
+        candidates.sort()
+        self._range_starts = [c[0] for c in candidates]
+        self._range_ends = [c[1] for c in candidates]
+        self._range_index = [c[2] for c in candidates]
+        # 枠同士が重なる場合は「定義順で最初に該当する枠」を優先するため逐次判定に切り替える
+        self._overlapping = any(
+            self._range_starts[i + 1] < self._range_ends[i] for i in range(len(candidates) - 1))
+
+    def __len__(self):
+        return len(self.start_times)
+
+    def slot_index(self, time_str: str) -> Optional[int]:
+        """"HH:MM" が属する枠の番号（開始時刻の完全一致を優先し、次に [開始, 終了) の範囲で判定）"""
+        idx = self._exact.get(time_str)
+        if idx is not None:
+            return idx
+        minute = TimeUtils.hhmm_to_minutes(time_str)
+        if minute is None:
+            return None
+        return self.slot_index_at(minute)
+
+    def slot_index_at(self, minute_of_day: int) -> Optional[int]:
+        """0時からの経過分が [開始, 終了) に含まれる枠の番号"""
+        if self._overlapping:
+            found = None
+            for st, et, idx in zip(self._range_starts, self._range_ends, self._range_index):
+                if st <= minute_of_day < et and (found is None or idx < found):
+                    found = idx
+            return found
+        pos = bisect_right(self._range_starts, minute_of_day) - 1
+        if pos >= 0 and minute_of_day < self._range_ends[pos]:
+            return self._range_index[pos]
+        return None
+
+
+def compile_waku_pattern(pattern: Dict[str, Any]) -> CompiledWakuPattern:
+    """枠パターン定義（StartTime / EndTime / AMPM / JikanTani）を CompiledWakuPattern に変換"""
+    return CompiledWakuPattern(
+        pattern.get('StartTime', []),
+        pattern.get('EndTime', []),
+        pattern.get('AMPM', []),
+        pattern.get('JikanTani'),
+    )
+
+
+class WakuPatternRegistry:
+    """
+    枠パターン定義のプロセス内レジストリ
+    load_waku_patterns の結果を保持し、JSONコンフィグ / system.properties が
+    ディスク上で変更された（mtime・サイズが変わった）場合のみ再読み込みする
+    """
+
+    def __init__(self, config_path: str = None, system_properties_path: str = None):
+        self.config_path = config_path or DEFAULT_CONFIG_PATH
+        self.system_properties_path = system_properties_path or DEFAULT_SYSTEM_PROPERTIES_PATH
+        self._lock = threading.Lock()
+        self._signature = None
+        self._patterns: Dict[int, Dict[str, Any]] = {}
+        self._compiled: Dict[int, CompiledWakuPattern] = {}
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.config_path, self.system_properties_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get_patterns(self) -> Dict[int, Dict[str, Any]]:
+        """全枠パターンを取得（元ファイルが変わっていなければ読み込み済みの内容を返す）"""
+        signature = self._file_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    patterns = load_waku_patterns(self.config_path, self.system_properties_path)
+                    self._compiled = {pid: compile_waku_pattern(p) for pid, p in patterns.items()}
+                    self._patterns = patterns
+                    self._signature = signature
+        return self._patterns
+
+    def get_pattern(self, pattern_id: int) -> Optional[Dict[str, Any]]:
+        """指定IDの枠パターンを取得（未定義は None）"""
+        return self.get_patterns().get(pattern_id)
+
+    def get_compiled(self, pattern_id: int) -> Optional[CompiledWakuPattern]:
+        """指定IDの枠パターンを変換済みの形で取得（読み込み時に1回だけ変換する）"""
+        self.get_patterns()
+        return self._compiled.get(pattern_id)
+
+
+_registry = WakuPatternRegistry()
+
+
+def get_waku_pattern_registry() -> WakuPatternRegistry:
+    """プロセス共通の枠パターンレジストリを取得"""
+    return _registry
+
+
 if __name__ == "__main__":
     # 簡易テスト: 設定ファイルから読み込み、サマリーを出力
-    cfg = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'waku_patterns.json')
-    sysprop = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'system.properties')
-
-    patterns = load_waku_patterns(cfg, sysprop)
+    patterns = load_waku_patterns(DEFAULT_CONFIG_PATH, DEFAULT_SYSTEM_PROPERTIES_PATH)
     count = len(patterns)
     print(f"パターン数: {count}")
     # 先頭の数件のみダイジェスト表示